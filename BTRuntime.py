@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Runtime des Behavior Trees décrits par une spécification JSON
+#
+# Module fixe, installé une fois sur le robot à côté des classes d'actions : il construit l'arbre py_trees
+# à partir de la spécification écrite par P3_Assembleur.create_behavior_tree_spec, sans générer ni importer
+# de code propre au plan. Un nouveau plan se charge avec charger_arbre(chemin).
+#
+# Exemple :
+#   rosrun my_tiago_project BTRuntime.py behavior_tree.json [problem.pddl]
+
+import functools
+import sys
+
+import rospy
+import py_trees
+import py_trees_ros
+
+from PreGraspArmRightAction import PreGraspArmRightAction
+from moveitArucoBT import moveitAruco
+from RotateBeforeGraspBT import RotateBeforeGrasp
+from ArmRightHomeBT import ArmRightHome
+from ObserveTableAction import ObserveTableAction  # Votre classe pour bouger la tête
+from PoolAruco import VerifierAruco  # Un abonné par topic ArUco pour tout l'arbre
+from CloseGripperRightBT import CloseGripperRight
+from OpenGripperRightBT import OpenGripperRight
+from MoveBaseGoalAction import MoveBaseGoalAction
+from FinalGraspBT import FinalGrasp
+from WaitAction import WaitAction  # Votre classe pour l'action wait
+from LookForwardAndRaise import LookForwardAndRaise
+from ClientKB import DELAI_SERVICE
+from MiroirKB import Reconciliateur, SourceROS, PointSynchronisation
+from Operateur import ConsigneOperateur
+from DecorateurKB import PREDICATE_PARAMETER_ORDER, KB_CLIENT, KB_MIROIR, KBUpdateDecorator
+from ProfilageBT import ProfileurBT
+import ConstructionBT
+from ConstructionBT import charger_specification
+
+# ==================================
+# Création du Behavior Tree depuis la spécification
+# ==================================
+
+# Classes des actions du robot, par nom (ConstructionBT.CLASSES_COMPORTEMENTS)
+COMPORTEMENTS = {
+    "MoveBaseGoalAction": MoveBaseGoalAction,
+    "WaitAction": WaitAction,
+    "VerifierAruco": VerifierAruco,
+    "ObserveTableAction": ObserveTableAction,
+    "PreGraspArmRightAction": PreGraspArmRightAction,
+    "moveitAruco": moveitAruco,
+    "RotateBeforeGrasp": RotateBeforeGrasp,
+    "FinalGrasp": FinalGrasp,
+    "CloseGripperRight": CloseGripperRight,
+    "OpenGripperRight": OpenGripperRight,
+    "ArmRightHome": ArmRightHome,
+    "LookForwardAndRaise": LookForwardAndRaise,
+    # Les points de synchronisation annoncent l'agent à la KB partagée par le client de l'arbre
+    "PointSynchronisation": functools.partial(PointSynchronisation, client=KB_CLIENT),
+    # Consignes d'un opérateur humain (partition sans actions du robot)
+    "ConsigneOperateur": ConsigneOperateur,
+}
+
+def creer_arbre(specification):
+    """
+    Construit le Behavior Tree décrit par la spécification : mêmes nœuds et mêmes noms que le module généré par
+    P3_Assembleur.create_behavior_tree_file.
+
+    :return: Séquence racine.
+    """
+    PREDICATE_PARAMETER_ORDER.clear()
+    PREDICATE_PARAMETER_ORDER.update(specification["predicate_parameter_order"])
+    return ConstructionBT.creer_arbre(specification, COMPORTEMENTS, KBUpdateDecorator, rospy.logwarn)
+
+def charger_arbre(chemin):
+    return creer_arbre(charger_specification(chemin))
+
+# ==================================
+# Boucle principale
+# ==================================
+
+def main():
+    rospy.init_node('behavior_tree_tiago', anonymous=True, log_level=rospy.INFO)
+
+    # Créer le Behavior Tree depuis la spécification passée en argument (les arguments ROS sont ignorés)
+    arguments = rospy.myargv(argv=sys.argv)
+    chemin = arguments[1] if len(arguments) > 1 else 'behavior_tree.json'
+    specification = charger_specification(chemin)
+    bt_root = creer_arbre(specification)
+    bt = py_trees_ros.trees.BehaviourTree(bt_root)
+
+    # Initialiser le miroir de la KB depuis le :init du problème, puis le réconcilier avec la KB distante
+    problem_file = arguments[2] if len(arguments) > 2 else specification.get("problem")
+    if problem_file:
+        KB_MIROIR.charger_probleme(problem_file)
+    reconciliateur = Reconciliateur(KB_MIROIR, SourceROS(), KB_CLIENT).demarrer()
+
+    # Profilage optionnel (paramètre ~profilage : préfixe des fichiers JSON et CSV exportés en fin d'exécution)
+    profilage = rospy.get_param('~profilage', '')
+    profileur = ProfileurBT().instrumenter(bt.root, KB_CLIENT) if profilage else None
+
+    # Afficher l'arbre en ASCII
+    tree_ascii = py_trees.display.ascii_tree(bt.root)
+    rospy.loginfo("\n" + tree_ascii)
+
+    # Configurer l'arbre
+    bt.setup(timeout=15)
+
+    rospy.loginfo('Lancement de l\'arbre de comportements')
+
+    # Boucle principale
+    rate = rospy.Rate(10)
+    while not rospy.is_shutdown():
+        if profileur is not None:
+            profileur.tick(bt)
+        else:
+            bt.tick()
+        tree_status = bt.root.status
+
+        if tree_status == py_trees.common.Status.RUNNING:
+            rospy.loginfo('Behavior Tree en cours d\'exécution...')
+        elif tree_status == py_trees.common.Status.FAILURE:
+            rospy.loginfo('Behavior Tree terminé avec statut : FAILURE')
+            break  # Arrêter la boucle en cas de FAILURE
+        elif tree_status == py_trees.common.Status.SUCCESS:
+            rospy.loginfo('Behavior Tree terminé avec statut : SUCCESS')
+            break  # Arrêter la boucle en cas de SUCCESS
+        rate.sleep()
+
+    # Attendre l'envoi des dernières mises à jour de la KB avant de quitter
+    reconciliateur.arreter()
+    if not KB_CLIENT.fermer(DELAI_SERVICE):
+        rospy.logerr('Mises à jour de la KB non confirmées avant l\'arrêt')
+    if profileur is not None:
+        rospy.loginfo('Profil exporté : {}'.format(', '.join(profileur.exporter(profilage))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Client asynchrone de la base de connaissances ROSPlan
+#
+# Les KBUpdateDecorator ne bloquent plus le tick : leurs mises à jour sont déposées dans une file et envoyées
+# par un thread de fond, via un proxy persistant vers /rosplan_knowledge_base/update_array. Les lots en attente
+# sont regroupés en une seule requête, dans l'ordre de soumission. Chaque lot reçoit un Ticket pour attendre
+# son accusé ; vider() attend que toute la file soit envoyée. ServiceKBLocal remplace le service ROSPlan pour
+# les essais hors ROS.
+#
+# Exemple :
+#   client = ClientKB(ServiceKBLocal())
+#   ticket = client.soumettre([("holding", {"a": "agent_r", "t": "t1"}, True)])
+#   ticket.attendre(5.0)
+#   client.fermer()
+
+import collections
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+SERVICE_KB = '/rosplan_knowledge_base/update_array'
+DELAI_SERVICE = 5.0   # Attente maximale du service, en secondes
+TAILLE_LOT_MAX = 256  # Nombre maximal de mises à jour regroupées dans une requête
+
+MiseAJour = collections.namedtuple('MiseAJour', [
+    'predicat',    # Nom du prédicat
+    'parametres',  # Dictionnaire {nom du paramètre: valeur}
+    'ajout',       # True pour ajouter le fait à la KB, False pour le retirer
+])
+
+class Ticket(object):
+    """
+    Accusé de réception d'un lot soumis au ClientKB.
+    """
+    def __init__(self):
+        self._evenement = threading.Event()
+        self.succes = None
+        self.instant = None  # Instant de l'accusé (time.time)
+
+    def _terminer(self, succes):
+        self.succes = succes
+        self.instant = time.time()
+        self._evenement.set()
+
+    @property
+    def termine(self):
+        return self._evenement.is_set()
+
+    def attendre(self, timeout=None):
+        """
+        :return: True si le lot a été appliqué par la KB, False s'il a échoué ou si le délai est écoulé.
+        """
+        self._evenement.wait(timeout)
+        return bool(self.succes)
+
+class ClientKB(object):
+    """
+    File de mises à jour de la KB vidée par un thread de fond.
+
+    :param transport: Appelable recevant une liste de MiseAJour et renvoyant True si la KB les a appliquées
+                      (TransportROS, ou ServiceKBLocal hors ROS).
+    :param taille_lot: Nombre maximal de mises à jour regroupées dans un même appel au transport.
+    """
+    def __init__(self, transport, taille_lot=TAILLE_LOT_MAX):
+        self.transport = transport
+        self.taille_lot = taille_lot
+        self.requetes = 0  # Nombre d'appels au transport
+        self.derniere_erreur = None
+        self._file = queue.Queue()
+        self._condition = threading.Condition()
+        self._en_attente = 0  # Lots soumis dont l'accusé n'est pas encore rendu
+        self._verrou = threading.Lock()
+        self._thread = None
+
+    def soumettre(self, mises_a_jour):
+        """
+        Dépose un lot de mises à jour sans attendre la KB.
+
+        :param mises_a_jour: Itérable de tuples (prédicat, paramètres, ajout).
+        :return: Ticket du lot.
+        """
+        ticket = Ticket()
+        lot = [MiseAJour(*mise_a_jour) for mise_a_jour in mises_a_jour]
+        if not lot:
+            ticket._terminer(True)
+            return ticket
+        with self._condition:
+            self._en_attente += 1
+        self._demarrer()
+        self._file.put((lot, ticket))
+        return ticket
+
+    def vider(self, timeout=None):
+        """
+        Attend que tous les lots soumis aient été envoyés.
+
+        :return: True si la file est vide, False si le délai est écoulé avant.
+        """
+        fin = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._en_attente:
+                reste = None if fin is None else fin - time.time()
+                if reste is not None and reste <= 0:
+                    return False
+                self._condition.wait(reste)
+        return True
+
+    def fermer(self, timeout=None):
+        """
+        Vide la file puis arrête le thread de fond. Le client redémarre son thread s'il est réutilisé.
+
+        :return: True si la file a été vidée dans le délai.
+        """
+        vide = self.vider(timeout)
+        with self._verrou:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._file.put(None)
+            thread.join(timeout)
+        return vide
+
+    def _demarrer(self):
+        with self._verrou:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name="ClientKB")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _boucle(self):
+        while True:
+            premier = self._file.get()
+            if premier is None:
+                return
+            # Regroupe les lots déjà en file, dans leur ordre de soumission
+            lots = [premier]
+            taille = len(premier[0])
+            arret = False
+            while taille < self.taille_lot:
+                try:
+                    suivant = self._file.get_nowait()
+                except queue.Empty:
+                    break
+                if suivant is None:
+                    arret = True
+                    break
+                lots.append(suivant)
+                taille += len(suivant[0])
+            self._envoyer(lots)
+            if arret:
+                return
+
+    def _envoyer(self, lots):
+        mises_a_jour = [mise_a_jour for lot, _ in lots for mise_a_jour in lot]
+        try:
+            succes = bool(self.transport(mises_a_jour))
+        except Exception as e:
+            # Le thread de fond ne doit pas mourir : l'erreur est rendue par les tickets du lot
+            self.derniere_erreur = e
+            succes = False
+        self.requetes += 1
+        for _, ticket in lots:
+            ticket._terminer(succes)
+        with self._condition:
+            self._en_attente -= len(lots)
+            self._condition.notify_all()
+
+class TransportROS(object):
+    """
+    Envoie un lot de mises à jour en une seule requête KnowledgeUpdateServiceArray, via un proxy persistant
+    recréé après une erreur de connexion.
+
+    :param ordre_parametres: Ordre des paramètres par prédicat (PREDICATE_PARAMETER_ORDER du Behavior Tree),
+                             lu à chaque envoi.
+    """
+    def __init__(self, ordre_parametres, service_name=SERVICE_KB, timeout=DELAI_SERVICE):
+        self.ordre_parametres = ordre_parametres
+        self.service_name = service_name
+        self.timeout = timeout
+        self._proxy = None
+
+    def requete(self, mises_a_jour):
+        # Les imports ROS ne sont faits qu'à l'envoi : le client reste utilisable hors ROS avec ServiceKBLocal
+        import rospy
+        from rosplan_knowledge_msgs.srv import KnowledgeUpdateServiceArrayRequest
+        from rosplan_knowledge_msgs.msg import KnowledgeItem
+        from diagnostic_msgs.msg import KeyValue
+
+        request = KnowledgeUpdateServiceArrayRequest()
+        for predicate_name, parameters, add in mises_a_jour:
+            knowledge = KnowledgeItem()
+            knowledge.knowledge_type = KnowledgeItem.FACT
+            knowledge.attribute_name = predicate_name.strip()
+            knowledge.is_negative = False
+            if parameters:
+                parameter_order = self.ordre_parametres.get(predicate_name.strip())
+                if parameter_order:
+                    missing_params = [p for p in parameter_order if p not in parameters]
+                    if missing_params:
+                        rospy.logerr("Paramètres manquants pour le prédicat '{}': {}".format(predicate_name, missing_params))
+                        continue
+                    knowledge.values = [KeyValue(key=k, value=parameters[k]) for k in parameter_order]
+                else:
+                    rospy.logdebug("Ordre des paramètres non défini pour le prédicat '{}'. Utilisation de l'ordre par défaut.".format(predicate_name))
+                    knowledge.values = [KeyValue(key=k, value=v) for k, v in parameters.items()]
+            else:
+                knowledge.values = []
+            request.knowledge.append(knowledge)
+            request.update_type.append(KnowledgeUpdateServiceArrayRequest.ADD_KNOWLEDGE if add
+                                       else KnowledgeUpdateServiceArrayRequest.REMOVE_KNOWLEDGE)
+        return request
+
+    def __call__(self, mises_a_jour):
+        import rospy
+        from rosplan_knowledge_msgs.srv import KnowledgeUpdateServiceArray
+
+        request = self.requete(mises_a_jour)
+        if not request.knowledge:
+            return True
+        # Une seconde tentative avec un nouveau proxy si la connexion persistante a été perdue
+        for tentative in range(2):
+            try:
+                if self._proxy is None:
+                    rospy.wait_for_service(self.service_name, timeout=self.timeout)
+                    self._proxy = rospy.ServiceProxy(self.service_name, KnowledgeUpdateServiceArray, persistent=True)
+                response = self._proxy(request)
+                if response.success:
+                    rospy.logdebug('KB mise à jour : {} prédicat(s)'.format(len(request.knowledge)))
+                else:
+                    rospy.logerr('Échec de la mise à jour de la KB pour {} prédicat(s)'.format(len(request.knowledge)))
+                return response.success
+            except rospy.ServiceException as e:
+                rospy.logerr('Erreur lors de l\'appel au service : {}'.format(e))
+                if self._proxy is not None:
+                    self._proxy.close()
+                self._proxy = None
+            except rospy.ROSException:
+                rospy.logerr('Timeout lors de l\'attente du service {}'.format(self.service_name))
+                return False
+        return False
+
+class ServiceKBLocal(object):
+    """
+    Remplaçant en mémoire du service de la KB, pour exercer ClientKB et les Behavior Trees hors ROS.
+
+    :param latence: Durée simulée de chaque requête, en secondes.
+    :param echecs: Nombre de requêtes initiales à faire échouer.
+    """
+    def __init__(self, latence=0.0, echecs=0):
+        self.latence = latence
+        self.echecs = echecs
+        self.faits = set()
+        self.requetes = []
+
+    @staticmethod
+    def fait(predicat, parametres):
+        return (predicat, tuple(sorted(parametres.items())))
+
+    def contient(self, predicat, parametres=None):
+        return self.fait(predicat, parametres or {}) in self.faits
+
+    def __call__(self, mises_a_jour):
+        if self.latence:
+            time.sleep(self.latence)
+        self.requetes.append(list(mises_a_jour))
+        if self.echecs:
+            self.echecs -= 1
+            return False
+        for predicat, parametres, ajout in mises_a_jour:
+            if ajout:
+                self.faits.add(self.fait(predicat, parametres))
+            else:
+                self.faits.discard(self.fait(predicat, parametres))
+        return True
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Structure des Behavior Trees décrits par une spécification JSON (P3_Assembleur.create_behavior_tree_spec)
+#
+# Les séquences, sélecteurs et décorateurs sont construits ici sans dépendre de ROS : les comportements sont
+# fournis par nom de classe. BTRuntime y passe les actions du robot, SimulationBT des comportements simulés ;
+# les deux arbres ont ainsi exactement les mêmes nœuds et les mêmes noms que le module généré par P3.
+
+import json
+
+import py_trees
+
+# Version du format de spécification supportée (P3_Assembleur.VERSION_SPECIFICATION)
+VERSION_SPECIFICATION = 2
+
+# Noms des classes de comportements utilisées par les arbres
+CLASSES_COMPORTEMENTS = (
+    "MoveBaseGoalAction", "WaitAction", "VerifierAruco", "ObserveTableAction", "PreGraspArmRightAction",
+    "moveitAruco", "RotateBeforeGrasp", "FinalGrasp", "CloseGripperRight", "OpenGripperRight", "ArmRightHome",
+    "LookForwardAndRaise", "PointSynchronisation", "ConsigneOperateur",
+)
+
+def charger_specification(chemin):
+    """
+    Lit une spécification écrite par P3_Assembleur.create_behavior_tree_spec.
+
+    :raises ValueError: Si la version de la spécification n'est pas supportée.
+    """
+    with open(chemin, 'r') as file:
+        specification = json.load(file)
+    if specification.get("version") != VERSION_SPECIFICATION:
+        raise ValueError("Version de spécification non supportée : {}".format(specification.get("version")))
+    return specification
+
+# ==================================
+# Construction des séquences, une fonction par type d'action
+# ==================================
+
+def creer_move_to(noeud, c):
+    op_name = noeud["name"]
+    coordinates = noeud["coordinates"]
+    sequence = py_trees.composites.Sequence("MoveSequence_{0}".format(op_name))
+    sequence.add_child(c["MoveBaseGoalAction"]("Move to {0}".format(noeud["to"]), x=coordinates['x'], y=coordinates['y'],
+                                               orientation_z=coordinates['orientation_z'],
+                                               orientation_w=coordinates['orientation_w']))
+    return sequence
+
+def creer_wait(noeud, c):
+    op_name = noeud["name"]
+    sequence = py_trees.composites.Sequence("WaitSequence_{0}".format(op_name))
+    sequence.add_child(c["WaitAction"]("WaitAction_{0}".format(op_name), duration=noeud["duration"]))
+    return sequence
+
+def creer_detect(noeud, c):
+    op_name = noeud["name"]
+    topic_name = noeud["topic_name"]
+    sequence = py_trees.composites.Sequence("DetectSequence_{0}".format(op_name))
+    detection_selector = py_trees.composites.Selector("DetectionSelector_{0}".format(op_name))
+    check_aruco = c["VerifierAruco"](name="CheckAruco_{0}".format(op_name), topic_name=topic_name, timeout=2.0)
+    observe_and_check = py_trees.composites.Sequence("ObserveAndCheck_{0}".format(op_name))
+    observe_table_action = c["ObserveTableAction"]("ObserveTableAction_{0}".format(op_name))
+    check_aruco_again = c["VerifierAruco"]("CheckAruco_{0}_Again".format(op_name), topic_name=topic_name, timeout=2.0)
+    observe_and_check.add_children([observe_table_action, check_aruco_again])
+    detection_selector.add_children([check_aruco, observe_and_check])
+    sequence.add_child(detection_selector)
+    return sequence
+
+def creer_pick(noeud, c):
+    op_name = noeud["name"]
+    sequence = py_trees.composites.Sequence("PickSequence_{0}".format(op_name))
+    sequence.add_children([
+        c["PreGraspArmRightAction"]("PreGraspArmRight_{0}".format(op_name)),
+        c["moveitAruco"]("MoveItAruco_{0}".format(op_name), noeud["marker_id"]),
+        c["RotateBeforeGrasp"]("RotateBeforeGrasp_{0}".format(op_name)),
+        c["FinalGrasp"]("FinalGrasp_{0}".format(op_name)),
+        c["CloseGripperRight"]("CloseGripperRight_{0}".format(op_name)),
+        c["ArmRightHome"]("ArmRightHome_{0}".format(op_name)),
+        c["LookForwardAndRaise"]("LookForwardAndRaise_{0}".format(op_name))
+    ])
+    return sequence
+
+def creer_place(noeud, c):
+    op_name = noeud["name"]
+    sequence = py_trees.composites.Sequence("PlaceSequence_{0}".format(op_name))
+    sequence.add_children([
+        c["moveitAruco"]("MoveItPlace_{0}".format(op_name), noeud["marker_id"]),
+        c["OpenGripperRight"]("OpenGripperRight_{0}".format(op_name)),
+        c["ArmRightHome"]("ArmRightHome_{0}".format(op_name)),
+        c["LookForwardAndRaise"]("LookForwardAndRaise_{0}".format(op_name))
+    ])
+    return sequence
+
+def creer_sync(noeud, c):
+    op_name = noeud["name"]
+    sequence = py_trees.composites.Sequence("SyncSequence_{0}".format(op_name))
+    sequence.add_child(c["PointSynchronisation"]("Sync_{0}".format(op_name), noeud["agent"], noeud["step"],
+                                                 noeud["partners"]))
+    return sequence
+
+def creer_operator(noeud, c):
+    op_name = noeud["name"]
+    sequence = py_trees.composites.Sequence("OperatorSequence_{0}".format(op_name))
+    sequence.add_child(c["ConsigneOperateur"]("Operator_{0}".format(op_name), noeud["agent"], noeud["operation"]))
+    return sequence
+
+# Constructeur de la séquence et préfixe du décorateur, par type d'action
+CONSTRUCTEURS = {
+    "move_to": (creer_move_to, "MoveDecorator"),
+    "wait": (creer_wait, "WaitDecorator"),
+    "detect": (creer_detect, "DetectDecorator"),
+    "pick": (creer_pick, "PickDecorator"),
+    "place": (creer_place, "PlaceDecorator"),
+    "sync": (creer_sync, "SyncDecorator"),
+    "operator": (creer_operator, "OperatorDecorator"),
+}
+
+class ParalleleSynchronise(py_trees.composites.Parallel):
+    """
+    Parallel de py_trees 0.x dont les branches terminées avec succès ne sont plus tickées pendant l'exécution
+    en cours : le Parallel d'origine retique chaque enfant à chaque tick et relancerait une séquence déjà
+    réussie (actions du robot et mises à jour de la KB rejouées) en attendant la branche la plus longue.
+    """
+    def tick(self):
+        nouvelle_execution = self.status != py_trees.common.Status.RUNNING
+        if nouvelle_execution:
+            self.initialise()
+        for child in self.children:
+            if nouvelle_execution or child.status != py_trees.common.Status.SUCCESS:
+                for node in child.tick():
+                    yield node
+        new_status = py_trees.common.Status.RUNNING
+        if any(c.status == py_trees.common.Status.FAILURE for c in self.children):
+            new_status = py_trees.common.Status.FAILURE
+        elif self.policy == py_trees.common.ParallelPolicy.SUCCESS_ON_ALL:
+            if all(c.status == py_trees.common.Status.SUCCESS for c in self.children):
+                new_status = py_trees.common.Status.SUCCESS
+        elif any(c.status == py_trees.common.Status.SUCCESS for c in self.children):
+            new_status = py_trees.common.Status.SUCCESS
+        # Issue finale : les branches encore RUNNING sont interrompues, comme dans le Parallel d'origine
+        if new_status != py_trees.common.Status.RUNNING:
+            for child in self.children:
+                if child.status == py_trees.common.Status.RUNNING:
+                    child.stop(py_trees.common.Status.INVALID)
+            self.stop(new_status)
+        self.status = new_status
+        yield self
+
+def creer_composite(structure, decorateurs):
+    # Élément de la structure : indice d'un nœud, ou composite {type, name, children} (P3_Assembleur.structurer_actions)
+    if isinstance(structure, int):
+        return decorateurs[structure]
+    if structure["type"] == "parallel":
+        composite = ParalleleSynchronise(structure["name"], policy=py_trees.common.ParallelPolicy.SUCCESS_ON_ALL)
+    else:
+        composite = py_trees.composites.Sequence(structure["name"])
+    composite.add_children([enfant for enfant in (creer_composite(element, decorateurs) for element in structure["children"])
+                            if enfant is not None])
+    return composite
+
+def creer_arbre(specification, comportements, decorateur, avertir=None):
+    """
+    Construit le Behavior Tree décrit par la spécification : les décorateurs des nœuds sous RootSequence, dans
+    l'ordre des nœuds ou selon la structure de branches parallèles si la spécification en a une.
+
+    :param comportements: Dictionnaire {nom de classe (CLASSES_COMPORTEMENTS): classe ou fabrique}.
+    :param decorateur: Classe du décorateur de mise à jour de la KB (arguments de KBUpdateDecorator).
+    :param avertir: Fonction appelée avec un message pour chaque nœud ignoré (rospy.logwarn par exemple).
+    :return: Séquence racine.
+    """
+    decorateurs = []
+    for noeud in specification["nodes"]:
+        if noeud["type"] not in CONSTRUCTEURS:
+            if avertir is not None:
+                avertir("Type d'action inconnu '{}' pour '{}'. Ignoré.".format(noeud["type"], noeud["name"]))
+            decorateurs.append(None)
+            continue
+        constructeur, prefixe = CONSTRUCTEURS[noeud["type"]]
+        # Le JSON ne distingue pas tuples et listes : les prédicats sont relus en (nom, paramètres)
+        predicats = dict((cle, [tuple(predicat) for predicat in predicats]) for cle, predicats in noeud["kb"].items())
+        decorateurs.append(decorateur(
+            name="{0}_{1}".format(prefixe, noeud["name"]),
+            on_success_predicates=predicats.get("on_success", []),
+            on_success_remove_predicates=predicats.get("on_success_remove", []),
+            on_failure_predicates=predicats.get("on_failure", []),
+            on_failure_remove_predicates=predicats.get("on_failure_remove", []),
+            child=constructeur(noeud, comportements)
+        ))
+    structure = specification.get("structure", range(len(decorateurs)))
+    root = py_trees.composites.Sequence("RootSequence")
+    root.add_children([enfant for enfant in (creer_composite(element, decorateurs) for element in structure)
+                       if enfant is not None])
+    return root
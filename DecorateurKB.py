@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Décorateur de mise à jour de la KB, commun aux Behavior Trees générés par P3 et à BTRuntime
+#
+# Module fixe, installé une fois sur le robot à côté de ClientKB.py et MiroirKB.py : il porte le client de la
+# KB, le miroir local et le KBUpdateDecorator partagés par tous les décorateurs d'un arbre. L'arbre renseigne
+# PREDICATE_PARAMETER_ORDER (le client et le miroir en gardent la référence) avant le premier tick.
+#
+# Exemple :
+#   from DecorateurKB import PREDICATE_PARAMETER_ORDER, KB_CLIENT, KB_MIROIR, KBUpdateDecorator
+#   PREDICATE_PARAMETER_ORDER.update({"holding": ["a", "t"]})
+#   decorator = KBUpdateDecorator("Pick_OP11", on_success_predicates=[("holding", {"a": "agent_r", "t": "t1"})], child=sequence)
+
+import rospy
+import py_trees
+
+from ClientKB import ClientKB, TransportROS
+from MiroirKB import MiroirKB, publier
+
+# Ordre des paramètres pour chaque prédicat utilisé, renseigné par l'arbre chargé
+PREDICATE_PARAMETER_ORDER = {}
+
+# ===========================
+# Mises à jour de la KB
+# ===========================
+
+# Client de la KB partagé par tous les décorateurs : les mises à jour partent d'un thread de fond
+KB_CLIENT = ClientKB(TransportROS(PREDICATE_PARAMETER_ORDER))
+
+# Miroir local de la KB, publié sur le blackboard : les conditions le lisent sans appel de service
+KB_MIROIR = publier(MiroirKB(PREDICATE_PARAMETER_ORDER))
+
+def update_kb(predicate_name, parameters, add=True):
+    # Mise à jour non bloquante ; le ticket renvoyé permet d'attendre l'accusé de la KB
+    return KB_CLIENT.soumettre([(predicate_name, parameters, add)])
+
+# ==================================
+# Décorateur KBUpdateDecorator
+# ==================================
+
+class KBUpdateDecorator(py_trees.decorators.Decorator):
+    def __init__(self, name, on_success_predicates=[], on_failure_remove_predicates=[], on_success_remove_predicates=[], on_failure_predicates=[], child=None):
+        super(KBUpdateDecorator, self).__init__(name=name, child=child)
+        self.on_success_predicates = on_success_predicates
+        self.on_failure_remove_predicates = on_failure_remove_predicates
+        self.on_success_remove_predicates = on_success_remove_predicates
+        self.on_failure_predicates = on_failure_predicates
+        self.ticket = None  # Accusé du dernier lot envoyé à la KB
+
+    def envoyer(self, mises_a_jour):
+        # Le lot est mis en file avant d'être appliqué au miroir : une réconciliation intercalée voit la file
+        # non vide (ou une version changée) et ne peut pas effacer l'effet local
+        self.ticket = KB_CLIENT.soumettre(mises_a_jour)
+        KB_MIROIR.appliquer(mises_a_jour)
+
+    def update(self):
+        child_status = self.decorated.status
+
+        # Les ajouts et retraits d'une issue partent en un seul lot, sans bloquer le tick ; le miroir local
+        # les applique immédiatement
+        if child_status == py_trees.common.Status.SUCCESS:
+            rospy.logdebug("[KBUpdateDecorator] '{}' succeeded. Updating KB...".format(self.name))
+            self.envoyer(
+                [(predicate_name, parameters, True) for predicate_name, parameters in self.on_success_predicates] +
+                [(predicate_name, parameters, False) for predicate_name, parameters in self.on_success_remove_predicates])
+            return py_trees.common.Status.SUCCESS
+
+        elif child_status == py_trees.common.Status.FAILURE:
+            rospy.logdebug("[KBUpdateDecorator] '{}' failed. Updating KB...".format(self.name))
+            self.envoyer(
+                [(predicate_name, parameters, False) for predicate_name, parameters in self.on_failure_remove_predicates] +
+                [(predicate_name, parameters, True) for predicate_name, parameters in self.on_failure_predicates])
+            return py_trees.common.Status.FAILURE
+
+        else:
+            return child_status
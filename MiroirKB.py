@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Miroir local des prédicats de la base de connaissances ROSPlan
+#
+# Le Behavior Tree tient en mémoire une copie des faits de la KB : initialisée depuis le :init de problem.pddl,
+# mise à jour par les effets des KBUpdateDecorator au moment où ils sont envoyés, et réconciliée en tâche de
+# fond avec la KB distante. Les faits sont indexés par prédicat et par (prédicat, position, valeur) : une
+# condition se vérifie sans appel de service. Le miroir est publié sur le blackboard de py_trees.
+#
+# instantane() bifurque le miroir en O(1) (copie à l'écriture, par prédicat) : le jumeau numérique peut
+# simuler plusieurs reprises sur des bifurcations, puis fusionner le journal de la reprise retenue.
+#
+# Exemple :
+#   miroir = MiroirKB(PREDICATE_PARAMETER_ORDER)
+#   miroir.charger_probleme("problem.pddl")
+#   miroir.contient("at", {"a": "agent_r", "l": "loc_base"})
+#   miroir.requete("holding", {"a": "agent_r"})
+#   essai = miroir.instantane(); essai.retirer("at", ("agent_r", "loc_base")); miroir.fusionner(essai)
+
+import collections
+import threading
+import time
+
+import py_trees
+
+# Nom du miroir sur le blackboard de py_trees
+CLE_BLACKBOARD = "kb_miroir"
+
+# Service de ROSPlan renvoyant les faits de la KB distante
+SERVICE_PROPOSITIONS = '/rosplan_knowledge_base/state/propositions'
+
+# Période de réconciliation avec la KB distante, en secondes
+PERIODE_RECONCILIATION = 1.0
+
+class MiroirKB(object):
+    """
+    Ensemble de faits indexé. Un fait est un prédicat et le tuple de ses arguments dans l'ordre du domaine ;
+    les paramètres nommés des décorateurs ({'a': ..., 'l': ...}) sont ordonnés par ordre_parametres.
+
+    :param ordre_parametres: Ordre des paramètres par prédicat (PREDICATE_PARAMETER_ORDER du Behavior Tree).
+    :param faits: Faits initiaux, sous forme de tuples (prédicat, argument, ...).
+    """
+    def __init__(self, ordre_parametres=None, faits=()):
+        self.ordre_parametres = ordre_parametres if ordre_parametres is not None else {}
+        self.version = 0      # Incrémentée à chaque modification locale
+        self.parent = None    # Miroir dont celui-ci est une bifurcation (instantane)
+        self.journal = None   # Mises à jour (prédicat, arguments, ajout) depuis la bifurcation
+        self._verrou = threading.RLock()
+        # prédicat -> (propriétaire, ensemble des tuples d'arguments, index {(position, valeur): ensemble}).
+        # Une entrée dont le propriétaire n'est pas self._jeton est partagée avec un instantané : elle est
+        # copiée avant d'être modifiée. De même pour le dictionnaire lui-même tant que _dict_partage est vrai.
+        self._predicats = {}
+        self._jeton = object()
+        self._dict_partage = False
+        for fait in faits:
+            self._ajouter(fait[0], tuple(fait[1:]))
+
+    # ----- Conversion des paramètres -----
+
+    def arguments(self, predicat, parametres):
+        """
+        Tuple des arguments d'un fait, depuis des paramètres nommés (dictionnaire) ou positionnels.
+
+        :return: Tuple, ou None si un paramètre de l'ordre du prédicat manque (la KB ignore alors la mise à jour).
+        """
+        if not isinstance(parametres, dict):
+            return tuple(parametres or ())
+        ordre = self.ordre_parametres.get(predicat) or []
+        if any(cle not in parametres for cle in ordre):
+            return None
+        return tuple(parametres[cle] for cle in ordre) + tuple(parametres[cle] for cle in sorted(parametres) if cle not in ordre)
+
+    def motif(self, predicat, liaisons):
+        # Arguments liés par position (None pour un argument libre), depuis des liaisons nommées ou positionnelles
+        if not isinstance(liaisons, dict):
+            return tuple(liaisons or ())
+        ordre = self.ordre_parametres.get(predicat) or []
+        inconnus = [cle for cle in liaisons if cle not in ordre]
+        if inconnus:
+            raise ValueError("Paramètres inconnus pour le prédicat '{}' : {}".format(predicat, inconnus))
+        return tuple(liaisons.get(cle) for cle in ordre)
+
+    # ----- Modification -----
+
+    def _entree(self, predicat):
+        # Entrée modifiable d'un prédicat, copiée si elle est partagée avec un instantané
+        if self._dict_partage:
+            self._predicats = dict(self._predicats)
+            self._dict_partage = False
+        entree = self._predicats.get(predicat)
+        if entree is None:
+            entree = (self._jeton, set(), {})
+        elif entree[0] is not self._jeton:
+            entree = (self._jeton, set(entree[1]), dict((cle, set(ensemble)) for cle, ensemble in entree[2].items()))
+        else:
+            return entree
+        self._predicats[predicat] = entree
+        return entree
+
+    def _ajouter(self, predicat, arguments):
+        entree = self._predicats.get(predicat)
+        if entree is not None and arguments in entree[1]:
+            return False
+        _, faits, index = self._entree(predicat)
+        faits.add(arguments)
+        for position, valeur in enumerate(arguments):
+            index.setdefault((position, valeur), set()).add(arguments)
+        if self.journal is not None:
+            self.journal.append((predicat, arguments, True))
+        return True
+
+    def _retirer(self, predicat, arguments):
+        entree = self._predicats.get(predicat)
+        if entree is None or arguments not in entree[1]:
+            return False
+        _, faits, index = self._entree(predicat)
+        faits.discard(arguments)
+        for position, valeur in enumerate(arguments):
+            cle = (position, valeur)
+            index[cle].discard(arguments)
+            if not index[cle]:
+                del index[cle]
+        if self.journal is not None:
+            self.journal.append((predicat, arguments, False))
+        return True
+
+    def appliquer(self, mises_a_jour):
+        """
+        Applique un lot de mises à jour, dans l'ordre.
+
+        :param mises_a_jour: Itérable de tuples (prédicat, paramètres, ajout), comme ClientKB.soumettre.
+        """
+        with self._verrou:
+            for predicat, parametres, ajout in mises_a_jour:
+                arguments = self.arguments(predicat.strip(), parametres)
+                if arguments is None:
+                    continue
+                if ajout:
+                    self._ajouter(predicat.strip(), arguments)
+                else:
+                    self._retirer(predicat.strip(), arguments)
+            self.version += 1
+
+    def ajouter(self, predicat, parametres=None):
+        self.appliquer([(predicat, parametres, True)])
+
+    def retirer(self, predicat, parametres=None):
+        self.appliquer([(predicat, parametres, False)])
+
+    def charger_probleme(self, problem_file):
+        """
+        Remplace le contenu du miroir par le :init d'un problème PDDL.
+        """
+        import Planificateur
+        with open(problem_file, 'r') as file:
+            probleme = Planificateur.lire_probleme(file.read())
+        with self._verrou:
+            self._predicats = {}
+            self._dict_partage = False
+            for fait in probleme.init:
+                self._ajouter(fait[0], tuple(fait[1:]))
+            self.version += 1
+
+    def reconcilier(self, faits, version=None):
+        """
+        Aligne le miroir sur l'état de la KB distante.
+
+        :param faits: Faits de la KB distante, sous forme de tuples (prédicat, argument, ...).
+        :param version: Version du miroir au moment où l'état distant a été demandé ; si le miroir a été modifié
+                        depuis, l'état distant est périmé et la réconciliation est abandonnée.
+        :return: Couple (faits ajoutés, faits retirés), ou None si la réconciliation est abandonnée.
+        """
+        distants = set((fait[0], tuple(fait[1:])) for fait in faits)
+        with self._verrou:
+            if version is not None and version != self.version:
+                return None
+            locaux = set((predicat, arguments) for predicat, entree in self._predicats.items() for arguments in entree[1])
+            ajoutes = distants - locaux
+            retires = locaux - distants
+            for predicat, arguments in retires:
+                self._retirer(predicat, arguments)
+            for predicat, arguments in ajoutes:
+                self._ajouter(predicat, arguments)
+            if ajoutes or retires:
+                self.version += 1
+        return ajoutes, retires
+
+    # ----- Consultation -----
+
+    def contient(self, predicat, parametres=None):
+        arguments = self.arguments(predicat, parametres)
+        entree = self._predicats.get(predicat)
+        return arguments is not None and entree is not None and arguments in entree[1]
+
+    def requete(self, predicat, liaisons=None):
+        """
+        Faits d'un prédicat dont les arguments correspondent aux liaisons.
+
+        :param liaisons: Dictionnaire {paramètre: valeur} ou tuple positionnel (None pour un argument libre).
+        :return: Liste de tuples d'arguments.
+        """
+        motif = self.motif(predicat, liaisons)
+        with self._verrou:
+            entree = self._predicats.get(predicat)
+            if entree is None:
+                return []
+            candidats = [entree[2].get((position, valeur), set())
+                         for position, valeur in enumerate(motif) if valeur is not None]
+            if not candidats:
+                return list(entree[1])
+            candidats.sort(key=len)
+            return list(candidats[0].intersection(*candidats[1:]))
+
+    def faits(self):
+        """
+        :return: Ensemble des faits, sous forme de tuples (prédicat, argument, ...).
+        """
+        with self._verrou:
+            return set((predicat,) + arguments for predicat, entree in self._predicats.items() for arguments in entree[1])
+
+    def __len__(self):
+        return sum(len(entree[1]) for entree in self._predicats.values())
+
+    # ----- Instantanés -----
+
+    def instantane(self):
+        """
+        Bifurcation en O(1) : le nouveau miroir partage les faits de celui-ci, et chacun ne copie un prédicat
+        qu'au moment de le modifier. La bifurcation journalise ses mises à jour pour être fusionnée ensuite.
+
+        :return: MiroirKB dont parent est ce miroir.
+        """
+        with self._verrou:
+            clone = MiroirKB(self.ordre_parametres)
+            clone._predicats = self._predicats
+            clone._dict_partage = True
+            clone.parent = self
+            clone.journal = []
+            # Un nouveau jeton rend partagées les entrées de ce miroir, qui les copiera avant écriture
+            self._dict_partage = True
+            self._jeton = object()
+            return clone
+
+    def delta(self):
+        """
+        Changements nets d'une bifurcation depuis sa création.
+
+        :return: Couple (faits ajoutés, faits retirés), sous forme de tuples (prédicat, argument, ...).
+        """
+        ajoutes, retires = set(), set()
+        for predicat, arguments, ajout in self.journal or ():
+            fait = (predicat,) + arguments
+            if ajout:
+                ajoutes.add(fait)
+                retires.discard(fait)
+            else:
+                retires.add(fait)
+                ajoutes.discard(fait)
+        return ajoutes, retires
+
+    def fusionner(self, clone):
+        """
+        Rejoue sur ce miroir le journal d'une de ses bifurcations (celle dont le plan de reprise est retenu).
+
+        :return: Nombre de mises à jour rejouées.
+        :raises ValueError: Si clone n'est pas une bifurcation de ce miroir.
+        """
+        if clone.parent is not self:
+            raise ValueError("Le miroir à fusionner n'est pas une bifurcation de celui-ci")
+        with self._verrou:
+            for predicat, arguments, ajout in clone.journal:
+                if ajout:
+                    self._ajouter(predicat, arguments)
+                else:
+                    self._retirer(predicat, arguments)
+            self.version += 1
+        return len(clone.journal)
+
+def publier(miroir):
+    """
+    Publie le miroir sur le blackboard de py_trees, où le lisent les conditions.
+    """
+    setattr(py_trees.blackboard.Blackboard(), CLE_BLACKBOARD, miroir)
+    return miroir
+
+def miroir_publie():
+    return getattr(py_trees.blackboard.Blackboard(), CLE_BLACKBOARD, None)
+
+class VerifierPredicat(py_trees.behaviour.Behaviour):
+    """
+    Condition lue dans le miroir : SUCCESS si le fait est présent (ou absent si attendu=False), FAILURE sinon.
+    Sans miroir explicite, celui du blackboard est utilisé.
+    """
+    def __init__(self, name, predicat, parametres=None, attendu=True, miroir=None):
+        super(VerifierPredicat, self).__init__(name=name)
+        self.predicat = predicat
+        self.parametres = parametres
+        self.attendu = attendu
+        self.miroir = miroir
+
+    def update(self):
+        miroir = self.miroir if self.miroir is not None else miroir_publie()
+        if miroir is None:
+            self.feedback_message = "Aucun miroir de la KB sur le blackboard"
+            return py_trees.common.Status.FAILURE
+        if miroir.contient(self.predicat, self.parametres) == self.attendu:
+            return py_trees.common.Status.SUCCESS
+        return py_trees.common.Status.FAILURE
+
+class PointSynchronisation(py_trees.behaviour.Behaviour):
+    """
+    Rendez-vous des agents d'une opération Co (PartitionAgents) : à son démarrage, l'agent ajoute
+    (synchronised agent etape) au miroir et à la KB, puis reste RUNNING jusqu'à ce que le miroir contienne le
+    fait de chacun de ses partenaires. Sans miroir explicite, celui du blackboard est utilisé.
+
+    :param client: ClientKB qui transmet le fait de l'agent à la KB partagée (None : miroir seul).
+    :param timeout: Durée d'attente maximale en secondes avant FAILURE (None : attente illimitée).
+    """
+    def __init__(self, name, agent, etape, partenaires, client=None, miroir=None, timeout=None):
+        super(PointSynchronisation, self).__init__(name=name)
+        self.agent = agent
+        self.etape = etape
+        self.partenaires = list(partenaires)
+        self.client = client
+        self.miroir = miroir
+        self.timeout = timeout
+        self.debut = None
+
+    def initialise(self):
+        self.debut = time.time()
+        miroir = self.miroir if self.miroir is not None else miroir_publie()
+        mises_a_jour = [("synchronised", {"a": self.agent, "op": self.etape}, True)]
+        # Soumission avant l'application locale, comme KBUpdateDecorator (voir Reconciliateur)
+        if self.client is not None:
+            self.client.soumettre(mises_a_jour)
+        if miroir is not None:
+            miroir.appliquer(mises_a_jour)
+
+    def update(self):
+        miroir = self.miroir if self.miroir is not None else miroir_publie()
+        if miroir is None:
+            self.feedback_message = "Aucun miroir de la KB sur le blackboard"
+            return py_trees.common.Status.FAILURE
+        absents = [partenaire for partenaire in self.partenaires
+                   if not miroir.contient("synchronised", {"a": partenaire, "op": self.etape})]
+        if not absents:
+            return py_trees.common.Status.SUCCESS
+        if self.timeout is not None and time.time() - self.debut > self.timeout:
+            self.feedback_message = "Partenaires absents : {}".format(", ".join(absents))
+            return py_trees.common.Status.FAILURE
+        self.feedback_message = "En attente de {}".format(", ".join(absents))
+        return py_trees.common.Status.RUNNING
+
+class SourceROS(object):
+    """
+    Lit les faits de la KB distante via le service des propositions de ROSPlan.
+    """
+    def __init__(self, service_name=SERVICE_PROPOSITIONS, timeout=5.0):
+        self.service_name = service_name
+        self.timeout = timeout
+        self._proxy = None
+
+    def __call__(self):
+        import rospy
+        from rosplan_knowledge_msgs.srv import GetAttributeService, GetAttributeServiceRequest
+
+        if self._proxy is None:
+            rospy.wait_for_service(self.service_name, timeout=self.timeout)
+            self._proxy = rospy.ServiceProxy(self.service_name, GetAttributeService, persistent=True)
+        request = GetAttributeServiceRequest()
+        request.predicate_name = ""  # Tous les prédicats
+        try:
+            response = self._proxy(request)
+        except rospy.ServiceException:
+            self._proxy = None
+            raise
+        return [(item.attribute_name,) + tuple(kv.value for kv in item.values)
+                for item in response.attributes if not item.is_negative]
+
+class Reconciliateur(object):
+    """
+    Réconcilie périodiquement le miroir avec la KB distante, dans un thread de fond. Une réconciliation n'a
+    lieu que lorsque le client de la KB n'a plus de mise à jour en attente et que le miroir n'a pas changé
+    pendant la lecture de l'état distant. Les mises à jour doivent donc être soumises au client avant d'être
+    appliquées au miroir : dans l'ordre inverse, une réconciliation intercalée entre les deux appels
+    trouverait la file vide et la version à jour, et effacerait l'effet local.
+
+    :param source: Appelable renvoyant les faits distants (SourceROS).
+    :param client: ClientKB dont la file doit être vide avant de réconcilier (optionnel).
+    """
+    def __init__(self, miroir, source, client=None, periode=PERIODE_RECONCILIATION):
+        self.miroir = miroir
+        self.source = source
+        self.client = client
+        self.periode = periode
+        self.derniere_erreur = None
+        self._arret = threading.Event()
+        self._thread = None
+
+    def reconcilier(self):
+        """
+        :return: Couple (faits ajoutés, faits retirés), ou None si la réconciliation a été reportée.
+        """
+        version = self.miroir.version
+        if self.client is not None and not self.client.vider(0):
+            return None
+        try:
+            faits = self.source()
+        except Exception as e:
+            self.derniere_erreur = e
+            return None
+        return self.miroir.reconcilier(faits, version)
+
+    def _boucle(self):
+        while not self._arret.wait(self.periode):
+            self.reconcilier()
+
+    def demarrer(self):
+        if self._thread is None:
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name="Reconciliateur")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def arreter(self, timeout=None):
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Évaluation Monte Carlo des plans dans le jumeau numérique
+#
+# Chaque plan (spécification JSON de P3) est exécuté des milliers de fois par SimulationBT, avec des durées
+# d'actions et des échecs (de perception en particulier) tirés aléatoirement. Les exécutions sont réparties
+# par lots dans un pool de processus ; chaque processus construit l'arbre d'un plan une seule fois et le
+# réinitialise entre deux exécutions, sur une bifurcation O(1) de la KB initiale. Le rapport donne la
+# probabilité de succès (avec son intervalle de confiance à 95 %), les quantiles du makespan des exécutions
+# réussies et les nœuds qui échouent le plus souvent, et classe les plans.
+#
+# L'exécution i de chaque plan utilise la même graine : les plans sont comparés sur les mêmes tirages.
+#
+# Exemple :
+#   python MonteCarloBT.py alpha06/behavior_tree.json alpha08/behavior_tree.json --executions 5000
+#          --dispersion 0.2 --echec VerifierAruco=0.1 --echec FinalGrasp=0.02 --graine 1
+
+import argparse
+import collections
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import py_trees
+
+import ConstructionBT
+import SimulationBT
+from MiroirKB import MiroirKB
+
+# Quantiles du makespan reportés
+QUANTILES_MAKESPAN = (0.5, 0.9, 0.95, 0.99)
+
+# Nombre d'exécutions envoyées à un processus à la fois
+EXECUTIONS_PAR_LOT = 100
+
+# Quantile de la loi normale pour l'intervalle de confiance à 95 %
+Z_95 = 1.959964
+
+EvaluationPlan = collections.namedtuple('EvaluationPlan', [
+    'nom',               # Nom du plan
+    'executions',        # Nombre d'exécutions simulées
+    'succes',            # Nombre d'exécutions réussies
+    'probabilite',       # Probabilité de succès estimée
+    'intervalle',        # Intervalle de confiance à 95 % (Wilson) de la probabilité de succès
+    'makespan',          # OrderedDict : moyenne, min, max et quantiles du makespan des exécutions réussies
+    'echecs_noeuds',     # Counter : nombre d'échecs de chaque comportement (échecs rattrapés compris)
+    'actions_en_echec',  # Counter : action du plan dont l'échec a terminé l'exécution
+    'duree_calcul',      # Durée réelle de l'évaluation, en secondes
+])
+
+def nom_plan(chemin):
+    # out/alpha06/behavior_tree.json -> alpha06 ; plans/alpha06.json -> alpha06
+    nom = os.path.splitext(os.path.basename(chemin))[0]
+    if nom == 'behavior_tree':
+        nom = os.path.basename(os.path.dirname(os.path.abspath(chemin))) or nom
+    return nom
+
+def graine_execution(graine, indice):
+    # Graine de l'exécution indice, indépendante du découpage en lots et du nombre de processus
+    return graine * 1000003 + indice
+
+def quantile(valeurs_triees, q):
+    """
+    Quantile par interpolation linéaire d'une liste triée.
+    """
+    if not valeurs_triees:
+        return None
+    position = q * (len(valeurs_triees) - 1)
+    bas = int(math.floor(position))
+    haut = min(bas + 1, len(valeurs_triees) - 1)
+    return valeurs_triees[bas] + (valeurs_triees[haut] - valeurs_triees[bas]) * (position - bas)
+
+def intervalle_wilson(succes, executions, z=Z_95):
+    if not executions:
+        return (0.0, 1.0)
+    p = float(succes) / executions
+    denominateur = 1 + z * z / executions
+    centre = (p + z * z / (2 * executions)) / denominateur
+    demi_largeur = z * math.sqrt(p * (1 - p) / executions + z * z / (4.0 * executions * executions)) / denominateur
+    return (max(0.0, centre - demi_largeur), min(1.0, centre + demi_largeur))
+
+# ==================================
+# Exécutions, dans les processus du pool
+# ==================================
+
+# Plans et modèle du processus, puis simulateur et KB initiale de chaque plan, construits au premier lot
+_plans = None
+_modele = None
+_simulateurs = {}
+
+def initialiser_processus(plans, modele):
+    """
+    :param plans: Liste de couples (spécification, chemin du problème ou None).
+    :param modele: SimulationBT.ModeleSimulation commun aux plans.
+    """
+    global _plans, _modele
+    _plans = plans
+    _modele = modele
+    _simulateurs.clear()
+
+def simulateur_plan(indice_plan):
+    if indice_plan not in _simulateurs:
+        specification, problem_file = _plans[indice_plan]
+        kb = None
+        if problem_file:
+            kb = MiroirKB(dict(specification["predicate_parameter_order"]))
+            kb.charger_probleme(problem_file)
+        simulateur = SimulationBT.Simulateur(specification, _modele, kb)
+        _simulateurs[indice_plan] = (simulateur, simulateur.kb)
+    return _simulateurs[indice_plan]
+
+def executer_lot(tache):
+    """
+    Exécute les simulations [debut, fin) d'un plan.
+
+    :param tache: Tuple (indice du plan, graine, début, fin).
+    :return: Liste de tuples (réussite, makespan, comportements en échec, action du plan en échec ou None).
+    """
+    indice_plan, graine, debut, fin = tache
+    simulateur, kb_initiale = simulateur_plan(indice_plan)
+    resultats = []
+    for indice in range(debut, fin):
+        # La KB initiale n'est jamais modifiée : chaque exécution part d'une bifurcation
+        simulateur.reinitialiser(graine_execution(graine, indice), kb_initiale.instantane())
+        resultat = simulateur.executer()
+        action_en_echec = None
+        for nom, _, _, statut in reversed(resultat.intervalles):
+            if statut == py_trees.common.Status.FAILURE.value:
+                action_en_echec = nom
+                break
+        resultats.append((resultat.statut == py_trees.common.Status.SUCCESS.value, resultat.duree,
+                          tuple(resultat.echecs), action_en_echec))
+    return resultats
+
+# ==================================
+# Évaluation et rapport
+# ==================================
+
+def agreger(nom, resultats, duree_calcul):
+    makespans = sorted(duree for reussite, duree, _, _ in resultats if reussite)
+    succes = len(makespans)
+    makespan = collections.OrderedDict([
+        ("moyenne", sum(makespans) / succes if succes else None),
+        ("min", makespans[0] if makespans else None),
+        ("max", makespans[-1] if makespans else None),
+    ])
+    for q in QUANTILES_MAKESPAN:
+        makespan["p{:g}".format(q * 100)] = quantile(makespans, q)
+    echecs_noeuds = collections.Counter()
+    actions_en_echec = collections.Counter()
+    for _, _, echecs, action_en_echec in resultats:
+        echecs_noeuds.update(echecs)
+        if action_en_echec is not None:
+            actions_en_echec[action_en_echec] += 1
+    executions = len(resultats)
+    return EvaluationPlan(nom, executions, succes, float(succes) / executions if executions else 0.0,
+                          intervalle_wilson(succes, executions), makespan, echecs_noeuds, actions_en_echec,
+                          duree_calcul)
+
+def evaluer_plans(specifications, executions=1000, modele=None, processus=None, graine=None, problem_file=None,
+                  lot=EXECUTIONS_PAR_LOT):
+    """
+    Évalue chaque plan par executions simulations tirées aléatoirement.
+
+    :param specifications: Liste de spécifications (dictionnaires) ou de chemins de fichiers JSON.
+    :param modele: SimulationBT.ModeleSimulation (lois par défaut si None). Les lois doivent pouvoir être
+                   transmises aux processus (pas de lambda) si processus vaut plus de 1.
+    :param processus: Taille du pool (par défaut, nombre de coeurs) ; 1 pour tout exécuter dans ce processus.
+    :param graine: Graine des tirages, pour rejouer une évaluation (tirée au hasard si None).
+    :param problem_file: Problème initialisant la KB de tous les plans (par défaut, celui de chaque spécification).
+    :return: Liste des EvaluationPlan, dans l'ordre des spécifications.
+    """
+    plans = []
+    noms = []
+    for specification in specifications:
+        if isinstance(specification, dict):
+            noms.append("plan_{}".format(len(noms)))
+        else:
+            noms.append(nom_plan(specification))
+            specification = ConstructionBT.charger_specification(specification)
+        probleme = problem_file or specification.get("problem")
+        plans.append((specification, probleme if probleme and os.path.exists(probleme) else None))
+    modele = modele if modele is not None else SimulationBT.ModeleSimulation()
+    if graine is None:
+        graine = random.randrange(1 << 30)
+
+    taches = [(indice_plan, graine, debut, min(debut + lot, executions))
+              for indice_plan in range(len(plans)) for debut in range(0, executions, lot)]
+    debut = time.time()
+    if processus == 1:
+        initialiser_processus(plans, modele)
+        resultats_lots = [executer_lot(tache) for tache in taches]
+    else:
+        pool = multiprocessing.Pool(processus, initialiser_processus, (plans, modele))
+        try:
+            resultats_lots = pool.map(executer_lot, taches, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    duree_calcul = time.time() - debut
+
+    resultats = [[] for _ in plans]
+    for tache, resultats_lot in zip(taches, resultats_lots):
+        resultats[tache[0]].extend(resultats_lot)
+    # Le temps de calcul est réparti entre les plans au prorata de leurs exécutions (même nombre pour tous)
+    return [agreger(nom, resultats_plan, duree_calcul / len(plans)) for nom, resultats_plan in zip(noms, resultats)]
+
+def classer(evaluations):
+    """
+    Classe les plans par probabilité de succès décroissante, puis par makespan p90 croissant.
+    """
+    def cle(evaluation):
+        p90 = evaluation.makespan.get("p90")
+        return (-evaluation.probabilite, p90 if p90 is not None else float('inf'))
+    return sorted(evaluations, key=cle)
+
+def formater_evaluations(evaluations, noeuds_affiches=5):
+    """
+    Formate le classement des plans (une ligne par plan) et leurs nœuds les plus souvent en échec.
+    """
+    def nombre(valeur, format_nombre):
+        return "-" if valeur is None else format_nombre.format(valeur)
+
+    entete = ("Rang", "Plan", "Exécutions", "P(succès)", "IC 95 %", "Moyenne (s)") + tuple(
+        "p{:g} (s)".format(q * 100) for q in QUANTILES_MAKESPAN)
+    lignes = [entete]
+    for rang, evaluation in enumerate(evaluations, 1):
+        lignes.append((str(rang), evaluation.nom, str(evaluation.executions), "{:.3f}".format(evaluation.probabilite),
+                       "[{:.3f}, {:.3f}]".format(*evaluation.intervalle),
+                       nombre(evaluation.makespan["moyenne"], "{:.1f}")) + tuple(
+            nombre(evaluation.makespan["p{:g}".format(q * 100)], "{:.1f}") for q in QUANTILES_MAKESPAN))
+    largeurs = [max(len(ligne[i]) for ligne in lignes) for i in range(len(entete))]
+    texte = []
+    for ligne in lignes:
+        texte.append("  ".join(cellule.ljust(largeur) for cellule, largeur in zip(ligne, largeurs)).rstrip())
+    for evaluation in evaluations:
+        if evaluation.echecs_noeuds:
+            texte.append("{} : nœuds les plus souvent en échec : {}".format(evaluation.nom, ", ".join(
+                "{} ({:.1%})".format(nom, float(nombre_echecs) / evaluation.executions)
+                for nom, nombre_echecs in evaluation.echecs_noeuds.most_common(noeuds_affiches))))
+        if evaluation.actions_en_echec:
+            texte.append("{} : actions ayant interrompu le plan : {}".format(evaluation.nom, ", ".join(
+                "{} ({})".format(nom, nombre_echecs)
+                for nom, nombre_echecs in evaluation.actions_en_echec.most_common(noeuds_affiches))))
+    return "\n".join(texte)
+
+def ecrire_evaluations_csv(evaluations, chemin):
+    with open(chemin, 'w') as file:
+        file.write("plan;executions;succes;probabilite;ic_bas;ic_haut;{};noeud_plus_en_echec\n".format(
+            ";".join("makespan_{}".format(cle) for cle in evaluations[0].makespan) if evaluations else ""))
+        for evaluation in evaluations:
+            plus_en_echec = evaluation.echecs_noeuds.most_common(1)
+            file.write("{};{};{};{:.6f};{:.6f};{:.6f};{};{}\n".format(
+                evaluation.nom, evaluation.executions, evaluation.succes, evaluation.probabilite,
+                evaluation.intervalle[0], evaluation.intervalle[1],
+                ";".join("" if valeur is None else "{:.6f}".format(valeur) for valeur in evaluation.makespan.values()),
+                plus_en_echec[0][0] if plus_en_echec else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation Monte Carlo et classement de plans décrits en JSON.")
+    parser.add_argument('specifications', nargs='+', help="Spécifications JSON des plans (P3, --json)")
+    parser.add_argument('--executions', type=int, default=1000, help="Nombre d'exécutions simulées par plan")
+    parser.add_argument('--processus', type=int, default=None, help="Nombre de processus (défaut : nombre de coeurs)")
+    parser.add_argument('--graine', type=int, default=None, help="Graine des tirages")
+    parser.add_argument('--probleme', default=None, help="problem.pddl initialisant la KB (défaut : celui de chaque plan)")
+    parser.add_argument('--dispersion', type=float, default=0.1, help="Coefficient de variation des durées constantes")
+    parser.add_argument('--duree', action='append', metavar='NOM=SECONDES',
+                        help="Durée d'un comportement (nom de nœud ou de classe) ; MOYENNE,ECART pour une loi normale")
+    parser.add_argument('--echec', action='append', metavar='NOM=PROBA',
+                        help="Probabilité d'échec d'un comportement (VerifierAruco pour la perception)")
+    parser.add_argument('--csv', default=None, help="Fichier CSV du classement")
+    args = parser.parse_args()
+
+    modele = SimulationBT.ModeleSimulation(SimulationBT.lire_lois(args.duree, SimulationBT.lire_duree),
+                                           SimulationBT.lire_lois(args.echec, float), dispersion=args.dispersion)
+    debut = time.time()
+    evaluations = classer(evaluer_plans(args.specifications, args.executions, modele, args.processus, args.graine,
+                                        args.probleme))
+    print(formater_evaluations(evaluations))
+    if args.csv:
+        ecrire_evaluations_csv(evaluations, args.csv)
+    print("{} exécution(s) simulée(s) en {:.3f} s.".format(args.executions * len(evaluations), time.time() - debut))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Consignes des opérateurs humains, pour les Behavior Trees de leurs partitions (PartitionAgents)
+#
+# Un opérateur n'exécute aucune action du robot : chacune de ses opérations devient un nœud ConsigneOperateur,
+# précédé du point de synchronisation si elle est collaborative. Le nœud publie la consigne "agent opération"
+# sur TOPIC_CONSIGNES, puis reste RUNNING jusqu'à ce que l'IHM du poste publie le même texte sur
+# TOPIC_ACQUITTEMENTS. CanalOperateur n'ouvre qu'un éditeur et qu'un abonné pour tout le processus.
+#
+# Exemple :
+#   consigne = ConsigneOperateur("Operator_OPERATOR_OP22_CO_0_002", "agent_h", "OP22_CO")
+
+import threading
+import time
+
+import py_trees
+
+# Topics des consignes et des acquittements (std_msgs/String, texte "agent opération")
+TOPIC_CONSIGNES = '/operateur/consignes'
+TOPIC_ACQUITTEMENTS = '/operateur/acquittements'
+
+def editeur_ros(topic):
+    # Éditeur ROS des consignes ; renvoie la fonction de publication d'un texte
+    import rospy
+    from std_msgs.msg import String
+    editeur = rospy.Publisher(topic, String, queue_size=10, latch=True)
+    return lambda texte: editeur.publish(String(data=texte))
+
+def abonnement_ros(topic, rappel):
+    # Abonné ROS des acquittements ; rappel(texte) est appelé à chaque message
+    import rospy
+    from std_msgs.msg import String
+    return rospy.Subscriber(topic, String, lambda message: rappel(message.data), queue_size=10)
+
+def texte_consigne(agent, operation):
+    return "{} {}".format(agent, operation)
+
+class CanalOperateur(object):
+    """
+    Publication des consignes et réception des acquittements des opérateurs.
+
+    :param editeur: Appelable (topic) renvoyant la fonction de publication d'un texte. Par défaut, ROS.
+    :param abonnement: Appelable (topic, rappel) créant l'abonné des acquittements. Par défaut, ROS.
+    """
+    def __init__(self, editeur=editeur_ros, abonnement=abonnement_ros):
+        self.editeur = editeur
+        self.abonnement = abonnement
+        self._verrou = threading.Lock()
+        self._publier = None
+        self._abonne = None
+        self._acquittes = set()
+
+    def ouvrir(self):
+        with self._verrou:
+            if self._publier is None:
+                self._publier = self.editeur(TOPIC_CONSIGNES)
+                self._abonne = self.abonnement(TOPIC_ACQUITTEMENTS, self.recevoir)
+
+    def recevoir(self, texte):
+        # Rappel de l'abonné : l'ajout à un ensemble suffit, sans verrou
+        self._acquittes.add(texte.strip())
+
+    def demander(self, agent, operation):
+        """
+        Publie la consigne ; un acquittement antérieur de la même opération est oublié.
+        """
+        self.ouvrir()
+        texte = texte_consigne(agent, operation)
+        self._acquittes.discard(texte)
+        self._publier(texte)
+
+    def est_acquittee(self, agent, operation):
+        return texte_consigne(agent, operation) in self._acquittes
+
+    def fermer(self):
+        with self._verrou:
+            abonne, self._abonne, self._publier = self._abonne, None, None
+        if abonne is not None and hasattr(abonne, 'unregister'):
+            abonne.unregister()
+        self._acquittes.clear()
+
+# Canal du processus, créé au premier usage
+_canal = None
+_verrou_canal = threading.Lock()
+
+def canal_partage():
+    global _canal
+    with _verrou_canal:
+        if _canal is None:
+            _canal = CanalOperateur()
+        return _canal
+
+class ConsigneOperateur(py_trees.behaviour.Behaviour):
+    """
+    Opération d'un opérateur humain : à son démarrage, la consigne est publiée ; SUCCESS à l'acquittement,
+    FAILURE si aucun n'arrive dans les timeout secondes (None : attente illimitée), RUNNING entre les deux.
+    """
+    def __init__(self, name, agent, operation, timeout=None, canal=None):
+        super(ConsigneOperateur, self).__init__(name=name)
+        self.agent = agent
+        self.operation = operation
+        self.timeout = timeout
+        self.canal = canal
+        self.debut = None
+
+    def canal_utilise(self):
+        return self.canal if self.canal is not None else canal_partage()
+
+    def setup(self, timeout=None, **kwargs):
+        self.canal_utilise().ouvrir()
+        return True
+
+    def initialise(self):
+        self.debut = time.time()
+        self.canal_utilise().demander(self.agent, self.operation)
+
+    def update(self):
+        if self.canal_utilise().est_acquittee(self.agent, self.operation):
+            self.feedback_message = "{} acquittée par {}".format(self.operation, self.agent)
+            return py_trees.common.Status.SUCCESS
+        if self.timeout is not None and time.time() - self.debut >= self.timeout:
+            self.feedback_message = "Pas d'acquittement de {} par {}".format(self.operation, self.agent)
+            return py_trees.common.Status.FAILURE
+        self.feedback_message = "En attente de l'acquittement de {}".format(self.operation)
+        return py_trees.common.Status.RUNNING
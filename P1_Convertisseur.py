@@ -1,65 +1,384 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-# Lire le fichier solution.sol
-with open('/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/solution.sol', 'r') as file:
-    lines = file.readlines()
 
-# Initialiser un dictionnaire pour stocker les valeurs Sijk, Cijk, et Xijk
-operation_times = {}
+import array
+import collections
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Chemins des fichiers
+solution_file = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/solution.sol'
+readable_file = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/solution_readable.txt'
+
+# Cache disque des solutions analysées et filtrées
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'dynamic_behavior_tree', 'p1')
+CACHE_TAILLE_MAX = 256 * 1024 * 1024  # Octets
+CACHE_VERSION = 1  # À incrémenter si le format ou le filtrage change
+
+# Seuil en dessous duquel une valeur est considérée comme nulle
+SEUIL_ZERO = 1e-3
+
+def lire_variables_sol(chemin_sol, familles=('Sijk', 'Cijk', 'Xijk')):
+    """
+    Lit un fichier .sol en flux et ne renvoie que les familles de variables demandées.
+
+    Le fichier est parcouru ligne par ligne, la mémoire reste donc constante quelle que soit sa taille.
+    Les lignes des autres familles (notamment les Yijijk) sont écartées par un simple test de préfixe,
+    sans être découpées ni converties.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :param familles: Familles à extraire (Sijk, Cijk, Xijk, Wijk, PTE, Ci, Cmax, Wmax, Yijijk).
+    :return: Générateur de tuples (famille, indices, valeur). Les indices sont un tuple de chaînes,
+             vide pour les variables scalaires comme Cmax.
+    """
+    # 'Ci[' ne capture pas 'Cijk[' : le crochet (ou l'espace pour Cmax/Wmax) termine le nom de famille
+    prefixes = tuple(famille + '[' for famille in familles) + tuple(famille + ' ' for famille in familles)
+    with open(chemin_sol, 'r') as file:
+        for line in file:
+            if not line.startswith(prefixes):
+                continue
+            var_name, _, value = line.rstrip().rpartition(' ')
+            bracket = var_name.find('[')
+            if bracket < 0:
+                yield var_name, (), float(value)
+            else:
+                yield var_name[:bracket], tuple(var_name[bracket + 1:-1].split(',')), float(value)
+
+# Opération du planning transmise aux étapes suivantes (P2, P3)
+OperationPlanifiee = collections.namedtuple('OperationPlanifiee', ['op', 'job', 'ressource', 'debut', 'fin'])
+
+# Familles de variables conservées dans la représentation colonnaire
+FAMILLES_COLONNES = ('Sijk', 'Cijk', 'Xijk', 'Wijk')
+
+class SolutionColonnaire(object):
+    """
+    Représentation colonnaire des variables Sijk/Cijk/Xijk/Wijk d'une solution.
+
+    Chaque ligne correspond à un triplet (opération, job, ressource). Les noms sont codés par des
+    entiers (colonnes ops, jobs et ressources) dont les libellés sont dans noms_ops, noms_jobs et
+    noms_ressources. Les colonnes sont des tableaux NumPy contigus qui peuvent être transmis tels
+    quels aux étapes suivantes.
+    """
+
+    def __init__(self, ops, jobs, ressources, start, end, active, fatigue, noms_ops, noms_jobs, noms_ressources):
+        self.ops = ops
+        self.jobs = jobs
+        self.ressources = ressources
+        self.start = start
+        self.end = end
+        self.active = active
+        self.fatigue = fatigue
+        self.noms_ops = noms_ops
+        self.noms_jobs = noms_jobs
+        self.noms_ressources = noms_ressources
+
+    def __len__(self):
+        return len(self.ops)
+
+    def selection(self, lignes):
+        """
+        Extrait un sous-ensemble de lignes (masque booléen ou tableau d'indices, dans l'ordre donné).
+        """
+        return SolutionColonnaire(self.ops[lignes], self.jobs[lignes], self.ressources[lignes],
+                                  self.start[lignes], self.end[lignes], self.active[lignes],
+                                  self.fatigue[lignes], self.noms_ops, self.noms_jobs, self.noms_ressources)
+
+    def code_ressource(self, ressource):
+        if ressource in self.noms_ressources:
+            return self.noms_ressources.index(ressource)
+        return -1
+
+    def operations(self):
+        """
+        Itère sur les lignes sous forme d'OperationPlanifiee (opération, job, ressource, début, fin).
+        """
+        for op, job, ressource, start, end in zip(self.ops.tolist(), self.jobs.tolist(), self.ressources.tolist(),
+                                                  self.start.tolist(), self.end.tolist()):
+            yield OperationPlanifiee(self.noms_ops[op], self.noms_jobs[job], self.noms_ressources[ressource], start, end)
+
+    def planning(self):
+        return list(self.operations())
 
 # Fonction pour arrondir les valeurs
-def round_value(value):
-    if abs(value) < 1e-3:  # Mettre à zéro si la valeur est inférieure à 0.001
-        return 0
-    else:
-        return round(value)  # Arrondir au plus proche pour les autres valeurs
-
-# Parcourir les lignes et extraire les variables Sijk, Cijk, et Xijk
-for line in lines:
-    if line.startswith('Sijk') or line.startswith('Cijk') or line.startswith('Xijk'):
-        parts = line.strip().split(' ')
-        var_name = parts[0]  # Nom de la variable
-        value = round_value(float(parts[1]))  # Arrondir la valeur
-
-        # Extraire les indices i, j, k de la variable (par exemple, Sijk[op_1,job_1,resource_1])
-        indices = var_name.split('[')[1].split(']')[0]
-        j, i, k = indices.split(',')  # Job, Operation, Resource
-
-        # Conserver uniquement les informations Sijk (temps de début), Cijk (temps de fin), et Xijk (opération active)
-        if (i, j, k) not in operation_times:
-            operation_times[(i, j, k)] = {}
-
-        # Stocker les valeurs de Sijk, Cijk, et Xijk
-        if 'Sijk' in var_name:
-            operation_times[(i, j, k)]['start'] = value
-        elif 'Cijk' in var_name:
-            operation_times[(i, j, k)]['end'] = value
-        elif 'Xijk' in var_name and value > 0.5:  # Ne conserver que les opérations actives
-            operation_times[(i, j, k)]['active'] = True
-
-# Supprimer les opérations dont le temps de démarrage est égal au temps de fin ou inactives
-filtered_operations = {key: val for key, val in operation_times.items() if val.get('start', 0) != val.get('end', 0) and val.get('active', False)}
-
-# Filtrer les opérations en supprimant celles associées à H ou R si une opération Co existe
-filtered_operations_final = {}
-for (i, j, k), times in filtered_operations.items():
-    # Vérifier si une opération collaborative (CO) existe déjà
-    co_key = (i, j, 'Co')
-    if co_key in filtered_operations:
-        # Si une opération CO existe, ne conserver que celle-ci
-        if (i, j, k) == co_key:
-            filtered_operations_final[(i, j, k)] = times
-    else:
-        # Sinon, conserver l'opération actuelle
-        filtered_operations_final[(i, j, k)] = times
-
-# Trier les opérations par ordre croissant de Sijk (start time)
-sorted_operations = sorted(filtered_operations_final.items(), key=lambda x: x[1]['start'])
-
-# Écrire les résultats triés dans un fichier plus lisible
-with open('/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/solution_readable.txt', 'w') as file:
-    file.write("Operations sorted by start time (Sijk) and end time (Cijk):\n\n")
-    for (i, j, k), times in sorted_operations:
-        file.write("Operation {}, Job {}, Resource {}: Start time (Sijk) = {}, End time (Cijk) = {}\n".format(j, i, k, times['start'], times['end']))
-
-print("Processing completed. The filtered and sorted operations are saved in solution_readable.txt.")
+def arrondir_valeurs(values):
+    # Mettre à zéro les valeurs inférieures à 0.001 et arrondir au plus proche les autres
+    return np.where(np.abs(values) < SEUIL_ZERO, 0, np.round(values)).astype(np.int64)
+
+def extraire_operations(chemin_sol):
+    """
+    Charge les variables Sijk, Cijk, Xijk et Wijk dans une SolutionColonnaire (valeurs arrondies).
+
+    Les lignes sont numérotées dans l'ordre de première apparition des triplets dans le fichier.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :return: SolutionColonnaire non filtrée.
+    """
+    rows = {}
+    codes = ({}, {}, {})  # Codes des opérations, des jobs et des ressources
+    columns = ([], [], [])
+    values = dict((famille, ([], [])) for famille in FAMILLES_COLONNES)
+    # Les indices sont (opération, job, ressource), par exemple Sijk[op_1,j_1,H]
+    for var_name, indices, value in lire_variables_sol(chemin_sol, FAMILLES_COLONNES):
+        row = rows.get(indices)
+        if row is None:
+            row = rows[indices] = len(columns[0])
+            for code, column, name in zip(codes, columns, indices):
+                column.append(code.setdefault(name, len(code)))
+        values[var_name][0].append(row)
+        values[var_name][1].append(value)
+
+    def colonne(famille):
+        column = np.zeros(len(rows))
+        column[values[famille][0]] = values[famille][1]
+        return arrondir_valeurs(column)
+
+    noms = [sorted(code, key=code.get) for code in codes]
+    return SolutionColonnaire(np.array(columns[0], dtype=np.int32), np.array(columns[1], dtype=np.int32),
+                              np.array(columns[2], dtype=np.int32), colonne('Sijk'), colonne('Cijk'),
+                              colonne('Xijk') > 0.5,  # Ne conserver que les opérations actives
+                              colonne('Wijk'), noms[0], noms[1], noms[2])
+
+def filtrer_operations(solution):
+    """
+    Supprime les opérations nulles ou inactives, applique la priorité Co sur H/R et trie par Sijk.
+
+    :param solution: SolutionColonnaire produite par extraire_operations.
+    :return: SolutionColonnaire filtrée, triée par temps de début croissant.
+    """
+    # Supprimer les opérations dont le temps de démarrage est égal au temps de fin ou inactives
+    kept = (solution.start != solution.end) & solution.active
+
+    # Supprimer les opérations associées à H ou R si une opération Co existe pour le même (opération, job)
+    co = solution.code_ressource('Co')
+    if co >= 0:
+        pair = solution.jobs.astype(np.int64) * len(solution.noms_ops) + solution.ops
+        is_co = solution.ressources == co
+        kept &= is_co | ~np.isin(pair, pair[kept & is_co])
+
+    # Trier les opérations par ordre croissant de Sijk (tri stable, comme sorted)
+    rows = np.flatnonzero(kept)
+    return solution.selection(rows[np.argsort(solution.start[rows], kind='mergesort')])
+
+def ecrire_solution_lisible(solution, chemin_sortie):
+    # Écrire les résultats triés dans un fichier plus lisible
+    with open(chemin_sortie, 'w') as file:
+        file.write("Operations sorted by start time (Sijk) and end time (Cijk):\n\n")
+        for op, job, ressource, start, end in solution.operations():
+            file.write("Operation {}, Job {}, Resource {}: Start time (Sijk) = {}, End time (Cijk) = {}\n".format(op, job, ressource, start, end))
+
+def cle_cache(chemin_sol):
+    """
+    Calcule la clé de cache d'une solution : empreinte SHA-1 du contenu du fichier et des paramètres d'analyse.
+    """
+    empreinte = hashlib.sha1()
+    empreinte.update("{};{};{}".format(CACHE_VERSION, ",".join(FAMILLES_COLONNES), repr(SEUIL_ZERO)).encode('utf-8'))
+    with open(chemin_sol, 'rb') as file:
+        for bloc in iter(lambda: file.read(1 << 20), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+def lire_cache(chemin_cache):
+    with np.load(chemin_cache, allow_pickle=False) as data:
+        return SolutionColonnaire(data['ops'], data['jobs'], data['ressources'], data['start'], data['end'],
+                                  data['active'], data['fatigue'], data['noms_ops'].tolist(),
+                                  data['noms_jobs'].tolist(), data['noms_ressources'].tolist())
+
+def ecrire_cache(solution, chemin_cache):
+    # Écriture dans un fichier temporaire puis renommage, pour qu'un lecteur ne voie jamais d'entrée partielle
+    fd, chemin_tmp = tempfile.mkstemp(dir=os.path.dirname(chemin_cache), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, ops=solution.ops, jobs=solution.jobs, ressources=solution.ressources,
+                     start=solution.start, end=solution.end, active=solution.active, fatigue=solution.fatigue,
+                     noms_ops=np.array(solution.noms_ops, dtype=np.str_),
+                     noms_jobs=np.array(solution.noms_jobs, dtype=np.str_),
+                     noms_ressources=np.array(solution.noms_ressources, dtype=np.str_))
+        os.rename(chemin_tmp, chemin_cache)
+    except Exception:
+        os.remove(chemin_tmp)
+        raise
+
+def purger_cache(repertoire, taille_max):
+    """
+    Supprime les entrées les moins récemment utilisées jusqu'à ce que le cache tienne dans taille_max octets.
+    """
+    entrees = []
+    for nom in os.listdir(repertoire):
+        if nom.endswith('.npz'):
+            chemin = os.path.join(repertoire, nom)
+            try:
+                info = os.stat(chemin)
+            except OSError:
+                continue  # Entrée supprimée entre-temps par un autre processus
+            entrees.append((info.st_mtime, info.st_size, chemin))
+    taille = sum(entree[1] for entree in entrees)
+    for _, size, chemin in sorted(entrees):
+        if taille <= taille_max:
+            break
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+        taille -= size
+
+def charger_solution(chemin_sol, repertoire_cache=None, taille_max_cache=CACHE_TAILLE_MAX):
+    """
+    Renvoie la solution analysée et filtrée, en passant par le cache disque si un répertoire est fourni.
+
+    En cas de succès, le fichier .sol n'est pas réanalysé : seule son empreinte est recalculée.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :param repertoire_cache: Répertoire du cache (None pour désactiver le cache).
+    :param taille_max_cache: Taille maximale du cache en octets.
+    :return: SolutionColonnaire filtrée et triée.
+    """
+    if repertoire_cache is None:
+        return filtrer_operations(extraire_operations(chemin_sol))
+
+    if not os.path.isdir(repertoire_cache):
+        try:
+            os.makedirs(repertoire_cache)
+        except OSError:
+            if not os.path.isdir(repertoire_cache):
+                raise  # Seule la création concurrente par un autre processus du lot est tolérée
+    chemin_cache = os.path.join(repertoire_cache, cle_cache(chemin_sol) + '.npz')
+    if os.path.exists(chemin_cache):
+        try:
+            solution = lire_cache(chemin_cache)
+        except Exception:
+            # Entrée illisible, ou supprimée entre-temps par le purger_cache d'un autre processus : elle sera régénérée
+            solution = None
+            try:
+                os.remove(chemin_cache)
+            except OSError:
+                pass
+        if solution is not None:
+            try:
+                os.utime(chemin_cache, None)  # Marquer l'entrée comme récemment utilisée
+            except OSError:
+                pass  # Entrée purgée entre-temps : la solution lue reste valable
+            return solution
+
+    solution = filtrer_operations(extraire_operations(chemin_sol))
+    ecrire_cache(solution, chemin_cache)
+    purger_cache(repertoire_cache, taille_max_cache)
+    return solution
+
+class PrecedencesCreuses(object):
+    """
+    Précédences extraites des Yijijk non nuls, stockées par ressource au format CSR.
+
+    Yijijk[op_a,j_a,op_b,j_b,k] = 1 signifie que (op_b, j_b) précède (op_a, j_a) sur la ressource k.
+    Pour chaque ressource, indptr/indices donnent les successeurs de chaque noeud (couple opération,
+    job codé par un entier dont le libellé est dans noms_noeuds) : la mémoire est proportionnelle au
+    nombre d'entrées non nulles et non au produit opérations² x ressources.
+    """
+
+    def __init__(self, noms_noeuds, noms_ressources, csr):
+        self.noms_noeuds = noms_noeuds
+        self.noms_ressources = noms_ressources
+        self.csr = csr  # {ressource: (indptr, indices)}
+
+    def successeurs(self, ressource, noeud):
+        indptr, indices = self.csr[ressource]
+        return indices[indptr[noeud]:indptr[noeud + 1]]
+
+    def nombre_aretes(self):
+        return sum(len(indices) for _, indices in self.csr.values())
+
+    def graphe_reduit(self):
+        """
+        Fusionne les précédences de toutes les ressources et en calcule la réduction transitive.
+
+        :return: Dictionnaire ordonné {(opération, job): [successeurs directs]} dans l'ordre topologique.
+        :raises ValueError: Si les précédences contiennent un cycle.
+        """
+        n = len(self.noms_noeuds)
+        successors = [set() for _ in range(n)]
+        in_degree = [0] * n
+        for indptr, indices in self.csr.values():
+            for node in range(n):
+                for succ in indices[indptr[node]:indptr[node + 1]].tolist():
+                    if succ not in successors[node]:
+                        successors[node].add(succ)
+                        in_degree[succ] += 1
+
+        # Tri topologique (Kahn)
+        order = [node for node in range(n) if in_degree[node] == 0]
+        for node in order:
+            for succ in successors[node]:
+                in_degree[succ] -= 1
+                if in_degree[succ] == 0:
+                    order.append(succ)
+        if len(order) != n:
+            raise ValueError("Les précédences Yijijk contiennent un cycle.")
+        position = [0] * n
+        for rank, node in enumerate(order):
+            position[node] = rank
+
+        # Un successeur est redondant s'il est atteignable depuis un successeur plus tôt dans l'ordre topologique
+        reachable = [0] * n  # Ensembles de noeuds atteignables codés en bits
+        reduced = [[] for _ in range(n)]
+        for node in reversed(order):
+            acc = 0
+            for succ in sorted(successors[node], key=position.__getitem__):
+                if not (acc >> succ) & 1:
+                    reduced[node].append(succ)
+                    acc |= reachable[succ] | (1 << succ)
+            reachable[node] = acc
+
+        dag = collections.OrderedDict()
+        for node in order:
+            dag[self.noms_noeuds[node]] = [self.noms_noeuds[succ] for succ in reduced[node]]
+        return dag
+
+def charger_precedences(chemin_sol, solution=None):
+    """
+    Charge en flux les entrées non nulles du bloc Yijijk dans une structure creuse par ressource.
+
+    Seules les précédences entre opérations réellement affectées à la ressource sont conservées : le bloc
+    Yijijk complet lie aussi des affectations écartées par le solveur et contient des cycles.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :param solution: SolutionColonnaire filtrée de ce fichier ; à défaut, elle est lue avec charger_solution.
+    :return: PrecedencesCreuses.
+    """
+    if solution is None:
+        solution = charger_solution(chemin_sol)
+    assigned = set((op, job, ressource) for op, job, ressource, _, _ in solution.operations())
+
+    nodes = {}
+    resources = {}
+    edges = {}  # ressource -> (prédécesseurs, successeurs)
+    for _, (op_a, job_a, op_b, job_b, ressource), value in lire_variables_sol(chemin_sol, ('Yijijk',)):
+        if value < 0.5:
+            continue
+        if (op_a, job_a, ressource) not in assigned or (op_b, job_b, ressource) not in assigned:
+            continue
+        code = resources.setdefault(ressource, len(resources))
+        if code not in edges:
+            edges[code] = (array.array('i'), array.array('i'))
+        edges[code][0].append(nodes.setdefault((op_b, job_b), len(nodes)))
+        edges[code][1].append(nodes.setdefault((op_a, job_a), len(nodes)))
+
+    n = len(nodes)
+    csr = {}
+    for ressource, code in resources.items():
+        sources = np.frombuffer(edges[code][0], dtype=np.int32)
+        targets = np.frombuffer(edges[code][1], dtype=np.int32)
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=n))
+        csr[ressource] = (indptr, targets[order])
+    return PrecedencesCreuses(sorted(nodes, key=nodes.get), sorted(resources, key=resources.get), csr)
+
+def main():
+    solution = charger_solution(solution_file, cache_dir)
+    ecrire_solution_lisible(solution, readable_file)
+    print("Processing completed. The filtered and sorted operations are saved in solution_readable.txt.")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import collections
 import json
+import os
 import re
 import sys
+import tempfile
 
 # Chemins des fichiers
 operations_file = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/operations_elementaires.json'
@@ -11,278 +14,796 @@ logs_file = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/solu
 domain_file_path = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/domain.pddl'
 problem_file_path = '/home/admin-local/Projets_Python/modèle FJSP - THESE/CodeFJSP/problem.pddl'
 
+# Regex pour extraire les informations des logs
+log_pattern = r'Operation (\w+), Job (\w+), Resource (\w+): Start time \(Sijk\) = (\d+), End time \(Cijk\) = (\d+)'
+motif_log = re.compile(log_pattern)
+
 # Charger les opérations élémentaires depuis le fichier JSON
-try:
-    with open(operations_file, 'r') as json_file:
-        operations_elementaires = json.load(json_file)
-except Exception as e:
-    print("Erreur lors du chargement du fichier JSON :", e)
-    sys.exit(1)
+def charger_operations_elementaires(chemin):
+    with open(chemin, 'r') as json_file:
+        return json.load(json_file)
 
 # Charger les logs de solution_readable.txt
-try:
-    with open(logs_file, 'r') as log_file:
-        logs = log_file.readlines()
-except Exception as e:
-    print("Erreur lors du chargement du fichier de logs :", e)
-    sys.exit(1)
+def charger_logs(chemin):
+    with open(chemin, 'r') as log_file:
+        return log_file.readlines()
 
-# Regex pour extraire les informations des logs
-log_pattern = r'Operation (\w+), Job (\w+), Resource (\w+): Start time \(Sijk\) = (\d+), End time \(Cijk\) = (\d+)'
+def lire_planning_logs(logs):
+    """
+    Relit les lignes de solution_readable.txt sous forme de planning.
+
+    :param logs: Lignes de solution_readable.txt.
+    :return: Liste de tuples (opération, job, ressource, début, fin), dans l'ordre du fichier.
+    """
+    planning = []
+    correspondance = motif_log.match
+    for log in logs:
+        match = correspondance(log)
+        if match:
+            op_id, job_id, resource, start_time, end_time = match.groups()
+            planning.append((op_id, job_id, resource, int(start_time), int(end_time)))
+    return planning
+
+# Drapeaux des actions élémentaires d'une opération
+ACTION_PICK = 1
+ACTION_PLACE = 2
+ACTION_MOVE_TO = 4
+DRAPEAUX_ACTIONS = {"pick": ACTION_PICK, "place": ACTION_PLACE, "move_to": ACTION_MOVE_TO}
+
+# Ressources du planning exécutées par le robot : les opérations R et les opérations collaboratives Co
+RESSOURCE_CO = "Co"
+RESSOURCES_ROBOT = ("R", RESSOURCE_CO)
+
+# Agent des fichiers PDDL d'un dispatch sans agent explicite (planning du seul robot)
+AGENT_DEFAUT = "agent_r"
+
+# Modes de génération du domaine : une action par opération chaînée, ou actions paramétrées
+MODE_CHAINE = "chaine"
+MODE_PARAMETRE = "parametre"
+
+# Opération planifiée enrichie des informations du catalogue (une attente a op_name == "wait" et actions == 0)
+OperationDispatch = collections.namedtuple('OperationDispatch', [
+    'op_name', 'job_id', 'resource', 'start_time', 'end_time',
+    'actions',   # Combinaison des drapeaux ACTION_*
+    'tool',      # Nom de l'outil (None si l'opération n'a ni pick ni place)
+    'loc_from',  # Locations du move_to (None si l'opération n'a pas de move_to)
+    'loc_to',
+    'co',        # Variante collaborative (_CO)
+])
+
+def indexer_operations_elementaires(operations_elementaires):
+    """
+    Indexe le catalogue une fois pour toutes : {(job, opération): combinaison des drapeaux ACTION_*}.
+
+    :param operations_elementaires: Catalogue chargé depuis operations_elementaires.json.
+    :return: Dictionnaire indexé par (job_id, nom de l'opération sans suffixe _CO).
+    """
+    index = {}
+    for job_id, job in operations_elementaires.get("jobs", {}).items():
+        for op_name, actions in job.get("operations", {}).items():
+            drapeaux = 0
+            for action in actions:
+                drapeaux |= DRAPEAUX_ACTIONS.get(action, 0)
+            index[(job_id, op_name)] = drapeaux
+    return index
+
+def analyser_logs(logs, index_operations):
+    """
+    Variante de analyser_planning qui part des lignes de solution_readable.txt.
+    """
+    return analyser_planning(lire_planning_logs(logs), index_operations)
+
+def analyser_planning(planning, index_operations, ressources=RESSOURCES_ROBOT):
+    """
+    Filtre les opérations R et Co du planning, insère les attentes et prépare outils et locations.
+
+    :param planning: Opérations triées par temps de début, sous forme de tuples (opération, job,
+                     ressource, début, fin), par exemple les OperationPlanifiee de P1.
+    :param index_operations: Index produit par indexer_operations_elementaires.
+    :param ressources: Ressources retenues (celles d'un agent et Co pour PartitionAgents).
+    :return: Dictionnaire des données de dispatch : filtered_logs (liste d'OperationDispatch triée,
+             attentes comprises), operations, tools, operations_requiring_tools, move_to_operations,
+             locations, op_locations.
+    :raises ValueError: Si aucune opération des ressources retenues n'est trouvée.
+    """
+    # Initialisation des ensembles pour stocker les opérations filtrées et les outils
+    operations = []
+    operations_requiring_tools = set()
+    move_to_operations = set()
+    tools = set()
+    filtered_logs = []
+    locations = []
+    op_locations = {}
+    location_counter = 1
+
+    previous_end_time = None  # Pour détecter les attentes
+
+    # Analyse du planning et filtrage pour les ressources retenues (R et Co par défaut)
+    for op_id, job_id, resource, start_time, end_time in planning:  # Exemple : 'op_2', 'j_2', 'R' ou 'Co'
+        # Filtrer uniquement les opérations des ressources retenues
+        if resource not in ressources or '_' not in op_id or '_' not in job_id:
+            continue
+
+        # Générer le nom de l'opération au format OPxx, avec le suffixe _CO si la ressource est Co
+        base_name = "OP" + job_id.split('_')[1] + op_id.split('_')[1]
+        co = resource == RESSOURCE_CO
+        op_name = base_name + "_CO" if co else base_name
+
+        # On cherche l'opération correspondante dans le catalogue indexé
+        actions = index_operations.get((job_id, base_name), 0)
+        tool_name = None
+        loc_from = loc_to = None
+        # Si l'opération contient 'pick' ou 'place', on ajoute l'outil associé
+        if actions & (ACTION_PICK | ACTION_PLACE):
+            tool_name = "tool_" + op_name.lower()
+            tools.add(tool_name)
+            operations_requiring_tools.add(op_name)
+        # Si l'opération contient 'move_to', on gère les locations dynamiques
+        if actions & ACTION_MOVE_TO:
+            move_to_name = "move_to_" + op_name.lower()
+            move_to_operations.add(move_to_name)
+            loc_from = "loc_{}".format(location_counter)
+            loc_to = "loc_{}".format(location_counter + 1)
+            location_counter += 2
+            locations.append((move_to_name, loc_from, loc_to))
+            # Stocker la location pour l'opération
+            op_locations[op_name] = loc_to
+        else:
+            # Si pas de 'move_to', location par défaut
+            op_locations[op_name] = "loc_workstation"
+
+        operation = OperationDispatch(op_name, job_id, resource, start_time, end_time, actions, tool_name, loc_from, loc_to, co)
+        operations.append(operation)
+        filtered_logs.append(operation)
+
+        # Vérification si une attente est nécessaire
+        if previous_end_time is not None and start_time > previous_end_time:
+            # Ajouter une action 'wait' si l'agent doit attendre
+            filtered_logs.append(OperationDispatch("wait", job_id, resource, previous_end_time, start_time, 0, None, None, None, False))
+        previous_end_time = end_time
+
+    # Tri des opérations en fonction du temps de début
+    filtered_logs.sort(key=lambda x: x.start_time)
+
+    # Vérification des opérations filtrées
+    if not operations:
+        raise ValueError("Aucune opération n'a été trouvée avec les ressources {}.".format(
+            " ou ".join("'{}'".format(ressource) for ressource in ressources)))
+
+    return {
+        "operations": operations,
+        "filtered_logs": filtered_logs,
+        "tools": tools,
+        "operations_requiring_tools": operations_requiring_tools,
+        "move_to_operations": move_to_operations,
+        "locations": locations,
+        "op_locations": op_locations,
+    }
+
+# ==================================
+# Gabarits PDDL (rendus par str.format)
+# ==================================
+
+DOMAIN_ENTETE = """(define (domain specific_plan)
+  (:requirements :strips :typing)
+  (:types agent tool location operation)
+  (:predicates
+    (at ?a - agent ?l - location)
+    (move_to_workstation_done ?a - agent)
+    (move_to_done ?a - agent)
+    (holding ?a - agent ?t - tool)
+    (tool_at ?t - tool ?l - location)
+    (can_operate ?t - tool ?op - operation)
+    (wait_done ?a - agent)
+    (pick_done ?a - agent)
+    (place_done ?a - agent)
+"""
+
+# Prédicats pour chaque opération spécifique
+DOMAIN_PREDICATS_OPERATION = """    (pick_{op}_done)
+    (place_{op}_done)
+"""
+
+DOMAIN_ACTIONS_GENERIQUES = """  )
+
+  ;; Action Générique de Déplacement
+  (:action move_to
+    :parameters (?a - agent ?from - location ?to - location)
+    :precondition (at ?a ?from)
+    :effect (and
+      (at ?a ?to)
+      (not (at ?a ?from))
+      (move_to_done ?a))
+  )
+
+  ;; Action Spécifique de Déplacement vers la Station de Travail
+  (:action move_to_workstation
+    :parameters (?a - agent ?from - location ?to - location)
+    :precondition (at ?a ?from)
+    :effect (and
+      (at ?a ?to)
+      (not (at ?a ?from))
+      (move_to_workstation_done ?a))
+  )
+
+"""
+
+DOMAIN_ACTION_WAIT = """  ;; Action d'Attente
+  (:action wait
+    :parameters (?a - agent)
+    :precondition (and{precondition})
+    :effect (wait_done ?a)
+  )
+
+"""
+
+DOMAIN_ACTION_PICK = """  ;; Action Spécifique de Pick pour {op_name}
+  (:action pick_{op}
+    :parameters (?a - agent ?t - tool ?l - location)
+    :precondition (and {precondition}(tool_at ?t ?l) (can_operate ?t {op}) (at ?a ?l) (move_to_done ?a))
+    :effect (and
+      (holding ?a ?t)
+      (not (tool_at ?t ?l))
+      (pick_{op}_done))
+  )
+
+"""
+
+DOMAIN_ACTION_PLACE = """  ;; Action Spécifique de Place pour {op_name}
+  (:action place_{op}
+    :parameters (?a - agent ?t - tool)
+    :precondition (and (holding ?a ?t) (pick_{op}_done) (can_operate ?t {op}) (at ?a loc_workstation))
+    :effect (and
+      (tool_at ?t loc_workstation)
+      (not (holding ?a ?t))
+      (place_{op}_done))
+  )
+
+"""
+
+PROBLEM_ENTETE = """(define (problem specific_scenario)
+  (:domain specific_plan)
+"""
+
+PROBLEM_GOAL = """  (:goal (and
+    {fait}
+  ))
+"""
+
+# Domaine paramétré : taille constante, l'ordre des opérations est donné par des faits (next ?prev ?op)
+DOMAIN_PREDICATS_PARAMETRE = """    (next ?prev - operation ?op - operation)
+    (done ?op - operation)
+    (picked ?op - operation)
+    (pick_only ?op - operation)
+    (wait_step ?op - operation)
+"""
+
+DOMAIN_ACTIONS_PARAMETRE = """  ;; Action Générique de Pick : ?op doit suivre ?prev, déjà réalisée
+  (:action pick
+    :parameters (?a - agent ?t - tool ?l - location ?op - operation ?prev - operation)
+    :precondition (and (next ?prev ?op) (done ?prev) (tool_at ?t ?l) (can_operate ?t ?op) (at ?a ?l) (move_to_done ?a))
+    :effect (and
+      (holding ?a ?t)
+      (not (tool_at ?t ?l))
+      (picked ?op))
+  )
+
+  ;; Action Générique de Pick pour les opérations sans place : le pick termine l'opération
+  (:action pick_only
+    :parameters (?a - agent ?t - tool ?l - location ?op - operation ?prev - operation)
+    :precondition (and (pick_only ?op) (next ?prev ?op) (done ?prev) (tool_at ?t ?l) (can_operate ?t ?op) (at ?a ?l) (move_to_done ?a))
+    :effect (and
+      (holding ?a ?t)
+      (not (tool_at ?t ?l))
+      (picked ?op)
+      (done ?op))
+  )
+
+  ;; Action Générique de Place
+  (:action place
+    :parameters (?a - agent ?t - tool ?op - operation)
+    :precondition (and (holding ?a ?t) (picked ?op) (can_operate ?t ?op) (at ?a loc_workstation))
+    :effect (and
+      (tool_at ?t loc_workstation)
+      (not (holding ?a ?t))
+      (done ?op))
+  )
+
+  ;; Action Générique d'Attente
+  (:action wait
+    :parameters (?a - agent ?op - operation ?prev - operation)
+    :precondition (and (wait_step ?op) (next ?prev ?op) (done ?prev))
+    :effect (and
+      (done ?op)
+      (wait_done ?a))
+  )
+
+"""
+
+# Étape fictive réalisée dès l'état initial, qui précède la première opération de la chaîne
+ETAPE_DEBUT = "step_start"
+
+# Points de synchronisation des opérations Co (dispatch d'un agent produit par PartitionAgents) : l'étape
+# sync_opXX_co précède l'opération ; participant désigne l'agent du problème, partner les autres agents du
+# rendez-vous, et synchronised est ajouté par chaque agent arrivé au point de synchronisation
+DOMAIN_PREDICATS_SYNCHRONISATION = """    (participant ?a - agent ?op - operation)
+    (partner ?p - agent ?op - operation)
+    (synchronised ?a - agent ?op - operation)
+"""
+
+DOMAIN_PREDICAT_SYNC_OPERATION = """    (sync_{op}_done)
+"""
+
+DOMAIN_ACTION_SYNC = """  ;; Point de Synchronisation avant {op_name}
+  (:action sync_{op}
+    :parameters (?a - agent)
+    :precondition (and{precondition} (participant ?a {etape}))
+    :effect (and
+      (synchronised ?a {etape})
+      (sync_{op}_done))
+  )
+
+"""
+
+DOMAIN_PREDICATS_SYNCHRONISATION_PARAMETRE = """    (sync_step ?op - operation)
+"""
+
+DOMAIN_ACTION_SYNC_PARAMETRE = """  ;; Action Générique de Synchronisation : l'agent rejoint le point de synchronisation ?op
+  (:action synchronise
+    :parameters (?a - agent ?op - operation ?prev - operation)
+    :precondition (and (sync_step ?op) (participant ?a ?op) (next ?prev ?op) (done ?prev))
+    :effect (and
+      (done ?op)
+      (synchronised ?a ?op))
+  )
+
+"""
+
+def etape_synchronisation(op_name):
+    # Objet PDDL du point de synchronisation d'une opération Co (ex. 'sync_op22_co')
+    return "sync_" + op_name.lower()
+
+def agent_dispatch(dispatch):
+    return dispatch.get("agent", AGENT_DEFAUT)
+
+# ==================================
+# Construction des fichiers en mémoire
+# ==================================
+
+def construire_domain_pddl(dispatch, mode=MODE_CHAINE):
+    """
+    Construit domain.pddl en mémoire sous forme de blocs nommés.
 
-# Initialisation des ensembles pour stocker les opérations filtrées et les outils
-operations = []
-operations_requiring_tools = set()
-move_to_operations = set()
-tools = set()
-filtered_logs = []
-locations = []
-op_locations = {}
-location_counter = 1
-
-previous_end_time = None  # Pour détecter les attentes
-
-# Analyse des logs et filtrage pour les ressources R et Co
-for log in logs:
-    match = re.match(log_pattern, log)
-    if match:
-        op_id = match.group(1)  # Exemple : 'op_2'
-        job_id = match.group(2)  # Exemple : 'j_2'
-        resource = match.group(3)  # Exemple : 'R' ou 'Co'
-        start_time = int(match.group(4))
-        end_time = int(match.group(5))
-
-        # Filtrer uniquement les opérations par ressource R ou Co
-        if resource in ['R', 'Co']:
-            if '_' in op_id and '_' in job_id:
-                # Extraire les numéros après '_'
-                op_num = op_id.split('_')[1]
-                job_num = job_id.split('_')[1]
-
-                # Ajouter un suffixe _CO si la ressource est Co
-                suffix = "_CO" if resource == "Co" else ""
-
-                # Générer le nom de l'opération au format OPxx
-                op_name = "OP" + job_num + op_num + suffix
-                operations.append((op_name, job_id, resource, start_time, end_time))
-                filtered_logs.append((op_name, job_id, resource, start_time, end_time))
-
-                # Vérification si une attente est nécessaire
-                if previous_end_time is not None and start_time > previous_end_time:
-                    # Ajouter une action 'wait' si l'agent doit attendre
-                    filtered_logs.append(("wait", job_id, resource, previous_end_time, start_time))
-                previous_end_time = end_time
-
-# Tri des opérations en fonction du temps de début
-filtered_logs.sort(key=lambda x: x[3])
-
-# Vérification des opérations filtrées
-if not operations:
-    print("Erreur : Aucune opération n'a été trouvée avec les ressources 'R' ou 'Co'.")
-    sys.exit(1)
-
-# Générer les outils associés et gérer les opérations 'move_to'
-for op_entry in operations:
-    op_name, job_id, resource, start_time, end_time = op_entry
-    # On cherche l'opération correspondante dans le fichier JSON
-    actions = operations_elementaires["jobs"].get(job_id, {}).get("operations", {}).get(op_name.replace("_CO", ""), [])
-    # Si l'opération contient 'pick' ou 'place', on ajoute l'outil associé
-    if "pick" in actions or "place" in actions:
-        tool_name = "tool_" + op_name.lower()
-        tools.add(tool_name)
-        operations_requiring_tools.add(op_name)
-    # Si l'opération contient 'move_to', on gère les locations
-    if "move_to" in actions:
-        move_to_name = "move_to_" + op_name.lower()
-        move_to_operations.add(move_to_name)
-        # Ajouter des locations dynamiques
-        loc_from = "loc_{}".format(location_counter)
-        location_counter += 1
-        loc_to = "loc_{}".format(location_counter)
-        location_counter += 1
-        locations.append((move_to_name, loc_from, loc_to))
-        # Stocker la location pour l'opération
-        op_locations[op_name] = loc_to
+    En mode MODE_CHAINE, chaque opération a ses actions pick_opXX/place_opXX et ses prédicats *_done ;
+    en mode MODE_PARAMETRE, le domaine est constant (actions pick/place/wait paramétrées par l'opération).
+
+    Si le dispatch a des points de synchronisation (clé 'synchronisations'), une action de synchronisation
+    précède chacune des opérations Co concernées.
+
+    :param dispatch: Données produites par analyser_planning.
+    :param mode: MODE_CHAINE ou MODE_PARAMETRE.
+    :return: Liste de tuples (nom du bloc, texte) dont la concaténation forme le fichier.
+    """
+    synchronisations = dispatch.get("synchronisations") or {}
+    if mode == MODE_PARAMETRE:
+        blocs = [("entete", DOMAIN_ENTETE), ("predicats", DOMAIN_PREDICATS_PARAMETRE)]
+        if synchronisations:
+            blocs.append(("predicats_synchronisation", DOMAIN_PREDICATS_SYNCHRONISATION +
+                          DOMAIN_PREDICATS_SYNCHRONISATION_PARAMETRE))
+        blocs.extend([("actions_generiques", DOMAIN_ACTIONS_GENERIQUES), ("actions_parametrees", DOMAIN_ACTIONS_PARAMETRE)])
+        if synchronisations:
+            blocs.append(("action_synchronisation", DOMAIN_ACTION_SYNC_PARAMETRE))
+        blocs.append(("fin", ")\n"))
+        return blocs
+
+    blocs = [("entete", DOMAIN_ENTETE)]
+    blocs.append(("predicats", "".join(DOMAIN_PREDICATS_OPERATION.format(op=op.lower())
+                                       for op in sorted(dispatch["operations_requiring_tools"]))))
+    if synchronisations:
+        blocs.append(("predicats_synchronisation", DOMAIN_PREDICATS_SYNCHRONISATION + "".join(
+            DOMAIN_PREDICAT_SYNC_OPERATION.format(op=op.lower()) for op in sorted(synchronisations))))
+    blocs.append(("actions_generiques", DOMAIN_ACTIONS_GENERIQUES))
+
+    # Ajout des actions spécifiques avec chaînage des préconditions
+    ajouter = blocs.append
+    rendre_pick = DOMAIN_ACTION_PICK.format
+    rendre_place = DOMAIN_ACTION_PLACE.format
+    previous_op_name = None
+    for op_entry in dispatch["filtered_logs"]:
+        op_name = op_entry.op_name
+        if op_name == "wait":
+            precondition = " (" + previous_op_name + ")" if previous_op_name else ""
+            ajouter(("wait@" + str(op_entry.start_time), DOMAIN_ACTION_WAIT.format(precondition=precondition)))
+            previous_op_name = "wait_done ?a"
+            continue
+        op = op_name.lower()
+        if op_name in synchronisations:
+            precondition = " (" + previous_op_name + ")" if previous_op_name else ""
+            previous_op_name = "sync_" + op + "_done"
+            ajouter(("sync_" + op, DOMAIN_ACTION_SYNC.format(
+                op_name=op_name, op=op, precondition=precondition, etape=etape_synchronisation(op_name))))
+        actions = op_entry.actions
+        if actions & ACTION_PICK:
+            precondition = "(" + previous_op_name + ") " if previous_op_name else ""
+            previous_op_name = "pick_" + op + "_done"
+            ajouter(("pick_" + op, rendre_pick(op_name=op_name, op=op, precondition=precondition)))
+        if actions & ACTION_PLACE:
+            previous_op_name = "place_" + op + "_done"
+            ajouter(("place_" + op, rendre_place(op_name=op_name, op=op)))
+
+    blocs.append(("fin", ")\n"))
+    return blocs
+
+def etapes_chaine(dispatch):
+    """
+    Liste les étapes de la chaîne du mode paramétré, dans l'ordre du planning.
+
+    Les étapes sont les opérations avec pick, les attentes (nommées wait_1, wait_2...) et les points de
+    synchronisation (nommés sync_opXX_co, avant leur opération).
+
+    :return: Liste de tuples (nom de l'objet PDDL, OperationDispatch).
+    """
+    synchronisations = dispatch.get("synchronisations") or {}
+    etapes = []
+    attentes = 0
+    for op_entry in dispatch["filtered_logs"]:
+        if op_entry.op_name == "wait":
+            attentes += 1
+            etapes.append(("wait_{}".format(attentes), op_entry))
+            continue
+        if op_entry.op_name in synchronisations:
+            etapes.append((etape_synchronisation(op_entry.op_name), op_entry))
+        if op_entry.actions & ACTION_PICK:
+            etapes.append((op_entry.op_name.lower(), op_entry))
+    return etapes
+
+def construire_problem_pddl(dispatch, mode=MODE_CHAINE):
+    """
+    Construit problem.pddl en mémoire sous forme de blocs nommés (objets, init, goal).
+
+    En mode MODE_PARAMETRE, les attentes et l'étape initiale sont ajoutées aux objets et l'ordre de la
+    chaîne est décrit dans l'init par des faits (next ?prev ?op).
+
+    L'agent est celui du dispatch (agent_r par défaut). Les faits de synchronisation d'un dispatch partitionné
+    désignent, pour chaque point de synchronisation, l'agent du problème (participant) et les autres agents du
+    rendez-vous (partner), déclarés comme objets.
+
+    :param dispatch: Données produites par analyser_planning.
+    :param mode: MODE_CHAINE ou MODE_PARAMETRE.
+    :return: Liste de tuples (nom du bloc, texte) dont la concaténation forme le fichier.
+    """
+    tools = sorted(dispatch["tools"])
+    operations_requiring_tools = sorted(dispatch["operations_requiring_tools"])
+    etapes = etapes_chaine(dispatch) if mode == MODE_PARAMETRE else []
+    agent = agent_dispatch(dispatch)
+    synchronisations = dispatch.get("synchronisations") or {}
+    partenaires = sorted(set(partenaire for participants in synchronisations.values()
+                             for partenaire in participants if partenaire != agent))
+
+    objets = ["  (:objects\n"]
+    # Ajout des outils pour les opérations filtrées
+    if tools:
+        objets.append("    " + " ".join(tools) + " - tool\n")
+    # Ajout des locations
+    all_locations = set(["loc_base", "loc_workstation"])
+    all_locations.update(loc for _, loc_from, loc_to in dispatch["locations"] for loc in (loc_from, loc_to))
+    objets.append("    " + " ".join(sorted(all_locations)) + " - location\n")
+    # Ajout des agents : celui du problème, puis ses partenaires des points de synchronisation
+    objets.append("    " + " ".join([agent] + partenaires) + " - agent\n")
+    # Ajout des opérations (uniquement les vraies opérations, pas les move_to)
+    if operations_requiring_tools:
+        objets.append("    " + " ".join(operations_requiring_tools) + " - operation\n")
+    if mode == MODE_PARAMETRE:
+        # Étape initiale et attentes, typées comme des opérations
+        objets.append("    " + " ".join([ETAPE_DEBUT] + [nom for nom, op_entry in etapes if op_entry.op_name == "wait"]) + " - operation\n")
+    if synchronisations:
+        objets.append("    " + " ".join(etape_synchronisation(op_name) for op_name in sorted(synchronisations)) + " - operation\n")
+    objets.append("  )\n")
+
+    # Section Init : outils, agent puis préconditions can_operate
+    init = ["  (:init\n"]
+    init.extend("    (tool_at " + tool + " loc_workstation)\n" for tool in tools)
+    init.append("    (at " + agent + " loc_base)\n")
+    init.extend("    (can_operate tool_" + op.lower() + " " + op.lower() + ")\n" for op in operations_requiring_tools)
+    if mode == MODE_PARAMETRE:
+        # Ordre de la chaîne
+        init.append("    (done " + ETAPE_DEBUT + ")\n")
+        precedent = ETAPE_DEBUT
+        for nom, op_entry in etapes:
+            init.append("    (next " + precedent + " " + nom + ")\n")
+            if op_entry.op_name == "wait":
+                init.append("    (wait_step " + nom + ")\n")
+            elif op_entry.op_name in synchronisations and nom == etape_synchronisation(op_entry.op_name):
+                init.append("    (sync_step " + nom + ")\n")
+            elif not op_entry.actions & ACTION_PLACE:
+                init.append("    (pick_only " + nom + ")\n")
+            precedent = nom
+    # Faits de synchronisation : qui rejoint chaque point de synchronisation
+    for op_name in sorted(synchronisations):
+        etape = etape_synchronisation(op_name)
+        init.append("    (participant " + agent + " " + etape + ")\n")
+        init.extend("    (partner " + partenaire + " " + etape + ")\n"
+                    for partenaire in synchronisations[op_name] if partenaire != agent)
+    init.append("  )\n")
+
+    # Section Goal : l'effet de la dernière opération à réaliser
+    goal = "(at " + agent + " loc_workstation)"  # Si aucune opération n'est trouvée pour le goal
+    for op_entry in reversed(dispatch["filtered_logs"]):
+        if op_entry.op_name == "wait":
+            continue
+        if op_entry.actions & ACTION_PLACE and op_entry.op_name in dispatch["operations_requiring_tools"]:
+            if mode == MODE_PARAMETRE:
+                goal = "(done " + op_entry.op_name.lower() + ")"
+            else:
+                goal = "(place_" + op_entry.op_name.lower() + "_done)"
+            break
+        elif op_entry.actions & ACTION_MOVE_TO:
+            # Si la dernière opération est un move_to
+            goal = "(at " + agent + " " + dispatch["op_locations"].get(op_entry.op_name, "loc_workstation") + ")"
+            break
+
+    return [
+        ("entete", PROBLEM_ENTETE),
+        ("objets", "".join(objets)),
+        ("init", "".join(init)),
+        ("goal", PROBLEM_GOAL.format(fait=goal)),
+        ("fin", ")\n"),
+    ]
+
+# ==================================
+# Écriture
+# ==================================
+
+def ecrire_atomique(chemin, texte):
+    """
+    Écrit un fichier via un fichier temporaire renommé : un lecteur (planificateur, ROSPlan) ne voit
+    jamais de fichier partiellement écrit.
+    """
+    fd, chemin_tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(chemin)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(texte)
+        os.rename(chemin_tmp, chemin)
+    except Exception:
+        os.remove(chemin_tmp)
+        raise
+
+def emettre(blocs, destination):
+    """
+    Écrit des blocs PDDL vers un chemin (écriture atomique) ou vers tout objet fichier (pipe, sys.stdout...).
+    """
+    texte = "".join(texte for _, texte in blocs)
+    if hasattr(destination, 'write'):
+        destination.write(texte)
     else:
-        # Si pas de 'move_to', location par défaut
-        op_locations[op_name] = "loc_workstation"
+        ecrire_atomique(destination, texte)
+
+def generer_domain_pddl(dispatch, destination, mode=MODE_CHAINE):
+    emettre(construire_domain_pddl(dispatch, mode), destination)
+
+# Générer le fichier problem.pddl
+def generer_problem_pddl(dispatch, destination, mode=MODE_CHAINE):
+    emettre(construire_problem_pddl(dispatch, mode), destination)
+
+# ==================================
+# Régénération incrémentale
+# ==================================
+
+def comparer_blocs(anciens, nouveaux):
+    """
+    Compare deux générations d'un fichier bloc par bloc.
+
+    :param anciens: OrderedDict {nom du bloc: texte} de la génération précédente.
+    :param nouveaux: OrderedDict {nom du bloc: texte} de la nouvelle génération.
+    :return: Dictionnaire des noms de blocs ajoutés, supprimés et modifiés.
+    """
+    return {
+        "ajoutes": [nom for nom in nouveaux if nom not in anciens],
+        "supprimes": [nom for nom in anciens if nom not in nouveaux],
+        "modifies": [nom for nom, texte in nouveaux.items() if nom in anciens and anciens[nom] != texte],
+    }
+
+class GenerateurIncremental(object):
+    """
+    Régénère domain.pddl et problem.pddl en ne touchant que les fichiers dont le contenu change.
+
+    Les blocs de la dernière génération (prédicats, actions, objets, init, goal) sont conservés en mémoire
+    et comparés à ceux de la nouvelle : un fichier inchangé n'est pas réécrit, et garde donc sa date de
+    modification (pas de rechargement côté ROSPlan). Au premier appel, la comparaison se fait avec le
+    contenu des fichiers déjà présents sur le disque.
+    """
+
+    def __init__(self, domain_file_path, problem_file_path, mode=MODE_CHAINE):
+        self.chemins = collections.OrderedDict([("domain", domain_file_path), ("problem", problem_file_path)])
+        self.mode = mode
+        self.blocs = {"domain": None, "problem": None}
 
-def generer_domain_pddl():
+    def _contenu_disque(self, chemin):
+        if not os.path.exists(chemin):
+            return None
+        with open(chemin, 'r') as file:
+            return file.read()
+
+    def generer(self, dispatch):
+        """
+        :param dispatch: Données produites par analyser_planning.
+        :return: OrderedDict {'domain'|'problem': {'ecrit': bool, 'ajoutes', 'supprimes', 'modifies'}}.
+        """
+        constructeurs = {"domain": construire_domain_pddl, "problem": construire_problem_pddl}
+        rapport = collections.OrderedDict()
+        for fichier, chemin in self.chemins.items():
+            nouveaux = collections.OrderedDict(constructeurs[fichier](dispatch, self.mode))
+            texte = "".join(nouveaux.values())
+            anciens = self.blocs[fichier]
+            if anciens is None:
+                # Premier appel : pas de blocs connus, on compare au fichier existant
+                identique = self._contenu_disque(chemin) == texte
+                difference = comparer_blocs(collections.OrderedDict() if not identique else nouveaux, nouveaux)
+            else:
+                difference = comparer_blocs(anciens, nouveaux)
+                identique = not any(difference.values()) and list(anciens) == list(nouveaux)
+            if not identique:
+                ecrire_atomique(chemin, texte)
+            self.blocs[fichier] = nouveaux
+            difference["ecrit"] = not identique
+            rapport[fichier] = difference
+        return rapport
+
+# ==================================
+# Horizon glissant
+# ==================================
+
+def restreindre_dispatch(dispatch, entrees):
+    """
+    Restreint les données de dispatch à une sous-séquence de filtered_logs (outils, locations et
+    opérations des seules entrées retenues).
+
+    :param dispatch: Données produites par analyser_planning.
+    :param entrees: Sous-liste ordonnée de dispatch["filtered_logs"].
+    :return: Dictionnaire de même structure que celui d'analyser_planning.
+    """
+    operations = [op_entry for op_entry in entrees if op_entry.op_name != "wait"]
+    move_to_operations = set("move_to_" + op_entry.op_name.lower() for op_entry in operations if op_entry.loc_from)
+    restreint = {
+        "operations": operations,
+        "filtered_logs": list(entrees),
+        "tools": set(op_entry.tool for op_entry in operations if op_entry.tool),
+        "operations_requiring_tools": set(op_entry.op_name for op_entry in operations if op_entry.tool),
+        "move_to_operations": move_to_operations,
+        "locations": [location for location in dispatch["locations"] if location[0] in move_to_operations],
+        "op_locations": dict((op_entry.op_name, dispatch["op_locations"][op_entry.op_name]) for op_entry in operations),
+    }
+    # Dispatch d'un agent (PartitionAgents) : même agent, points de synchronisation des seules opérations retenues
+    if "agent" in dispatch:
+        restreint["agent"] = dispatch["agent"]
+    if dispatch.get("synchronisations"):
+        restreint["synchronisations"] = collections.OrderedDict(
+            (op_entry.op_name, dispatch["synchronisations"][op_entry.op_name])
+            for op_entry in operations if op_entry.op_name in dispatch["synchronisations"])
+    return restreint
+
+class FenetreGlissante(object):
+    """
+    Horizon glissant sur le planning : domain.pddl et problem.pddl ne décrivent que les prochaines
+    opérations (les `taille` suivantes, et/ou celles qui commencent moins de `duree` unités de temps après
+    la première opération restante). Le goal est donc celui de la dernière opération de la fenêtre.
+
+    Le robot exécutant les opérations en séquence, la réalisation d'une opération (fin de son place, ou de
+    son move_to) signale aussi celle de toutes les entrées qui la précèdent ; la fenêtre avance alors et
+    les fichiers sont régénérés de façon incrémentale.
+    """
+
+    def __init__(self, dispatch, taille=None, duree=None, mode=MODE_CHAINE):
+        if taille is None and duree is None:
+            raise ValueError("La fenêtre doit être bornée par un nombre d'opérations ou une durée.")
+        if taille is not None and taille < 1:
+            raise ValueError("La fenêtre doit contenir au moins une opération.")
+        self.dispatch = dispatch
+        self.taille = taille
+        self.duree = duree
+        self.mode = mode
+        self.position = 0  # Indice dans filtered_logs de la première entrée non réalisée
+        self.generateur = None
+
+    @property
+    def terminee(self):
+        return self.position >= len(self.dispatch["filtered_logs"])
+
+    def entrees(self):
+        """
+        :return: Liste des entrées de filtered_logs (attentes comprises) dans la fenêtre courante.
+        """
+        restantes = self.dispatch["filtered_logs"][self.position:]
+        # Les attentes en tête de fenêtre n'ont plus d'objet : l'opération qui les précédait est réalisée
+        while restantes and restantes[0].op_name == "wait":
+            restantes = restantes[1:]
+        if not restantes:
+            return []
+        fin_horizon = restantes[0].start_time + self.duree if self.duree is not None else None
+        fenetre = []
+        nombre_operations = 0
+        for op_entry in restantes:
+            # La première opération est toujours retenue, même si elle dépasse l'horizon
+            if fenetre and fin_horizon is not None and op_entry.start_time >= fin_horizon:
+                break
+            if op_entry.op_name != "wait":
+                if self.taille is not None and nombre_operations == self.taille:
+                    break
+                nombre_operations += 1
+            fenetre.append(op_entry)
+        # Une attente en fin de fenêtre serait planifiée sans l'opération qu'elle précède
+        while fenetre[-1].op_name == "wait":
+            fenetre.pop()
+        return fenetre
+
+    def dispatch_fenetre(self):
+        return restreindre_dispatch(self.dispatch, self.entrees())
+
+    def signaler_realisation(self, op_name):
+        """
+        Enregistre la réalisation d'une opération et fait avancer la fenêtre.
+
+        :param op_name: Nom de l'opération réalisée (ex. 'OP22_CO').
+        :return: True si la fenêtre a avancé.
+        :raises ValueError: Si l'opération n'est pas dans le planning.
+        """
+        filtered_logs = self.dispatch["filtered_logs"]
+        for indice in range(len(filtered_logs) - 1, -1, -1):
+            if filtered_logs[indice].op_name == op_name:
+                break
+        else:
+            raise ValueError("Opération inconnue : {}".format(op_name))
+        if indice < self.position:
+            return False
+        self.position = indice + 1
+        return True
+
+    def generer(self, domain_file_path, problem_file_path):
+        """
+        Écrit domain.pddl et problem.pddl pour la fenêtre courante (seuls les fichiers modifiés sont réécrits).
+
+        :return: Rapport de GenerateurIncremental.generer, ou None si tout le planning est réalisé.
+        """
+        if self.terminee or not self.entrees():
+            return None
+        if self.generateur is None or list(self.generateur.chemins.values()) != [domain_file_path, problem_file_path]:
+            self.generateur = GenerateurIncremental(domain_file_path, problem_file_path, self.mode)
+        return self.generateur.generer(self.dispatch_fenetre())
+
+def main():
+    # Charger les opérations élémentaires depuis le fichier JSON
     try:
-        with open(domain_file_path, 'w') as domain_file:
-            domain_file.write("(define (domain specific_plan)\n")
-            domain_file.write("  (:requirements :strips :typing)\n")
-            domain_file.write("  (:types agent tool location operation)\n")
-            
-            # Ajout des prédicats logiques
-            domain_file.write("  (:predicates\n")
-            domain_file.write("    (at ?a - agent ?l - location)\n")
-            domain_file.write("    (move_to_workstation_done ?a - agent)\n")
-            domain_file.write("    (move_to_done ?a - agent)\n")
-            domain_file.write("    (holding ?a - agent ?t - tool)\n")
-            domain_file.write("    (tool_at ?t - tool ?l - location)\n")
-            domain_file.write("    (can_operate ?t - tool ?op - operation)\n")
-            domain_file.write("    (wait_done ?a - agent)\n")
-            domain_file.write("    (pick_done ?a - agent)\n")
-            domain_file.write("    (place_done ?a - agent)\n")
-            
-            # Prédicats pour chaque opération spécifique
-            for op in sorted(operations_requiring_tools):
-                domain_file.write("    (pick_" + op.lower() + "_done)\n")
-                domain_file.write("    (place_" + op.lower() + "_done)\n")
-            domain_file.write("  )\n")
-
-            # Ajout des actions génériques
-            domain_file.write("\n  ;; Action Générique de Déplacement\n")
-            domain_file.write("  (:action move_to\n")
-            domain_file.write("    :parameters (?a - agent ?from - location ?to - location)\n")
-            domain_file.write("    :precondition (at ?a ?from)\n")
-            domain_file.write("    :effect (and\n")
-            domain_file.write("      (at ?a ?to)\n")
-            domain_file.write("      (not (at ?a ?from))\n")
-            domain_file.write("      (move_to_done ?a))\n")
-            domain_file.write("  )\n\n")
-
-            # Ajout de l'action spécifique de déplacement vers la station de travail
-            domain_file.write("  ;; Action Spécifique de Déplacement vers la Station de Travail\n")
-            domain_file.write("  (:action move_to_workstation\n")
-            domain_file.write("    :parameters (?a - agent ?from - location ?to - location)\n")
-            domain_file.write("    :precondition (at ?a ?from)\n")
-            domain_file.write("    :effect (and\n")
-            domain_file.write("      (at ?a ?to)\n")
-            domain_file.write("      (not (at ?a ?from))\n")
-            domain_file.write("      (move_to_workstation_done ?a))\n")
-            domain_file.write("  )\n\n")
-
-            # Ajout des actions spécifiques avec chaînage des préconditions
-            previous_op_name = None
-            previous_action_type = None
-
-            for op_entry in filtered_logs:
-                op_name, job_id, resource, start_time, end_time = op_entry
-                if op_name == "wait":
-                    domain_file.write("  ;; Action d'Attente\n")
-                    domain_file.write("  (:action wait\n")
-                    domain_file.write("    :parameters (?a - agent)\n")
-                    if previous_op_name:
-                        domain_file.write("    :precondition (and ({}))\n".format(previous_op_name))
-                    else:
-                        domain_file.write("    :precondition (and)\n")
-                    domain_file.write("    :effect (wait_done ?a)\n")
-                    domain_file.write("  )\n\n")
-                    previous_op_name = "wait_done ?a"
-                    previous_action_type = 'wait'
-                else:
-                    actions = operations_elementaires["jobs"].get(job_id, {}).get("operations", {}).get(op_name.replace("_CO", ""), [])
-                    if "pick" in actions:
-                        domain_file.write("  ;; Action Spécifique de Pick pour " + op_name + "\n")
-                        domain_file.write("  (:action pick_" + op_name.lower() + "\n")
-                        domain_file.write("    :parameters (?a - agent ?t - tool ?l - location)\n")
-                        preconditions = "(tool_at ?t ?l) (can_operate ?t " + op_name.lower() + ") (at ?a ?l) (move_to_done ?a)"
-                        if previous_op_name:
-                            preconditions = "(" + previous_op_name + ") " + preconditions
-                        domain_file.write("    :precondition (and " + preconditions + ")\n")
-                        domain_file.write("    :effect (and\n")
-                        domain_file.write("      (holding ?a ?t)\n")
-                        domain_file.write("      (not (tool_at ?t ?l))\n")
-                        domain_file.write("      (pick_" + op_name.lower() + "_done))\n")
-                        domain_file.write("  )\n\n")
-                        previous_op_name = "pick_" + op_name.lower() + "_done"
-                        previous_action_type = 'pick'
-                    if "place" in actions:
-                        domain_file.write("  ;; Action Spécifique de Place pour " + op_name + "\n")
-                        domain_file.write("  (:action place_" + op_name.lower() + "\n")
-                        domain_file.write("    :parameters (?a - agent ?t - tool)\n")
-                        preconditions = "(holding ?a ?t) (pick_" + op_name.lower() + "_done) (can_operate ?t " + op_name.lower() + ") (at ?a loc_workstation)"
-                        domain_file.write("    :precondition (and " + preconditions + ")\n")
-                        domain_file.write("    :effect (and\n")
-                        domain_file.write("      (tool_at ?t loc_workstation)\n")
-                        domain_file.write("      (not (holding ?a ?t))\n")
-                        domain_file.write("      (place_" + op_name.lower() + "_done))\n")
-                        domain_file.write("  )\n\n")
-                        previous_op_name = "place_" + op_name.lower() + "_done"
-                        previous_action_type = 'place'
-
-            domain_file.write(")\n")
-        print("Le fichier domain.pddl a été généré avec succès.")
+        operations_elementaires = charger_operations_elementaires(operations_file)
     except Exception as e:
-        print("Erreur lors de la génération de domain.pddl :", e)
+        print("Erreur lors du chargement du fichier JSON :", e)
         sys.exit(1)
 
+    # Charger les logs de solution_readable.txt
+    try:
+        logs = charger_logs(logs_file)
+    except Exception as e:
+        print("Erreur lors du chargement du fichier de logs :", e)
+        sys.exit(1)
 
-# Générer le fichier problem.pddl
-def generer_problem_pddl():
     try:
-        with open(problem_file_path, 'w') as problem_file:
-            problem_file.write("(define (problem specific_scenario)\n")
-            problem_file.write("  (:domain specific_plan)\n")
-            problem_file.write("  (:objects\n")
-            
-            # Ajout des outils pour les opérations filtrées
-            if tools:
-                problem_file.write("    " + " ".join(sorted(tools)) + " - tool\n")
-            
-            # Ajout des locations
-            all_locations = set(["loc_base", "loc_workstation"])
-            all_locations.update({loc for _, loc_from, loc_to in locations for loc in [loc_from, loc_to]})
-            problem_file.write("    " + " ".join(sorted(all_locations)) + " - location\n")
-            
-            # Ajout des agents (seulement agent_r)
-            problem_file.write("    agent_r - agent\n")
-            
-            # Ajout des opérations (uniquement les vraies opérations, pas les move_to)
-            if operations_requiring_tools:
-                problem_file.write("    " + " ".join(sorted(operations_requiring_tools)) + " - operation\n")
-            
-            problem_file.write("  )\n")
-    
-            # Section Init
-            problem_file.write("  (:init\n")
-            # Initialisation des outils
-            if tools:
-                for tool in sorted(tools):
-                    problem_file.write("    (tool_at " + tool + " loc_workstation)\n")
-            # Initialisation de l'agent
-            problem_file.write("    (at agent_r loc_base)\n")
-            # Ajout des préconditions can_operate
-            for op in sorted(operations_requiring_tools):
-                problem_file.write("    (can_operate tool_" + op.lower() + " " + op.lower() + ")\n")
-            problem_file.write("  )\n")
-    
-            # Section Goal
-            # Le goal est l'effet de la dernière opération à réaliser
-
-            last_op = None
-            # On parcourt les opérations dans l'ordre pour trouver la dernière opération
-            for op_name, job_id, resource, start_time, end_time in reversed(filtered_logs):
-                if op_name != "wait":
-                    actions = operations_elementaires["jobs"].get(job_id, {}).get("operations", {}).get(op_name.replace("_CO", ""), [])
-                    if "place" in actions and op_name in operations_requiring_tools:
-                        last_op = op_name
-                        problem_file.write("  (:goal (and\n")
-                        problem_file.write("    (place_" + last_op.lower() + "_done)\n")
-                        problem_file.write("  ))\n")
-                        break
-                    elif "move_to" in actions:
-                        # Si la dernière opération est un move_to
-                        loc = op_locations.get(op_name, "loc_workstation")
-                        problem_file.write("  (:goal (and\n")
-                        problem_file.write("    (at agent_r " + loc + ")\n")
-                        problem_file.write("  ))\n")
-                        last_op = op_name  # Mise à jour de last_op pour éviter un second goal
-                        break
-            if not last_op:
-                # Si aucune opération n'est trouvée pour le goal
-                problem_file.write("  (:goal (and\n")
-                problem_file.write("    (at agent_r loc_workstation)\n")
-                problem_file.write("  ))\n")
-
-            problem_file.write(")\n")
+        dispatch = analyser_logs(logs, indexer_operations_elementaires(operations_elementaires))
+    except ValueError as e:
+        print("Erreur :", e)
+        sys.exit(1)
+
+    # Générer les fichiers domain.pddl et problem.pddl
+    try:
+        generer_domain_pddl(dispatch, domain_file_path)
+        print("Le fichier domain.pddl a été généré avec succès.")
+    except Exception as e:
+        print("Erreur lors de la génération de domain.pddl :", e)
+        sys.exit(1)
+    try:
+        generer_problem_pddl(dispatch, problem_file_path)
         print("Le fichier problem.pddl a été généré avec succès.")
     except Exception as e:
         print("Erreur lors de la génération de problem.pddl :", e)
         sys.exit(1)
 
-# Générer les fichiers domain.pddl et problem.pddl
-generer_domain_pddl()
-generer_problem_pddl()
+if __name__ == "__main__":
+    main()
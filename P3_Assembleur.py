@@ -3,8 +3,19 @@
 
 import os
 import collections
+import itertools
+import json
+import logging
 import re
-import rospy
+
+import P2_Dispatcher
+
+# Journal de l'assemblage : P3 s'exécute hors de ROS, seul le code généré utilise rospy
+journal = logging.getLogger("P3_Assembleur")
+
+# Chemins des fichiers
+plan_file_path = "/home/admin-local/eXoBot_ws/src/rosplan_demos/rosplan_demos/common/plan.pddl"
+bt_file_path = "/home/admin-local/tiago_dual_public_ws/src/my_tiago_project/scripts/behavior_tree_autoV2.py"
 
 # Définition de la knowledge_base
 knowledge_base = {
@@ -35,6 +46,13 @@ ALL_PREDICATE_PARAMETER_ORDER = {
     "holding": ["a", "t"],
     "wait_done": ["a"],
     "can_operate": ["t", "op"],
+    # Prédicats du domaine paramétré (P2_Dispatcher.MODE_PARAMETRE)
+    "picked": ["op"],
+    "done": ["op"],
+    # Points de synchronisation des agents (PartitionAgents)
+    "synchronised": ["a", "op"],
+    "participant": ["a", "op"],
+    "partner": ["p", "op"],
     # Les prédicats pick_opXX_done, place_opXX_done et move_to_<destination>_done seront ajoutés dynamiquement
 }
 
@@ -45,6 +63,124 @@ opposite_location = {
     # Ajoutez d'autres mappings si nécessaire
 }
 
+# Mapping des localisations aux coordonnées (Mise à jour avec les coordonnées correctes)
+location_coordinates = {
+    'loc_base': {'x': 0.147, 'y': -10.87, 'orientation_z': 0.99, 'orientation_w': 0.011},
+    'loc_workstation': {'x': 0.325, 'y': -8.8, 'orientation_z': 0.99, 'orientation_w': 0.011},
+    # Ajoutez d'autres localisations avec leurs coordonnées si nécessaire
+}
+
+# Mapping des marker IDs aux noms de topics
+marker_id_to_topic = {
+    581: "/aruco_single_581/pose",
+    582: "/aruco_single_582/pose",
+    583: "/aruco_single_583/pose",
+    584: "/aruco_single_584/pose",
+    585: "/arucotableau1/pose",
+    586: "/arucotableau2/pose",
+    587: "/arucotableau3/pose",
+    588: "/arucotableau4/pose",
+    589: "/arucotableau5/pose",
+    590: "/arucotableau6/pose",
+    591: "/arucotableau7/pose",
+    592: "/arucotableau8/pose",
+    578: "/aruco_single_578/pose",
+    579: "/aruco_single_579/pose",
+    # Ajoutez d'autres mappings si nécessaire
+}
+
+# Actions du domaine paramétré (une seule action pick/place/wait pour toutes les opérations)
+ACTIONS_PARAMETREES = ("PICK", "PICK_ONLY", "PLACE", "WAIT", "SYNCHRONISE")
+
+def predicats_realisation(details):
+    """
+    Prédicats à ajouter à la KB lorsqu'une action pick, place ou sync réussit, selon le domaine d'origine.
+
+    :return: Liste de tuples (nom du prédicat, paramètres).
+    """
+    op_key = details["op_key"].lower()
+    if details["action"] == "sync":
+        if details.get("parametre"):
+            return [("done", {"op": details["step"]})]
+        return [("sync_{0}_done".format(op_key), {})]
+    if not details.get("parametre"):
+        return [("{0}_{1}_done".format(details["action"], op_key), {})]
+    if details["action"] == "place":
+        return [("done", {"op": op_key})]
+    if details.get("pick_only"):
+        return [("picked", {"op": op_key}), ("done", {"op": op_key})]
+    return [("picked", {"op": op_key})]
+
+def formater_predicats(predicats):
+    def cles(nom, parametres):
+        # Ordre des paramètres du prédicat, pour un texte identique quelle que soit la version de Python
+        ordre = ALL_PREDICATE_PARAMETER_ORDER.get(nom) or []
+        return [cle for cle in ordre if cle in parametres] + sorted(cle for cle in parametres if cle not in ordre)
+    return ", ".join("('{0}', {{{1}}})".format(nom, ", ".join("'{0}': '{1}'".format(cle, parametres[cle]) for cle in cles(nom, parametres)))
+                     for nom, parametres in predicats)
+
+# Listes de mises à jour de la KB d'un KBUpdateDecorator, dans l'ordre des arguments du décorateur
+CLES_PREDICATS_KB = ("on_success", "on_success_remove", "on_failure", "on_failure_remove")
+
+def predicats_kb(details):
+    """
+    Mises à jour de la KB associées à une action du plan, selon l'issue de la séquence qu'elle décore.
+
+    :return: Dictionnaire {'on_success', 'on_success_remove', 'on_failure', 'on_failure_remove'} de listes de
+             tuples (nom du prédicat, paramètres).
+    """
+    predicats = dict((cle, []) for cle in CLES_PREDICATS_KB)
+    action_type = details["action"]
+    if action_type == "move_to":
+        predicats["on_success"] = [("at", {"a": details["agent"], "l": details["to"]}),
+                                   ("move_to_{}_done".format(details["to"]), {})]
+        predicats["on_success_remove"] = [("at", {"a": details["agent"], "l": details["from"]})]
+    elif action_type == "wait":
+        predicats["on_success"] = [("wait_done", {"a": details["agent"]})]
+        if details.get("step"):
+            predicats["on_success"].append(("done", {"op": details["step"]}))
+    elif action_type == "sync":
+        # L'agent annonce sa présence au point de synchronisation, et la retire si le rendez-vous échoue
+        synchronised = ("synchronised", {"a": details["agent"], "op": details["step"]})
+        predicats["on_success"] = [synchronised] + predicats_realisation(details)
+        predicats["on_failure_remove"] = [synchronised]
+    elif action_type in ["pick", "place", "detect"]:
+        if action_type in ["pick", "detect"]:
+            location = details["location"]
+        else:
+            # Pour l'action place, la localisation est celle spécifiée dans l'action
+            # Si la localisation n'est pas spécifiée, on utilise 'loc_workstation' par défaut
+            location = details.get("location") or "loc_workstation"
+        # Déterminer la localisation opposée
+        opposite_loc = opposite_location.get(location, None)
+        if opposite_loc is None:
+            journal.error("Localisation opposée non définie pour '{}'".format(location))
+            opposite_loc = "loc_base"  # Valeur par défaut
+        holding = ("holding", {"a": details["agent"], "t": details["tool"]})
+        if action_type == "detect":
+            # La détection ne change pas la KB ; son échec est celui du pick (outil absent de sa localisation)
+            predicats["on_failure"] = [("tool_at", {"t": details["tool"], "l": opposite_loc})]
+        elif action_type == "pick":
+            predicats["on_success"] = [holding] + predicats_realisation(details)
+            predicats["on_failure"] = [("tool_at", {"t": details["tool"], "l": opposite_loc})]
+        else:
+            predicats["on_success"] = [("tool_at", {"t": details["tool"], "l": location})] + predicats_realisation(details)
+            predicats["on_success_remove"] = [holding]
+            predicats["on_failure"] = [holding]
+        predicats["on_failure_remove"] = [("tool_at", {"t": details["tool"], "l": location})]
+    return predicats
+
+def ecrire_decorateur(file, decorator_name, details, child_name):
+    # Écrit la construction du KBUpdateDecorator d'une action dans le fichier du Behavior Tree
+    predicats = predicats_kb(details)
+    file.write("    {0} = KBUpdateDecorator(\n".format(decorator_name))
+    file.write("        name=\"{0}\",\n".format(decorator_name))
+    for cle in CLES_PREDICATS_KB:
+        if predicats[cle]:
+            file.write("        {0}_predicates=[{1}],\n".format(cle, formater_predicats(predicats[cle])))
+    file.write("        child={0}\n".format(child_name))
+    file.write("    )\n\n")
+
 def parse_pddl_plan(plan_file):
     actions = collections.OrderedDict()
     tools_in_plan = set()
@@ -62,13 +198,13 @@ def parse_pddl_plan(plan_file):
                 params_str = match.group(3).strip()
                 params = params_str.split()
                 if not params:
-                    rospy.logwarn("Aucun paramètre trouvé pour l'action : {}".format(line))
+                    journal.warning("Aucun paramètre trouvé pour l'action : {}".format(line))
                     continue
 
                 action_key = action_name + "_" + time.replace('.', '_')
                 if "MOVE_TO" in action_name:
                     if len(params) != 3:
-                        rospy.logerr("Nombre de paramètres incorrect pour MOVE_TO : {}".format(line))
+                        journal.error("Nombre de paramètres incorrect pour MOVE_TO : {}".format(line))
                         continue
                     agent, from_location, to_location = params
                     actions[action_key] = {
@@ -89,12 +225,15 @@ def parse_pddl_plan(plan_file):
                         op_key = op_match.group(1)
                         tool_to_op[tool] = op_key
                     else:
-                        rospy.logwarn("Impossible d'extraire OPXX du nom de l'action ou de l'outil '{}'".format(tool))
+                        journal.warning("Impossible d'extraire OPXX du nom de l'action ou de l'outil '{}'".format(tool))
                         continue
 
-                    if "PICK" in action_name and len(params) == 3:
-                        location = params[2]
-                    elif "PLACE" in action_name and len(params) == 3:
+                    # Domaine paramétré : (pick ?a ?t ?l ?op ?prev) et (place ?a ?t ?op) ; les nœuds gardent les
+                    # noms du domaine chaîné (PICK_OPXX_<temps>)
+                    parametre = action_name in ACTIONS_PARAMETREES
+                    if parametre:
+                        action_key = "{}_{}_{}".format("PICK" if "PICK" in action_name else "PLACE", op_key, time.replace('.', '_'))
+                    if len(params) >= 3 and params[2].startswith("loc_"):
                         location = params[2]
                     else:
                         location = None
@@ -103,17 +242,44 @@ def parse_pddl_plan(plan_file):
                         "agent": agent,
                         "tool": tool,
                         "location": location,
-                        "op_key": op_key  # Ajouter op_key pour une utilisation ultérieure
+                        "op_key": op_key,  # Ajouter op_key pour une utilisation ultérieure
+                        "parametre": parametre,
+                        "pick_only": action_name == "PICK_ONLY",
+                        # Domaine paramétré : étape précédente de la chaîne (dernier paramètre de pick)
+                        "prev": params[4] if parametre and "PICK" in action_name and len(params) >= 5 else None
                     }
                 elif "WAIT" in action_name:
                     agent = params[0]
                     actions[action_key] = {
                         "action": "wait",
                         "agent": agent,
-                        "duration": 10.0  # Ajustez la durée si nécessaire
+                        "duration": 10.0,  # Ajustez la durée si nécessaire
+                        # Domaine paramétré : (wait ?a ?op ?prev), l'étape d'attente est marquée done
+                        "step": params[1] if action_name in ACTIONS_PARAMETREES and len(params) == 3 else None,
+                        "prev": params[2] if action_name in ACTIONS_PARAMETREES and len(params) == 3 else None
+                    }
+                elif "SYNC" in action_name:
+                    # Domaine chaîné : (sync_opXX_co ?a) ; domaine paramétré : (synchronise ?a ?op ?prev)
+                    parametre = action_name in ACTIONS_PARAMETREES
+                    if parametre and len(params) != 3:
+                        journal.error("Nombre de paramètres incorrect pour SYNCHRONISE : {}".format(line))
+                        continue
+                    op_match = re.search(r'(OP\d{2}(?:_\w+)?)', params[1].upper() if parametre else action_name)
+                    if not op_match:
+                        journal.warning("Impossible d'extraire OPXX du point de synchronisation '{}'".format(line))
+                        continue
+                    op_key = op_match.group(1)
+                    actions[action_key] = {
+                        "action": "sync",
+                        "agent": params[0],
+                        "op_key": op_key,
+                        "step": P2_Dispatcher.etape_synchronisation(op_key),
+                        "parametre": parametre,
+                        "prev": params[2] if parametre else None,
+                        "partners": []  # Renseignés depuis les faits (partner ?p ?op) du problème
                     }
                 else:
-                    rospy.logwarn("Action inconnue détectée : {}".format(action_name))
+                    journal.warning("Action inconnue détectée : {}".format(action_name))
             else:
                 # Ignorer les lignes qui ne correspondent pas au motif
                 pass
@@ -130,7 +296,7 @@ def filter_actions(actions_dict):
     for key, action in actions_dict.items():
         if action['action'] == 'move_to':
             if action['from'] == action['to']:
-                rospy.logdebug("Action 'move_to' ignorée car les localisations sont identiques: '{}' -> '{}'".format(
+                journal.debug("Action 'move_to' ignorée car les localisations sont identiques: '{}' -> '{}'".format(
                     action['from'], action['to']))
                 continue  # Ignorer cette action
         filtered_actions[key] = action
@@ -139,18 +305,265 @@ def filter_actions(actions_dict):
 def get_base_op_key(op_key):
     return op_key.split('_')[0]  # Retourne 'OP22' pour 'OP22_CO'
 
-def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
+def partenaires_synchronisation(problem_file):
+    """
+    Lit les faits de synchronisation d'un problème d'agent (P2_Dispatcher, dispatch partitionné).
+
+    :return: Dictionnaire {point de synchronisation: liste triée des agents partenaires}.
+    """
+    import Planificateur
+    with open(problem_file, 'r') as file:
+        probleme = Planificateur.lire_probleme(file.read())
+    partenaires = collections.defaultdict(list)
+    for fait in sorted(probleme.init):
+        if fait[0] == "partner" and len(fait) == 3:
+            partenaires[fait[2]].append(fait[1])
+    return dict(partenaires)
+
+def completer_synchronisations(actions_dict, problem_file):
+    # Les partenaires d'un point de synchronisation ne figurent pas dans le plan : ils sont lus dans le problème
+    synchronisations = [details for details in actions_dict.values() if details["action"] == "sync"]
+    if not synchronisations:
+        return
+    partenaires = partenaires_synchronisation(problem_file) if problem_file else {}
+    for details in synchronisations:
+        details["partners"] = partenaires.get(details["step"], [])
+        if not details["partners"]:
+            journal.warning("Aucun partenaire pour le point de synchronisation '{}'".format(details["step"]))
+
+# ==================================
+# Graphe de dépendances et branches parallèles
+# ==================================
+
+# Actions de la chaîne des opérations (la détection du marqueur d'un pick n'en fait pas partie)
+ETAPES = ("pick", "place", "wait", "sync", "operator")
+
+def actions_arbre(actions_dict):
+    """
+    Actions du Behavior Tree : celles du plan, chaque pick étant précédé de la détection de son marqueur
+    (action 'detect', DETECT_... pour PICK_...). La détection n'occupe que la tête de l'agent : elle peut se
+    dérouler pendant l'attente ou le point de synchronisation qui précède le pick.
+
+    :param actions_dict: Actions du plan (parse_pddl_plan, filter_actions).
+    :return: OrderedDict {nom: détails}, dans l'ordre du plan.
+    """
+    actions = collections.OrderedDict()
+    for op_name, details in actions_dict.items():
+        if details["action"] == "pick" and details.get("op_key"):
+            actions["DETECT" + op_name[len("PICK"):]] = dict(details, action="detect")
+        actions[op_name] = details
+    return actions
+
+# Politique des branches parallèles : SUCCESS quand toutes ont réussi ; ParalleleSynchronise (ConstructionBT)
+# ne retique plus les branches terminées
+POLITIQUE_PARALLELE = "py_trees.common.ParallelPolicy.SUCCESS_ON_ALL"
+
+def preconditions_kb(details):
+    """
+    Faits de la KB requis par une action du plan (préconditions des domaines de P2), dans la forme de
+    predicats_kb. L'enchaînement implicite des étapes du domaine chaîné est traité par graphe_dependances.
+
+    :return: Liste de tuples (nom du prédicat, paramètres).
+    """
+    action_type = details["action"]
+    if action_type == "move_to":
+        return [("at", {"a": details["agent"], "l": details["from"]})]
+    preconditions = []
+    if action_type in ("pick", "detect") and details.get("location"):
+        preconditions = [("tool_at", {"t": details["tool"], "l": details["location"]}),
+                         ("at", {"a": details["agent"], "l": details["location"]})]
+    elif action_type == "place":
+        preconditions = [("holding", {"a": details["agent"], "t": details["tool"]}),
+                         ("at", {"a": details["agent"], "l": details.get("location") or "loc_workstation"})]
+        if details.get("parametre"):
+            preconditions.append(("picked", {"op": details["op_key"].lower()}))
+    if details.get("prev") and action_type != "detect":
+        preconditions.append(("done", {"op": details["prev"]}))
+    return preconditions
+
+# Composants de l'agent occupés par chaque type d'action. La détection n'utilise que la tête (caméra) et le
+# déplacement que la base ; la manipulation immobilise la base et utilise le bras et la caméra (moveitAruco,
+# LookForwardAndRaise). Pendant une attente ou un point de synchronisation, l'agent reste à son poste (base et
+# bras) mais sa tête est libre : la détection du marqueur suivant peut s'y dérouler.
+COMPOSANTS_ACTION = {
+    "move_to": ("base",),
+    "wait": ("base", "bras"),
+    "sync": ("base", "bras"),
+    "detect": ("tete",),
+    "pick": ("base", "bras", "tete"),
+    "place": ("base", "bras", "tete"),
+    "operator": ("base", "bras", "tete"),  # L'opérateur humain tout entier
+}
+
+def ressources_action(details):
+    # Ressources exclusives : les composants de l'agent utilisés par l'action et l'outil manipulé
+    ressources = set((composant, details["agent"]) for composant in COMPOSANTS_ACTION.get(details["action"], ()))
+    if details.get("tool"):
+        ressources.add(("tool", details["tool"]))
+    return ressources
+
+def graphe_dependances(actions):
+    """
+    Dépendances entre les actions du plan. Une action dépend d'une action antérieure si elles partagent une
+    ressource (composant de l'agent, outil), si l'une lit un fait de la KB que l'autre ajoute ou retire, ou si l'une ajoute
+    un fait que l'autre retire (deux lectures, deux ajouts ou deux retraits d'un même fait commutent). Les
+    mises à jour des deux issues du décorateur sont prises en compte. Une étape du domaine chaîné ou du
+    planning de P2, sans prédécesseur explicite, suit l'étape précédente.
+
+    Les accès à chaque ressource ou fait sont regroupés en suites d'accès qui commutent : un accès dépend de
+    tout le groupe précédent. La fermeture transitive est celle de la comparaison de toutes les paires, avec
+    un nombre d'arcs linéaire pour un plan séquentiel.
+
+    :param actions: Liste des détails des actions, dans l'ordre du plan (qui reste un ordre topologique).
+    :return: Liste des ensembles d'indices des prédécesseurs de chaque action.
+    """
+    def faits(predicats):
+        return set((nom.strip(), tuple(sorted(parametres.items()))) for nom, parametres in predicats)
+
+    groupes = {}  # clé -> (type d'accès du groupe courant, groupe courant, groupe précédent)
+    predecesseurs = []
+    derniere_etape = None
+    for j, details in enumerate(actions):
+        predicats = predicats_kb(details)
+        # Type d'accès de l'action à chaque clé ; plusieurs types d'accès à une même clé la rendent exclusive
+        acces = dict((ressource, "exclusif") for ressource in ressources_action(details))
+        for type_acces, cles in (("lecture", faits(preconditions_kb(details))),
+                                 ("ajout", faits(predicats["on_success"] + predicats["on_failure"])),
+                                 ("retrait", faits(predicats["on_success_remove"] + predicats["on_failure_remove"]))):
+            for cle in cles:
+                acces[cle] = type_acces if acces.get(cle, type_acces) == type_acces else "exclusif"
+        dependances = set()
+        for cle, type_acces in acces.items():
+            type_groupe, courant, precedent = groupes.get(cle, (None, [], []))
+            if type_acces == type_groupe and type_acces != "exclusif":
+                dependances.update(precedent)
+                courant.append(j)
+            else:
+                dependances.update(courant)
+                groupes[cle] = (type_acces, [j], courant)
+        if details["action"] in ETAPES:
+            implicite = not (details.get("parametre") or details.get("step") or details.get("prev"))
+            if implicite and derniere_etape is not None:
+                dependances.add(derniere_etape)
+            derniere_etape = j
+        predecesseurs.append(dependances)
+    return predecesseurs
+
+def structurer_actions(predecesseurs, noms):
+    """
+    Regroupe les actions en séquences et en branches parallèles sans perdre de dépendance : une séquence est
+    coupée là où tout ce qui précède la coupure est requis par tout ce qui la suit, et les groupes d'actions
+    indépendants deviennent les branches d'un Parallel. À défaut, les actions sans dépendance dans le groupe
+    passent d'abord.
+
+    Un Parallel échoue dès qu'une branche échoue et interrompt les autres : comme avec la séquence, l'arbre
+    échoue à la première action en échec et aucune action qui en dépend ne démarre.
+
+    :param predecesseurs: Résultat de graphe_dependances.
+    :param noms: Nom de chaque action (clé du plan), pour nommer les composites.
+    :return: Liste des enfants de RootSequence : indices d'actions, ou dictionnaires {type ('sequence' ou
+             'parallel'), name, children} de même forme. Une liste d'indices pour un plan sans parallélisme.
+    """
+    ancetres = []
+    for dependances in predecesseurs:
+        masque = 0
+        for i in dependances:
+            masque |= ancetres[i] | (1 << i)
+        ancetres.append(masque)
+    noms_utilises = set()
+
+    def nom_unique(base):
+        nom = base
+        while nom in noms_utilises:
+            nom = "{}_{}".format(base, len(noms_utilises))
+        noms_utilises.add(nom)
+        return nom
+
+    def composantes(indices):
+        # Groupes connexes du graphe des dépendances restreint aux indices, dans l'ordre du plan
+        groupe = dict((indice, indice) for indice in indices)
+
+        def racine(indice):
+            while groupe[indice] != indice:
+                groupe[indice] = groupe[groupe[indice]]
+                indice = groupe[indice]
+            return indice
+        for j in indices:
+            for i in predecesseurs[j]:
+                if i in groupe:
+                    groupe[racine(j)] = racine(i)
+        resultat = collections.OrderedDict()
+        for indice in indices:
+            resultat.setdefault(racine(indice), []).append(indice)
+        return list(resultat.values())
+
+    def segments(indices):
+        # Découpe aux coupures k : chaque action de indices[:k] est un ancêtre de chaque action de indices[k:].
+        # Une coupure d'un segment est aussi une coupure de la liste : les segments n'en ont pas d'autre.
+        communs = [0] * len(indices)
+        commun = -1
+        for k in range(len(indices) - 1, 0, -1):
+            commun &= ancetres[indices[k]]
+            communs[k] = commun
+        resultat = [[indices[0]]]
+        prefixe = 1 << indices[0]
+        for k in range(1, len(indices)):
+            if communs[k] & prefixe == prefixe:
+                resultat.append([])
+            resultat[-1].append(indices[k])
+            prefixe |= 1 << indices[k]
+        return resultat
+
+    def serie(indices):
+        # Liste des enfants d'une séquence
+        enfants = []
+        for segment in segments(indices):
+            if len(segment) == 1:
+                enfants.append(segment[0])
+                continue
+            groupes = composantes(segment)
+            if len(groupes) > 1:
+                branches = []
+                for groupe in groupes:
+                    sous_enfants = serie(groupe)
+                    branches.append(sous_enfants[0] if len(sous_enfants) == 1 else collections.OrderedDict([
+                        ("type", "sequence"), ("name", nom_unique("Branch_{}".format(noms[groupe[0]]))),
+                        ("children", sous_enfants)]))
+                enfants.append(collections.OrderedDict([
+                    ("type", "parallel"), ("name", nom_unique("Parallel_{}".format(noms[segment[0]]))), ("children", branches)]))
+                continue
+            masque = sum(1 << indice for indice in segment)
+            enfants.extend(serie([indice for indice in segment if not ancetres[indice] & masque]))
+            enfants.extend(serie([indice for indice in segment if ancetres[indice] & masque]))
+        return enfants
+
+    return serie(list(range(len(predecesseurs)))) if predecesseurs else []
+
+def structure_parallele(structure):
+    return any(not isinstance(enfant, int) for enfant in structure)
+
+def ecrire_composite(file, structure, decorator_names):
+    """
+    Écrit la construction d'un élément de structurer_actions (ses enfants d'abord) dans le fichier du
+    Behavior Tree.
+
+    :return: Nom de la variable de l'élément.
+    """
+    if isinstance(structure, int):
+        return decorator_names[structure]
+    enfants = [ecrire_composite(file, enfant, decorator_names) for enfant in structure["children"]]
+    if structure["type"] == "parallel":
+        file.write("    {0} = ParalleleSynchronise(\"{0}\", policy={1})\n".format(structure["name"], POLITIQUE_PARALLELE))
+    else:
+        file.write("    {0} = py_trees.composites.Sequence(\"{0}\")\n".format(structure["name"]))
+    file.write("    {0}.add_children([{1}])\n\n".format(structure["name"], ", ".join(enfants)))
+    return structure["name"]
+
+def create_behavior_tree_file(actions_dict, tool_to_op, output_file, problem_file=None):
     # Collecter toutes les opérations uniques pour éviter les redéfinitions
     unique_operations = set(tool_to_op.values())
     used_predicates = set()
 
-    # Mapping des localisations aux coordonnées (Mise à jour avec les coordonnées correctes)
-    location_coordinates = {
-        'loc_base': {'x': 0.147, 'y': -10.87, 'orientation_z': 0.99, 'orientation_w': 0.011},
-        'loc_workstation': {'x': 0.325, 'y': -8.8, 'orientation_z': 0.99, 'orientation_w': 0.011},
-        # Ajoutez d'autres localisations avec leurs coordonnées si nécessaire
-    }
-
     # Mise à jour de ALL_PREDICATE_PARAMETER_ORDER avec les prédicats pick_opXX_done et place_opXX_done
     for op_key in unique_operations:
         predicate_pick_done = "pick_{}_done".format(op_key.lower())
@@ -171,20 +584,20 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
             tool = details["tool"]
             op_key = details["op_key"]
             if op_key:
-                if action_type == "pick":
-                    used_predicates.add("holding")
-                    used_predicates.add("tool_at")
-                    predicate_pick_done = "pick_{}_done".format(op_key.lower())
-                    used_predicates.add(predicate_pick_done)
-                elif action_type == "place":
-                    used_predicates.add("tool_at")
-                    used_predicates.add("holding")
-                    predicate_place_done = "place_{}_done".format(op_key.lower())
-                    used_predicates.add(predicate_place_done)
+                used_predicates.add("holding")
+                used_predicates.add("tool_at")
+                used_predicates.update(nom for nom, _ in predicats_realisation(details))
             else:
-                rospy.logwarn("Aucun mapping trouvé pour l'outil '{}'".format(tool))
+                journal.warning("Aucun mapping trouvé pour l'outil '{}'".format(tool))
         elif action_type == "wait":
             used_predicates.add("wait_done")
+            if details.get("step"):
+                used_predicates.add("done")
+        elif action_type == "sync":
+            for predicate_name, _ in predicats_realisation(details):
+                ALL_PREDICATE_PARAMETER_ORDER.setdefault(predicate_name, [])
+                used_predicates.add(predicate_name)
+            used_predicates.add("synchronised")
 
     with open(output_file, "w") as file:
         # Écriture de l'en-tête du fichier BT
@@ -198,109 +611,37 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
         file.write("from RotateBeforeGraspBT import RotateBeforeGrasp\n")
         file.write("from ArmRightHomeBT import ArmRightHome\n")
         file.write("from ObserveTableAction import ObserveTableAction  # Votre classe pour bouger la tête\n")
-        file.write("from CheckArucoDetected import CheckArucoDetected\n")
+        file.write("from PoolAruco import VerifierAruco  # Un abonné par topic ArUco pour tout l'arbre\n")
         file.write("from CloseGripperRightBT import CloseGripperRight\n")
         file.write("from OpenGripperRightBT import OpenGripperRight\n")
         file.write("from MoveBaseGoalAction import MoveBaseGoalAction\n")
         file.write("from FinalGraspBT import FinalGrasp\n")
         file.write("from WaitAction import WaitAction  # Votre classe pour l'action wait\n")
         file.write("from LookForwardAndRaise import LookForwardAndRaise\n")  # Ajout de l'import
-        file.write("from rosplan_knowledge_msgs.srv import KnowledgeUpdateService, KnowledgeUpdateServiceRequest\n")
-        file.write("from rosplan_knowledge_msgs.msg import KnowledgeItem\n")
-        file.write("from diagnostic_msgs.msg import KeyValue\n")
+        file.write("from ClientKB import DELAI_SERVICE\n")
+        file.write("from MiroirKB import Reconciliateur, SourceROS, PointSynchronisation\n")
+        file.write("from DecorateurKB import PREDICATE_PARAMETER_ORDER, KB_CLIENT, KB_MIROIR, update_kb, KBUpdateDecorator\n")
+        file.write("from Operateur import ConsigneOperateur\n")
+        file.write("from ConstructionBT import ParalleleSynchronise\n")
+        file.write("from ProfilageBT import ProfileurBT\n")
         file.write("from std_srvs.srv import Empty\n\n")
 
-        # Définition de PREDICATE_PARAMETER_ORDER avec uniquement les prédicats utilisés
+        # Définition de PREDICATE_PARAMETER_ORDER avec uniquement les prédicats utilisés ; le dictionnaire est
+        # celui de DecorateurKB, déjà référencé par le client et le miroir de la KB
         file.write("# ===========================\n")
         file.write("# Définition de l'ordre des paramètres pour chaque prédicat utilisé\n")
         file.write("# ===========================\n\n")
-        file.write("PREDICATE_PARAMETER_ORDER = {\n")
+        file.write("PREDICATE_PARAMETER_ORDER.update({\n")
         for predicate in used_predicates:
             if predicate in ALL_PREDICATE_PARAMETER_ORDER:
                 params = ALL_PREDICATE_PARAMETER_ORDER[predicate]
                 file.write("    \"{0}\": {1},\n".format(predicate, params))
             else:
-                rospy.logdebug("Prédicat '{}' non défini dans ALL_PREDICATE_PARAMETER_ORDER. Ignoré.".format(predicate))
-        file.write("}\n\n")
-
-        # ==================================
-        # Fonction de mise à jour de la KB
-        # ==================================
-        file.write("# ===========================\n")
-        file.write("# Fonction de mise à jour de la KB\n")
-        file.write("# ===========================\n\n")
-        file.write("def update_kb(predicate_name, parameters, add=True):\n")
-        file.write("    rospy.logdebug(\"Mise à jour KB - Prédicat: '{}' | Params: {} | Ajout: {}\".format(predicate_name, parameters, add))\n")
-        file.write("    service_name = '/rosplan_knowledge_base/update'\n")
-        file.write("    try:\n")
-        file.write("        rospy.wait_for_service(service_name, timeout=5)\n")
-        file.write("        update_kb_client = rospy.ServiceProxy(service_name, KnowledgeUpdateService)\n")
-        file.write("        request = KnowledgeUpdateServiceRequest()\n")
-        file.write("        knowledge = KnowledgeItem()\n")
-        file.write("        knowledge.knowledge_type = KnowledgeItem.FACT\n")
-        file.write("        knowledge.attribute_name = predicate_name.strip()\n")
-        file.write("        knowledge.is_negative = False\n")
-        file.write("        if parameters:\n")
-        file.write("            parameter_order = PREDICATE_PARAMETER_ORDER.get(predicate_name.strip())\n")
-        file.write("            if parameter_order:\n")
-        file.write("                missing_params = [p for p in parameter_order if p not in parameters]\n")
-        file.write("                if missing_params:\n")
-        file.write("                    rospy.logerr(\"Paramètres manquants pour le prédicat '{}': {}\".format(predicate_name, missing_params))\n")
-        file.write("                    return\n")
-        file.write("                knowledge.values = [KeyValue(key=k, value=parameters[k]) for k in parameter_order]\n")
-        file.write("            else:\n")
-        file.write("                rospy.logdebug(\"Ordre des paramètres non défini pour le prédicat '{}'. Utilisation de l'ordre par défaut.\".format(predicate_name))\n")
-        file.write("                knowledge.values = [KeyValue(key=k, value=v) for k, v in parameters.items()]\n")
-        file.write("        else:\n")
-        file.write("            knowledge.values = []\n")
-        file.write("        request.knowledge = knowledge\n")
-        file.write("        request.update_type = KnowledgeUpdateServiceRequest.ADD_KNOWLEDGE if add else KnowledgeUpdateServiceRequest.REMOVE_KNOWLEDGE\n")
-        file.write("        rospy.logdebug(\"Envoi de la requête à la KB: {}\".format(request))\n")
-        file.write("        response = update_kb_client(request)\n")
-        file.write("        if response.success:\n")
-        file.write("            rospy.logdebug('KB mise à jour : {} avec {}'.format(predicate_name, parameters))\n")
-        file.write("        else:\n")
-        file.write("            rospy.logerr('Échec de la mise à jour de la KB pour le prédicat {}'.format(predicate_name))\n")
-        file.write("    except rospy.ServiceException as e:\n")
-        file.write("        rospy.logerr('Erreur lors de l\\'appel au service : {}'.format(e))\n")
-        file.write("    except rospy.ROSException:\n")
-        file.write("        rospy.logerr('Timeout lors de l\\'attente du service {}'.format(service_name))\n\n")
+                journal.debug("Prédicat '{}' non défini dans ALL_PREDICATE_PARAMETER_ORDER. Ignoré.".format(predicate))
+        file.write("})\n\n")
 
-        # ==================================
-        # Décorateur KBUpdateDecorator
-        # ==================================
-        file.write("# ==================================\n")
-        file.write("# Décorateur KBUpdateDecorator\n")
-        file.write("# ==================================\n\n")
-        file.write("class KBUpdateDecorator(py_trees.decorators.Decorator):\n")
-        file.write("    def __init__(self, name, on_success_predicates=[], on_failure_remove_predicates=[], on_success_remove_predicates=[], on_failure_predicates=[], child=None):\n")
-        file.write("        super(KBUpdateDecorator, self).__init__(name=name, child=child)\n")
-        file.write("        self.on_success_predicates = on_success_predicates\n")
-        file.write("        self.on_failure_remove_predicates = on_failure_remove_predicates\n")
-        file.write("        self.on_success_remove_predicates = on_success_remove_predicates\n")
-        file.write("        self.on_failure_predicates = on_failure_predicates\n")
-        file.write("\n")
-        file.write("    def update(self):\n")
-        file.write("        child_status = self.decorated.status\n")
-        file.write("\n")
-        file.write("        if child_status == py_trees.common.Status.SUCCESS:\n")
-        file.write("            rospy.logdebug(\"[KBUpdateDecorator] '{}' succeeded. Updating KB...\".format(self.name))\n")
-        file.write("            for predicate_name, parameters in self.on_success_predicates:\n")
-        file.write("                update_kb(predicate_name, parameters, add=True)\n")
-        file.write("            for predicate_name, parameters in self.on_success_remove_predicates:\n")
-        file.write("                update_kb(predicate_name, parameters, add=False)\n")
-        file.write("            return py_trees.common.Status.SUCCESS\n")
-        file.write("\n")
-        file.write("        elif child_status == py_trees.common.Status.FAILURE:\n")
-        file.write("            rospy.logdebug(\"[KBUpdateDecorator] '{}' failed. Updating KB...\".format(self.name))\n")
-        file.write("            for predicate_name, parameters in self.on_failure_remove_predicates:\n")
-        file.write("                update_kb(predicate_name, parameters, add=False)\n")
-        file.write("            for predicate_name, parameters in self.on_failure_predicates:\n")
-        file.write("                update_kb(predicate_name, parameters, add=True)\n")
-        file.write("            return py_trees.common.Status.FAILURE\n")
-        file.write("\n")
-        file.write("        else:\n")
-        file.write("            return child_status\n\n")
+        file.write("# Problème dont le :init initialise le miroir\n")
+        file.write("PROBLEM_FILE = {0!r}\n\n".format(os.path.abspath(problem_file) if problem_file else None))
 
         # ==================================
         # Création du Behavior Tree avec Décorateurs
@@ -315,23 +656,6 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
         # Mapping des marker IDs aux noms de topics
         file.write("    # Mapping des marker IDs aux noms de topics\n")
         file.write("    marker_id_to_topic = {\n")
-        marker_id_to_topic = {
-            581: "/aruco_single_581/pose",
-            582: "/aruco_single_582/pose",
-            583: "/aruco_single_583/pose",
-            584: "/aruco_single_584/pose",
-            585: "/arucotableau1/pose",
-            586: "/arucotableau2/pose",
-            587: "/arucotableau3/pose",
-            588: "/arucotableau4/pose",
-            589: "/arucotableau5/pose",
-            590: "/arucotableau6/pose",
-            591: "/arucotableau7/pose",
-            592: "/arucotableau8/pose",
-            578: "/aruco_single_578/pose",
-            579: "/aruco_single_579/pose",
-            # Ajoutez d'autres mappings si nécessaire
-        }
         for marker_id, topic_name in marker_id_to_topic.items():
             file.write("        {}: \"{}\",\n".format(marker_id, topic_name))
         file.write("    }\n\n")
@@ -343,7 +667,7 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
                 pick_marker_id = knowledge_base.get(base_op_key, {}).get('pick_aruco_frame', 0)
                 place_marker_id = knowledge_base.get(base_op_key, {}).get('place_aruco_frame', 0)
             else:
-                rospy.logwarn("L'opération '{}' n'est pas dans knowledge_base. Utilisation des valeurs par défaut pour les marker IDs.".format(op_key))
+                journal.warning("L'opération '{}' n'est pas dans knowledge_base. Utilisation des valeurs par défaut pour les marker IDs.".format(op_key))
                 pick_marker_id = 0  # Valeur par défaut
                 place_marker_id = 0
             file.write("    marker_id_pick_{0} = {1}\n".format(op_key, pick_marker_id))
@@ -356,9 +680,10 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
 
         # Nous allons également garder une liste des noms de décorateurs pour l'ajout à la racine
         decorator_names = []
+        actions_emises = []  # (nom, détails) des actions ayant un décorateur, dans l'ordre
 
         # Définir toutes les séquences et décorateurs à l'intérieur de la fonction
-        for op_name, details in actions_dict.items():
+        for op_name, details in actions_arbre(actions_dict).items():
             action_type = details["action"]  # "pick", "place", "move_to", "wait"
 
             if action_type == "move_to":
@@ -371,23 +696,16 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
                     file.write("    move_base_goal = MoveBaseGoalAction(\"Move to {0}\", x={1}, y={2}, orientation_z={3}, orientation_w={4})\n".format(
                         details['to'], coordinates['x'], coordinates['y'], coordinates['orientation_z'], coordinates['orientation_w']))
                 else:
-                    rospy.logerr("Coordonnées non définies pour la localisation '{}'".format(details['to']))
+                    journal.error("Coordonnées non définies pour la localisation '{}'".format(details['to']))
                     continue
                 file.write("    {0}.add_child(move_base_goal)\n\n".format(move_sequence_name))
 
-                # Générer le prédicat dynamique pour move_to
-                predicate_name_done = "move_to_{}_done".format(details['to'])
-
                 # Générer le décorateur pour move_to
                 move_decorator_name = "MoveDecorator_{0}".format(op_name)
-                file.write("    {0} = KBUpdateDecorator(\n".format(move_decorator_name))
-                file.write("        name=\"{0}\",\n".format(move_decorator_name))
-                file.write("        on_success_predicates=[('at', {{'a': '{0}', 'l': '{1}'}}), ('{2}', {{}})],\n".format(details['agent'], details['to'], predicate_name_done))
-                file.write("        on_success_remove_predicates=[('at', {{'a': '{0}', 'l': '{1}'}})],\n".format(details['agent'], details['from']))
-                file.write("        child={0}\n".format(move_sequence_name))
-                file.write("    )\n\n")
+                ecrire_decorateur(file, move_decorator_name, details, move_sequence_name)
                 file.write("    decorators.append({0})\n\n".format(move_decorator_name))
                 decorator_names.append(move_decorator_name)
+                actions_emises.append((op_name, details))
 
             elif action_type == "wait":
                 # Générer la séquence de wait
@@ -400,67 +718,83 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
 
                 # Générer le décorateur pour wait
                 wait_decorator_name = "WaitDecorator_{0}".format(op_name)
-                file.write("    {0} = KBUpdateDecorator(\n".format(wait_decorator_name))
-                file.write("        name=\"{0}\",\n".format(wait_decorator_name))
-                file.write("        on_success_predicates=[('wait_done', {{'a': '{0}'}})],\n".format(details["agent"]))
-                file.write("        child={0}\n".format(wait_sequence_name))
-                file.write("    )\n\n")
+                ecrire_decorateur(file, wait_decorator_name, details, wait_sequence_name)
                 file.write("    decorators.append({0})\n\n".format(wait_decorator_name))
                 decorator_names.append(wait_decorator_name)
+                actions_emises.append((op_name, details))
+
+            elif action_type == "sync":
+                # Générer le point de synchronisation avec les partenaires de l'opération Co
+                file.write("    # Point de synchronisation pour {0}\n".format(op_name))
+                sync_sequence_name = "SyncSequence_{0}".format(op_name)
+                file.write("    {0} = py_trees.composites.Sequence(\"{0}\")\n".format(sync_sequence_name))
+                file.write("    sync_point = PointSynchronisation(\"Sync_{0}\", \"{1}\", \"{2}\", {3}, client=KB_CLIENT)\n".format(
+                    op_name, details["agent"], details["step"], details["partners"]))
+                file.write("    {0}.add_child(sync_point)\n\n".format(sync_sequence_name))
+
+                # Générer le décorateur pour sync
+                sync_decorator_name = "SyncDecorator_{0}".format(op_name)
+                ecrire_decorateur(file, sync_decorator_name, details, sync_sequence_name)
+                file.write("    decorators.append({0})\n\n".format(sync_decorator_name))
+                decorator_names.append(sync_decorator_name)
+                actions_emises.append((op_name, details))
+
+            elif action_type == "operator":
+                # Générer la consigne de l'opérateur humain (publiée, puis attente de son acquittement)
+                file.write("    # Consigne de l'opérateur pour {0}\n".format(op_name))
+                operator_sequence_name = "OperatorSequence_{0}".format(op_name)
+                file.write("    {0} = py_trees.composites.Sequence(\"{0}\")\n".format(operator_sequence_name))
+                file.write("    consigne = ConsigneOperateur(\"Operator_{0}\", \"{1}\", \"{2}\")\n".format(
+                    op_name, details["agent"], details["op_key"]))
+                file.write("    {0}.add_child(consigne)\n\n".format(operator_sequence_name))
+
+                # Générer le décorateur pour la consigne
+                operator_decorator_name = "OperatorDecorator_{0}".format(op_name)
+                ecrire_decorateur(file, operator_decorator_name, details, operator_sequence_name)
+                file.write("    decorators.append({0})\n\n".format(operator_decorator_name))
+                decorator_names.append(operator_decorator_name)
+                actions_emises.append((op_name, details))
+
+            elif action_type == "detect":
+                # Récupérer le topic du marqueur à détecter avant le pick
+                marker_id = knowledge_base.get(get_base_op_key(details["op_key"]), {}).get('pick_aruco_frame', 0)
+                topic_name = marker_id_to_topic.get(marker_id, "/aruco_single_1/pose")  # Valeur par défaut
+
+                # Générer la séquence de détection (tête et caméra seulement)
+                file.write("    # Séquence de détection pour {0}\n".format(op_name))
+                detect_sequence_name = "DetectSequence_{0}".format(op_name)
+                file.write("    {0} = py_trees.composites.Sequence(\"{0}\")\n".format(detect_sequence_name))
+                file.write("    detection_selector = py_trees.composites.Selector(\"DetectionSelector_{0}\")\n".format(op_name))
+                file.write("    check_aruco = VerifierAruco(name=\"CheckAruco_{0}\", topic_name=\"{1}\", timeout=2.0)\n".format(op_name, topic_name))
+                file.write("    observe_and_check = py_trees.composites.Sequence(\"ObserveAndCheck_{0}\")\n".format(op_name))
+                file.write("    observe_table_action = ObserveTableAction(\"ObserveTableAction_{0}\")\n".format(op_name))
+                file.write("    check_aruco_again = VerifierAruco(\"CheckAruco_{0}_Again\", topic_name=\"{1}\", timeout=2.0)\n".format(op_name, topic_name))
+                file.write("    observe_and_check.add_children([observe_table_action, check_aruco_again])\n")
+                file.write("    detection_selector.add_children([check_aruco, observe_and_check])\n")
+                file.write("    {0}.add_child(detection_selector)\n\n".format(detect_sequence_name))
+
+                # Générer le décorateur pour la détection
+                detect_decorator_name = "DetectDecorator_{0}".format(op_name)
+                ecrire_decorateur(file, detect_decorator_name, details, detect_sequence_name)
+                file.write("    decorators.append({0})\n\n".format(detect_decorator_name))
+                decorator_names.append(detect_decorator_name)
+                actions_emises.append((op_name, details))
 
             elif action_type in ["pick", "place"]:
                 tool = details["tool"]
                 op_key = details["op_key"]
                 base_op_key = get_base_op_key(op_key)
                 if not op_key:
-                    rospy.logwarn("Aucun mapping trouvé pour l'outil '{}'".format(tool))
+                    journal.warning("Aucun mapping trouvé pour l'outil '{}'".format(tool))
                     continue
 
-                if action_type == "pick":
-                    marker_id_var = "marker_id_pick_{0}".format(op_key)
-                    predicate_name_done = "pick_{0}_done".format(op_key.lower())
-                    predicate_name = "holding"
-                    predicate_params = {"a": details["agent"], "t": details["tool"]}
-                    predicate_remove = ("tool_at", {"t": details["tool"], "l": details["location"]})
-                    # Déterminer la localisation opposée
-                    original_location = details["location"]
-                    opposite_loc = opposite_location.get(original_location, None)
-                    if opposite_loc is None:
-                        rospy.logerr("Localisation opposée non définie pour '{}'".format(original_location))
-                        opposite_loc = "loc_base"  # Valeur par défaut
-                else:  # place
-                    marker_id_var = "marker_id_place_{0}".format(op_key)
-                    predicate_name_done = "place_{0}_done".format(op_key.lower())
-                    predicate_name = "tool_at"
-                    # Pour l'action place, la localisation est celle spécifiée dans l'action
-                    # Si la localisation n'est pas spécifiée, on utilise 'loc_workstation' par défaut
-                    location = details.get("location", "loc_workstation")
-                    predicate_params = {"t": details["tool"], "l": location}
-                    predicate_remove = ("holding", {"a": details["agent"], "t": details["tool"]})
-                    # Déterminer la localisation opposée
-                    original_location = location
-                    opposite_loc = opposite_location.get(original_location, None)
-                    if opposite_loc is None:
-                        rospy.logerr("Localisation opposée non définie pour '{}'".format(original_location))
-                        opposite_loc = "loc_base"  # Valeur par défaut
+                marker_id_var = "marker_id_{0}_{1}".format(action_type, op_key)
 
                 if action_type == "pick":
-                    # Récupérer le marker_id et le topic_name pour le marqueur à détecter
-                    marker_id = knowledge_base.get(base_op_key, {}).get('pick_aruco_frame', 0)
-                    topic_name = marker_id_to_topic.get(marker_id, "/aruco_single_1/pose")  # Valeur par défaut
-
-                    # Générer la séquence de pick
+                    # Générer la séquence de pick (le marqueur a été détecté par le nœud DETECT qui précède)
                     file.write("    # Séquence de pick pour {0}\n".format(op_name))
                     pick_sequence_name = "PickSequence_{0}".format(op_name)
                     file.write("    {0} = py_trees.composites.Sequence(\"{0}\")\n".format(pick_sequence_name))
-                    file.write("    detection_selector = py_trees.composites.Selector(\"DetectionSelector_{0}\")\n".format(op_name))
-                    file.write("    check_aruco = CheckArucoDetected(name=\"CheckAruco_{0}\", topic_name=\"{1}\", timeout=2.0)\n".format(op_name, topic_name))
-                    file.write("    observe_and_check = py_trees.composites.Sequence(\"ObserveAndCheck_{0}\")\n".format(op_name))
-                    file.write("    observe_table_action = ObserveTableAction(\"ObserveTableAction_{0}\")\n".format(op_name))
-                    file.write("    check_aruco_again = CheckArucoDetected(\"CheckAruco_{0}_Again\", topic_name=\"{1}\", timeout=2.0)\n".format(op_name, topic_name))
-                    file.write("    observe_and_check.add_children([observe_table_action, check_aruco_again])\n")
-                    file.write("    detection_selector.add_children([check_aruco, observe_and_check])\n")
-                    file.write("    {0}.add_child(detection_selector)\n".format(pick_sequence_name))
                     file.write("    {0}.add_children([\n".format(pick_sequence_name))
                     file.write("        PreGraspArmRightAction(\"PreGraspArmRight_{0}\"),\n".format(op_name))
                     file.write("        moveitAruco(\"MoveItAruco_{0}\", {1}),\n".format(op_name, marker_id_var))
@@ -473,19 +807,10 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
 
                     # Générer le décorateur pour pick avec les on_failure_predicates et on_failure_remove_predicates
                     pick_decorator_name = "PickDecorator_{0}".format(op_name)
-                    file.write("    {0} = KBUpdateDecorator(\n".format(pick_decorator_name))
-                    file.write("        name=\"{0}\",\n".format(pick_decorator_name))
-                    file.write("        on_success_predicates=[('holding', {{'a': '{0}', 't': '{1}'}}), ('{2}', {{}})],\n".format(
-                        predicate_params["a"], predicate_params["t"], predicate_name_done))
-                    # Ajout des on_failure_predicates et on_failure_remove_predicates
-                    file.write("        on_failure_predicates=[('tool_at', {{'t': '{0}', 'l': '{1}'}})],\n".format(
-                        details["tool"], opposite_loc))
-                    file.write("        on_failure_remove_predicates=[('tool_at', {{'t': '{0}', 'l': '{1}'}})],\n".format(
-                        details["tool"], original_location))
-                    file.write("        child={0}\n".format(pick_sequence_name))
-                    file.write("    )\n\n")
+                    ecrire_decorateur(file, pick_decorator_name, details, pick_sequence_name)
                     file.write("    decorators.append({0})\n\n".format(pick_decorator_name))
                     decorator_names.append(pick_decorator_name)
+                    actions_emises.append((op_name, details))
 
                 elif action_type == "place":
                     # Récupérer le marker_id et le topic_name pour le marqueur à détecter
@@ -505,27 +830,21 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
 
                     # Générer le décorateur pour place avec les on_failure_predicates et on_failure_remove_predicates
                     place_decorator_name = "PlaceDecorator_{0}".format(op_name)
-                    file.write("    {0} = KBUpdateDecorator(\n".format(place_decorator_name))
-                    file.write("        name=\"{0}\",\n".format(place_decorator_name))
-                    file.write("        on_success_predicates=[('tool_at', {{'t': '{0}', 'l': '{1}'}}), ('{2}', {{}})],\n".format(
-                        predicate_params["t"], location, predicate_name_done))
-                    file.write("        on_success_remove_predicates=[('holding', {{'a': '{0}', 't': '{1}'}})],\n".format(
-                        predicate_remove[1]["a"], predicate_remove[1]["t"]))
-                    # Ajout des on_failure_predicates et on_failure_remove_predicates
-                    file.write("        on_failure_predicates=[('holding', {{'a': '{0}', 't': '{1}'}})],\n".format(
-                        details["agent"], details["tool"]))
-                    file.write("        on_failure_remove_predicates=[('tool_at', {{'t': '{0}', 'l': '{1}'}})],\n".format(
-                        details["tool"], original_location))
-                    file.write("        child={0}\n".format(place_sequence_name))
-                    file.write("    )\n\n")
+                    ecrire_decorateur(file, place_decorator_name, details, place_sequence_name)
                     file.write("    decorators.append({0})\n\n".format(place_decorator_name))
                     decorator_names.append(place_decorator_name)
+                    actions_emises.append((op_name, details))
 
-        # Ajouter tous les décorateurs au root dans l'ordre
+        # Ajouter les décorateurs au root dans l'ordre du plan, les actions indépendantes en branches parallèles
+        structure = structurer_actions(graphe_dependances([details for _, details in actions_emises]),
+                                       [op_name for op_name, _ in actions_emises])
+        if structure_parallele(structure):
+            file.write("    # Branches parallèles : actions sans ressource ni prédicat commun\n")
+        enfants = [ecrire_composite(file, enfant, decorator_names) for enfant in structure]
         file.write("    # Ajouter les décorateurs au root\n")
         file.write("    root.add_children([\n")
-        for decorator_name in decorator_names:
-            file.write("        {},\n".format(decorator_name))
+        for enfant in enfants:
+            file.write("        {},\n".format(enfant))
         file.write("    ])\n\n")
         file.write("    return root\n\n")
 
@@ -540,6 +859,13 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
         file.write("    # Créer le Behavior Tree\n")
         file.write("    bt_root = create_behavior_tree()\n")
         file.write("    bt = py_trees_ros.trees.BehaviourTree(bt_root)\n\n")
+        file.write("    # Initialiser le miroir de la KB depuis le :init du problème, puis le réconcilier avec la KB distante\n")
+        file.write("    if PROBLEM_FILE:\n")
+        file.write("        KB_MIROIR.charger_probleme(PROBLEM_FILE)\n")
+        file.write("    reconciliateur = Reconciliateur(KB_MIROIR, SourceROS(), KB_CLIENT).demarrer()\n\n")
+        file.write("    # Profilage optionnel (paramètre ~profilage : préfixe des fichiers JSON et CSV exportés en fin d'exécution)\n")
+        file.write("    profilage = rospy.get_param('~profilage', '')\n")
+        file.write("    profileur = ProfileurBT().instrumenter(bt.root, KB_CLIENT) if profilage else None\n\n")
         file.write("    # Afficher l'arbre en ASCII\n")
         file.write("    tree_ascii = py_trees.display.ascii_tree(bt.root)\n")
         file.write("    rospy.loginfo(\"\\n\" + tree_ascii)\n\n")
@@ -549,7 +875,10 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
         file.write("    # Boucle principale\n")
         file.write("    rate = rospy.Rate(10)\n")
         file.write("    while not rospy.is_shutdown():\n")
-        file.write("        bt.tick()\n")
+        file.write("        if profileur is not None:\n")
+        file.write("            profileur.tick(bt)\n")
+        file.write("        else:\n")
+        file.write("            bt.tick()\n")
         file.write("        tree_status = bt.root.status\n\n")
         file.write("        if tree_status == py_trees.common.Status.RUNNING:\n")
         file.write("            rospy.loginfo('Behavior Tree en cours d\\'exécution...')\n")
@@ -560,15 +889,205 @@ def create_behavior_tree_file(actions_dict, tool_to_op, output_file):
         file.write("            rospy.loginfo('Behavior Tree terminé avec statut : SUCCESS')\n")
         file.write("            break  # Arrêter la boucle en cas de SUCCESS\n")
         file.write("        rate.sleep()\n\n")
+        file.write("    # Attendre l'envoi des dernières mises à jour de la KB avant de quitter\n")
+        file.write("    reconciliateur.arreter()\n")
+        file.write("    if not KB_CLIENT.fermer(DELAI_SERVICE):\n")
+        file.write("        rospy.logerr('Mises à jour de la KB non confirmées avant l\\'arrêt')\n")
+        file.write("    if profileur is not None:\n")
+        file.write("        rospy.loginfo('Profil exporté : {}'.format(', '.join(profileur.exporter(profilage))))\n\n")
         file.write("if __name__ == '__main__':\n")
         file.write("    main()\n")
 
-def main():
-    plan_file = "/home/admin-local/eXoBot_ws/src/rosplan_demos/rosplan_demos/common/plan.pddl"
+# Version du format de la spécification JSON lue par BTRuntime
+VERSION_SPECIFICATION = 2
+
+def construire_specification(actions_dict, tool_to_op, problem_file=None):
+    """
+    Description déclarative du Behavior Tree, construite par BTRuntime sans générer de code : une entrée par
+    action du plan (type, paramètres du nœud et mises à jour de la KB de son décorateur).
+
+    :return: Dictionnaire sérialisable en JSON.
+    """
+    noeuds = []
+    details_emis = []
+    used_predicates = set()
+    for op_name, details in actions_arbre(actions_dict).items():
+        action_type = details["action"]
+        noeud = collections.OrderedDict([("type", action_type), ("name", op_name)])
+
+        if action_type == "move_to":
+            coordinates = location_coordinates.get(details['to'])
+            if not coordinates:
+                journal.error("Coordonnées non définies pour la localisation '{}'".format(details['to']))
+                continue
+            noeud["to"] = details['to']
+            noeud["coordinates"] = coordinates
+        elif action_type == "wait":
+            noeud["duration"] = details.get("duration", 10.0)  # Durée par défaut de 10.0 secondes
+        elif action_type == "sync":
+            noeud["agent"] = details["agent"]
+            noeud["step"] = details["step"]
+            noeud["partners"] = details["partners"]
+        elif action_type == "operator":
+            noeud["agent"] = details["agent"]
+            noeud["operation"] = details["op_key"]
+        elif action_type == "detect":
+            marker_id = knowledge_base.get(get_base_op_key(details["op_key"]), {}).get('pick_aruco_frame', 0)
+            noeud["topic_name"] = marker_id_to_topic.get(marker_id, "/aruco_single_1/pose")  # Valeur par défaut
+        elif action_type in ["pick", "place"]:
+            op_key = details["op_key"]
+            if not op_key:
+                journal.warning("Aucun mapping trouvé pour l'outil '{}'".format(details["tool"]))
+                continue
+            base_op_key = get_base_op_key(op_key)
+            if base_op_key not in knowledge_base:
+                journal.warning("L'opération '{}' n'est pas dans knowledge_base. Utilisation des valeurs par défaut pour les marker IDs.".format(op_key))
+            noeud["marker_id"] = knowledge_base.get(base_op_key, {}).get('{}_aruco_frame'.format(action_type), 0)
+        else:
+            continue
+
+        predicats = predicats_kb(details)
+        noeud["kb"] = collections.OrderedDict((cle, [[nom, parametres] for nom, parametres in predicats[cle]])
+                                              for cle in CLES_PREDICATS_KB)
+        for cle in CLES_PREDICATS_KB:
+            used_predicates.update(nom for nom, _ in predicats[cle])
+        noeuds.append(noeud)
+        details_emis.append(details)
+
+    # Les actions indépendantes forment des branches parallèles ; sans parallélisme, la séquence des nœuds suffit
+    structure = structurer_actions(graphe_dependances(details_emis), [noeud["name"] for noeud in noeuds])
+
+    # Les prédicats *_done n'ont pas de paramètres : leur ordre est vide
+    ordre = collections.OrderedDict((nom, ALL_PREDICATE_PARAMETER_ORDER.get(nom, [])) for nom in sorted(used_predicates))
+    specification = collections.OrderedDict([("version", VERSION_SPECIFICATION), ("predicate_parameter_order", ordre),
+                                             ("nodes", noeuds)])
+    if structure_parallele(structure):
+        # Enfants de RootSequence : indices dans nodes, ou composites {type, name, children}
+        specification["structure"] = structure
+    if problem_file:
+        # Problème dont le :init initialise le miroir de la KB de BTRuntime
+        specification["problem"] = os.path.abspath(problem_file)
+    return specification
+
+def create_behavior_tree_spec(actions_dict, tool_to_op, output_file, problem_file=None):
+    # Écriture atomique : BTRuntime peut recharger la spécification pendant qu'elle est régénérée
+    specification = construire_specification(actions_dict, tool_to_op, problem_file)
+    P2_Dispatcher.ecrire_atomique(output_file, json.dumps(specification, separators=(',', ':')) + "\n")
+
+def ecrire_arbre(actions_dict, tool_to_op, output_file, problem_file=None):
+    # Spécification JSON pour BTRuntime si le fichier de sortie est un .json, module Python autonome sinon
+    if output_file.endswith(".json"):
+        create_behavior_tree_spec(actions_dict, tool_to_op, output_file, problem_file)
+    else:
+        create_behavior_tree_file(actions_dict, tool_to_op, output_file, problem_file)
+
+def actions_depuis_dispatch(dispatch):
+    """
+    Construit directement, à partir des données de P2 (planning filtré de P1 et catalogue des opérations
+    élémentaires), les structures que parse_pddl_plan extrait d'un plan du domaine chaîné : le plan nominal
+    suit l'ordre du planning, le planificateur n'est donc pas nécessaire.
+
+    Comme dans un plan, l'agent rejoint d'abord loc_workstation (où sont les outils), puis chaque entrée du
+    planning donne son wait, son point de synchronisation (opération Co d'un dispatch partitionné), son pick et
+    son place. Un opérateur humain (clé 'operateur' du dispatch, PartitionAgents) ne se déplace pas et n'a ni
+    pick ni place : chaque opération donne une consigne (action 'operator') après son point de synchronisation.
+    Les clés d'action suivent le format de parse_pddl_plan, avec des instants espacés de 0.001 comme
+    dans les plans de POPF.
+
+    :param dispatch: Données produites par P2_Dispatcher.analyser_planning.
+    :return: Tuple (actions_dict, tool_to_op), identique à celui de parse_pddl_plan.
+    """
+    actions = collections.OrderedDict()
+    tool_to_op = {}
+    agent = P2_Dispatcher.agent_dispatch(dispatch)
+    synchronisations = dispatch.get("synchronisations") or {}
+    instants = ("{:.3f}".format(indice * 0.001).replace('.', '_') for indice in itertools.count())
+    operateur = dispatch.get("operateur", False)
+    if not operateur:
+        actions["MOVE_TO_" + next(instants)] = {
+            "action": "move_to",
+            "agent": agent,
+            "from": "loc_base",
+            "to": "loc_workstation"
+        }
+    for op_entry in dispatch["filtered_logs"]:
+        if op_entry.op_name == "wait":
+            actions["WAIT_" + next(instants)] = {
+                "action": "wait",
+                "agent": agent,
+                "duration": 10.0,
+                "step": None
+            }
+            continue
+        if op_entry.op_name in synchronisations:
+            actions["SYNC_{}_{}".format(op_entry.op_name, next(instants))] = {
+                "action": "sync",
+                "agent": agent,
+                "op_key": op_entry.op_name,
+                "step": P2_Dispatcher.etape_synchronisation(op_entry.op_name),
+                "parametre": False,
+                "prev": None,
+                "partners": [partenaire for partenaire in synchronisations[op_entry.op_name] if partenaire != agent]
+            }
+        if operateur:
+            actions["OPERATOR_{}_{}".format(op_entry.op_name, next(instants))] = {
+                "action": "operator",
+                "agent": agent,
+                "op_key": op_entry.op_name,
+                "prev": None
+            }
+            continue
+        if not op_entry.tool:
+            continue  # Opération sans pick ni place : pas d'action dans le domaine chaîné
+        tool_to_op[op_entry.tool] = op_entry.op_name
+        for action_type, drapeau, location in (("pick", P2_Dispatcher.ACTION_PICK, "loc_workstation"),
+                                               ("place", P2_Dispatcher.ACTION_PLACE, None)):
+            if op_entry.actions & drapeau:
+                action_key = "{}_{}_{}".format(action_type.upper(), op_entry.op_name, next(instants))
+                actions[action_key] = {
+                    "action": action_type,
+                    "agent": agent,
+                    "tool": op_entry.tool,
+                    "location": location,
+                    "op_key": op_entry.op_name,
+                    "parametre": False,
+                    "pick_only": False
+                }
+    return actions, tool_to_op
+
+def assembler_depuis_dispatch(dispatch, output_file, problem_file=None):
+    """
+    Chemin rapide planning -> Behavior Tree, sans PDDL ni planificateur (exécution nominale). Le PDDL ne sert
+    alors qu'à replanifier après un écart, et problem_file qu'à initialiser le miroir de la KB.
+    """
+    actions_dict, tool_to_op = actions_depuis_dispatch(dispatch)
+    actions_dict = filter_actions(actions_dict)
+    ecrire_arbre(actions_dict, tool_to_op, output_file, problem_file)
+    return actions_dict
+
+def assembler(plan_file, output_file, domain_file=None, problem_file=None):
+    """
+    Assemble le Behavior Tree d'un plan. Si le domaine et le problème sont fournis, le plan est d'abord validé
+    (préconditions et effets de chaque étape) et rejeté avant toute génération s'il est invalide.
+
+    :raises ValueError: Si le plan est invalide.
+    """
+    if domain_file is not None and problem_file is not None:
+        import Planificateur
+        resultat = Planificateur.valider_fichiers(domain_file, problem_file, plan_file)
+        if not resultat.valide:
+            raise ValueError("Plan invalide à l'étape {} ({}) : {}".format(resultat.indice, resultat.ligne or "fin du plan",
+                                                                           resultat.raison))
     actions_dict, tool_to_op = parse_pddl_plan(plan_file)
     actions_dict = filter_actions(actions_dict)  # Ajout du filtrage des actions
-    output_file = "/home/admin-local/tiago_dual_public_ws/src/my_tiago_project/scripts/behavior_tree_autoV2.py"
-    create_behavior_tree_file(actions_dict, tool_to_op, output_file)
+    completer_synchronisations(actions_dict, problem_file)
+    ecrire_arbre(actions_dict, tool_to_op, output_file, problem_file)
+    return actions_dict
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    output_file = bt_file_path
+    assembler(plan_file_path, output_file)
     print("Behavior Tree file '{0}' generated successfully.".format(output_file))
 
 if __name__ == "__main__":
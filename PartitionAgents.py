@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Partition multi-agents du planning : un problème PDDL et un Behavior Tree par agent
+#
+# Chaque ressource du planning de P1 autre que Co (R, H, R1, R2...) est un agent. Une opération Co est
+# réalisée en commun : elle figure dans la partition de chacun de ses participants, précédée d'un point de
+# synchronisation où chaque agent annonce sa présence dans la KB partagée, (synchronised ?a ?op), puis attend
+# celle de ses partenaires (MiroirKB.PointSynchronisation). Les partitions sont planifiées et assemblées en
+# parallèle dans un pool de processus, chacune dans son sous-répertoire ; synchronisations.json décrit les
+# points de synchronisation de toute la cellule.
+#
+# Seuls les robots (par défaut les ressources R, R1, R2...) reçoivent un domaine, un plan et des actions du
+# robot. Un agent opérateur (H...) n'a ni PDDL ni plan : son arbre enchaîne, pour chacune de ses opérations, le
+# point de synchronisation éventuel puis une consigne à acquitter (Operateur.ConsigneOperateur).
+#
+# Exemple :
+#   python PartitionAgents.py AlternativeAlpha06.sol --sortie agents --mode parametre --planifier --json
+#   python PartitionAgents.py AlternativeAlpha06.sol --sortie agents --robots R,H2 --direct
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import time
+
+import P1_Convertisseur
+import P2_Dispatcher
+
+ResultatPartition = collections.namedtuple('ResultatPartition', [
+    'planning',          # Liste d'OperationPlanifiee produite par P1
+    'partitions',        # Données de dispatch de chaque agent (OrderedDict {agent: dispatch})
+    'synchronisations',  # Points de synchronisation (résultat de points_synchronisation)
+    'fichiers',          # Fichiers écrits par agent : {agent: {nom logique ('domain', 'problem', 'plan', 'bt'): chemin}}
+    'fichier_synchronisations',  # Chemin de synchronisations.json
+    'durees',            # Durée de chaque étape en secondes (OrderedDict), étapes des agents cumulées
+])
+
+def nom_agent(ressource):
+    # Objet PDDL de l'agent d'une ressource ('R' -> 'agent_r', comme l'agent historique de P2)
+    return "agent_" + ressource.lower()
+
+# Préfixe des ressources robots par défaut ; les autres agents sont des opérateurs humains
+PREFIXE_ROBOT = "R"
+
+def est_robot(ressource, robots=None):
+    """
+    :param robots: Ressources qui sont des robots (par défaut, celles dont le nom commence par PREFIXE_ROBOT).
+    """
+    return ressource.startswith(PREFIXE_ROBOT) if robots is None else ressource in robots
+
+def ressources_agents(planning):
+    """
+    :return: Liste triée des ressources du planning qui sont des agents (toutes sauf Co).
+    """
+    return sorted(set(ressource for _, _, ressource, _, _ in planning if ressource != P2_Dispatcher.RESSOURCE_CO))
+
+def partitionner(planning, index_operations, participants_co=None, robots=None):
+    """
+    Découpe le planning en un dispatch par agent (P2_Dispatcher.analyser_planning restreint à sa ressource et
+    aux opérations Co auxquelles il participe). Le dispatch porte l'agent (clé 'agent'), s'il est un opérateur
+    humain (clé 'operateur') et, s'il partage des opérations Co avec d'autres agents, leurs participants (clé
+    'synchronisations' : OrderedDict {opération: liste triée des agents}) : P2 ajoute alors le point de
+    synchronisation au domaine et ses faits au problème.
+
+    :param planning: Opérations triées par temps de début (tuples (opération, job, ressource, début, fin)).
+    :param index_operations: Index produit par P2_Dispatcher.indexer_operations_elementaires.
+    :param participants_co: Ressources qui réalisent les opérations Co (par défaut, tous les agents).
+    :param robots: Ressources qui sont des robots (par défaut, voir est_robot) ; les autres sont des opérateurs.
+    :return: OrderedDict {agent: dispatch}, dans l'ordre des ressources.
+    :raises ValueError: Si le planning n'a pas d'agent, ou si aucun participant aux opérations Co n'en est un.
+    """
+    ressources = ressources_agents(planning)
+    if not ressources:
+        raise ValueError("Aucun agent dans le planning (ressources autres que '{}').".format(P2_Dispatcher.RESSOURCE_CO))
+    participants = ressources if participants_co is None else [ressource for ressource in ressources
+                                                               if ressource in participants_co]
+    if not participants:
+        raise ValueError("Aucun participant aux opérations Co parmi les agents : {}.".format(", ".join(ressources)))
+    agents_co = [nom_agent(ressource) for ressource in participants]
+
+    partitions = collections.OrderedDict()
+    for ressource in ressources:
+        agent = nom_agent(ressource)
+        retenues = (ressource, P2_Dispatcher.RESSOURCE_CO) if ressource in participants else (ressource,)
+        dispatch = P2_Dispatcher.analyser_planning(planning, index_operations, retenues)
+        dispatch["agent"] = agent
+        dispatch["operateur"] = not est_robot(ressource, robots)
+        if ressource in participants and len(agents_co) > 1:
+            dispatch["synchronisations"] = collections.OrderedDict(
+                (op_entry.op_name, agents_co) for op_entry in dispatch["operations"] if op_entry.co)
+        partitions[agent] = dispatch
+    return partitions
+
+def points_synchronisation(partitions):
+    """
+    Points de synchronisation de la cellule, dans l'ordre du planning.
+
+    :return: Liste de dictionnaires {op, step, start_time, end_time, participants}.
+    """
+    points = collections.OrderedDict()
+    for dispatch in partitions.values():
+        synchronisations = dispatch.get("synchronisations") or {}
+        for op_entry in dispatch["operations"]:
+            if op_entry.op_name in synchronisations and op_entry.op_name not in points:
+                points[op_entry.op_name] = collections.OrderedDict([
+                    ("op", op_entry.op_name), ("step", P2_Dispatcher.etape_synchronisation(op_entry.op_name)),
+                    ("start_time", op_entry.start_time), ("end_time", op_entry.end_time),
+                    ("participants", synchronisations[op_entry.op_name])])
+    return sorted(points.values(), key=lambda point: (point["start_time"], point["op"]))
+
+# ==================================
+# Traitement d'une partition, dans les processus du pool
+# ==================================
+
+def traiter_partition(tache):
+    """
+    Écrit domain.pddl et problem.pddl d'un robot, puis son Behavior Tree (chemin direct, ou planification
+    suivie de P3). Un opérateur n'a pas de PDDL : son Behavior Tree de consignes est construit directement dès
+    qu'un arbre est demandé (direct ou planifier).
+
+    :param tache: Tuple (agent, dispatch, répertoire de l'agent, mode, planifier, direct, specification,
+                  répertoire du cache des plans ou None).
+    :return: Tuple (agent, fichiers écrits par nom logique, durées par étape).
+    """
+    agent, dispatch, repertoire, mode, planifier, direct, specification, repertoire_cache_plans = tache
+    if not os.path.isdir(repertoire):
+        os.makedirs(repertoire)
+    fichiers = collections.OrderedDict()
+    durees = collections.OrderedDict()
+    nom_bt = 'behavior_tree.json' if specification else 'behavior_tree_autoV2.py'
+
+    if dispatch.get("operateur"):
+        if direct or planifier:
+            import P3_Assembleur
+            debut = time.time()
+            fichiers['bt'] = os.path.join(repertoire, nom_bt)
+            P3_Assembleur.assembler_depuis_dispatch(dispatch, fichiers['bt'])
+            durees['P3'] = time.time() - debut
+        return agent, fichiers, durees
+
+    debut = time.time()
+    fichiers['domain'] = os.path.join(repertoire, 'domain.pddl')
+    fichiers['problem'] = os.path.join(repertoire, 'problem.pddl')
+    P2_Dispatcher.generer_domain_pddl(dispatch, fichiers['domain'], mode)
+    P2_Dispatcher.generer_problem_pddl(dispatch, fichiers['problem'], mode)
+    durees['P2'] = time.time() - debut
+
+    if direct:
+        import P3_Assembleur
+        debut = time.time()
+        fichiers['bt'] = os.path.join(repertoire, nom_bt)
+        P3_Assembleur.assembler_depuis_dispatch(dispatch, fichiers['bt'], fichiers['problem'])
+        durees['P3'] = time.time() - debut
+    elif planifier:
+        import Planificateur
+        import P3_Assembleur
+        debut = time.time()
+        fichiers['plan'] = os.path.join(repertoire, 'plan.pddl')
+        cache = Planificateur.CachePlans(repertoire=repertoire_cache_plans) if repertoire_cache_plans else None
+        Planificateur.planifier_fichiers(fichiers['domain'], fichiers['problem'], fichiers['plan'], cache=cache)
+        durees['planification'] = time.time() - debut
+        debut = time.time()
+        fichiers['bt'] = os.path.join(repertoire, nom_bt)
+        P3_Assembleur.assembler(fichiers['plan'], fichiers['bt'], fichiers['domain'], fichiers['problem'])
+        durees['P3'] = time.time() - debut
+    return agent, fichiers, durees
+
+def executer_partition(chemin_sol, operations_file, repertoire_sortie, mode=P2_Dispatcher.MODE_CHAINE, planifier=False,
+                       direct=False, specification=False, processus=None, repertoire_cache=None,
+                       repertoire_cache_plans=None, participants_co=None, robots=None):
+    """
+    Chaîne P1 -> P2 -> (planification) -> P3 pour chaque agent du planning. Les partitions sont traitées en
+    parallèle, chacune dans le sous-répertoire de son agent.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :param operations_file: Chemin de operations_elementaires.json.
+    :param repertoire_sortie: Répertoire racine ; chaque agent a son sous-répertoire (agent_r, agent_h...).
+    :param mode: Mode de génération du domaine (P2_Dispatcher.MODE_CHAINE ou MODE_PARAMETRE).
+    :param planifier: Calculer le plan de chaque agent (planificateur natif, repli sur POPF) puis l'assembler.
+    :param direct: Construire chaque Behavior Tree directement depuis le planning de l'agent.
+    :param specification: Écrire les Behavior Trees en spécification JSON plutôt qu'en module Python.
+    :param processus: Taille du pool (par défaut, un processus par agent dans la limite du nombre de coeurs) ;
+                      1 pour tout traiter dans ce processus.
+    :param repertoire_cache: Répertoire du cache de P1 (None pour le désactiver).
+    :param repertoire_cache_plans: Répertoire du cache des plans (None pour le désactiver).
+    :param participants_co: Ressources qui réalisent les opérations Co (par défaut, tous les agents).
+    :param robots: Ressources qui sont des robots (par défaut, voir est_robot) ; les autres sont des opérateurs.
+    :return: ResultatPartition.
+    :raises ValueError: Si direct est combiné à planifier, si le planning n'a pas d'agent ou si un plan est
+                        introuvable ou invalide.
+    """
+    if direct and planifier:
+        raise ValueError("Le chemin direct n'utilise pas de plan : --direct exclut --planifier.")
+    if not os.path.isdir(repertoire_sortie):
+        os.makedirs(repertoire_sortie)
+    durees = collections.OrderedDict()
+
+    debut = time.time()
+    planning = P1_Convertisseur.charger_solution(chemin_sol, repertoire_cache).planning()
+    durees['P1'] = time.time() - debut
+
+    debut = time.time()
+    index_operations = P2_Dispatcher.indexer_operations_elementaires(
+        P2_Dispatcher.charger_operations_elementaires(operations_file))
+    partitions = partitionner(planning, index_operations, participants_co, robots)
+    synchronisations = points_synchronisation(partitions)
+    chemin_synchronisations = os.path.join(repertoire_sortie, 'synchronisations.json')
+    P2_Dispatcher.ecrire_atomique(chemin_synchronisations, json.dumps(synchronisations, indent=2) + "\n")
+    durees['partition'] = time.time() - debut
+
+    debut = time.time()
+    taches = [(agent, dispatch, os.path.join(repertoire_sortie, agent), mode, planifier, direct, specification,
+               repertoire_cache_plans) for agent, dispatch in partitions.items()]
+    if processus is None:
+        processus = min(len(taches), multiprocessing.cpu_count())
+    if processus == 1:
+        resultats = [traiter_partition(tache) for tache in taches]
+    else:
+        pool = multiprocessing.Pool(processus)
+        try:
+            resultats = pool.map(traiter_partition, taches, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    fichiers = collections.OrderedDict()
+    for agent, fichiers_agent, durees_agent in resultats:
+        fichiers[agent] = fichiers_agent
+        for etape, duree in durees_agent.items():
+            durees[etape] = durees.get(etape, 0.0) + duree
+    durees['agents'] = time.time() - debut
+    return ResultatPartition(planning, partitions, synchronisations, fichiers, chemin_synchronisations, durees)
+
+def formater_partition(resultat):
+    """
+    Formate le résumé d'une partition : opérations de chaque agent, puis points de synchronisation.
+    """
+    texte = []
+    for agent, dispatch in resultat.partitions.items():
+        texte.append("{}{} : {} opération(s), {} point(s) de synchronisation".format(
+            agent, " (opérateur)" if dispatch.get("operateur") else "", len(dispatch["operations"]),
+            len(dispatch.get("synchronisations") or {})))
+    for point in resultat.synchronisations:
+        texte.append("{} [{}-{}] : {}".format(point["step"], point["start_time"], point["end_time"],
+                                             ", ".join(point["participants"])))
+    return "\n".join(texte)
+
+def main():
+    parser = argparse.ArgumentParser(description="Un problème PDDL et un Behavior Tree par agent du planning.")
+    parser.add_argument('solution', help="Fichier solution (.sol)")
+    parser.add_argument('--operations', default='operations_elementaires.json', help="Catalogue des opérations élémentaires")
+    parser.add_argument('--sortie', default='agents', help="Répertoire racine (un sous-répertoire par agent)")
+    parser.add_argument('--mode', choices=[P2_Dispatcher.MODE_CHAINE, P2_Dispatcher.MODE_PARAMETRE],
+                        default=P2_Dispatcher.MODE_CHAINE,
+                        help="Domaine avec une action par opération (chaine) ou actions paramétrées (parametre)")
+    parser.add_argument('--planifier', action='store_true',
+                        help="Calculer le plan de chaque agent avec le planificateur natif (repli sur POPF) et l'assembler")
+    parser.add_argument('--direct', action='store_true',
+                        help="Construire chaque Behavior Tree directement depuis le planning, sans planificateur")
+    parser.add_argument('--json', action='store_true',
+                        help="Écrire les Behavior Trees en spécification JSON pour BTRuntime plutôt qu'en module Python")
+    parser.add_argument('--co', default=None,
+                        help="Ressources qui réalisent les opérations Co, séparées par des virgules (défaut : tous les agents)")
+    parser.add_argument('--robots', default=None,
+                        help="Ressources qui sont des robots, séparées par des virgules (défaut : celles en R...) ; "
+                             "les autres agents reçoivent des consignes d'opérateur")
+    parser.add_argument('--processus', type=int, default=None, help="Nombre de processus (défaut : un par agent)")
+    parser.add_argument('--sans-cache', action='store_true', help="Ne pas utiliser le cache de P1 ni celui des plans")
+    args = parser.parse_args()
+
+    repertoire_cache_plans = None
+    if args.planifier and not args.sans_cache:
+        import Planificateur
+        repertoire_cache_plans = Planificateur.cache_dir
+    try:
+        resultat = executer_partition(args.solution, args.operations, args.sortie, args.mode, args.planifier,
+                                      args.direct, args.json, args.processus,
+                                      None if args.sans_cache else P1_Convertisseur.cache_dir, repertoire_cache_plans,
+                                      args.co.split(',') if args.co else None,
+                                      args.robots.split(',') if args.robots else None)
+    except ValueError as e:
+        print("Erreur : {}".format(e))
+        return 1
+    print(formater_partition(resultat))
+    for agent, fichiers in resultat.fichiers.items():
+        for nom, chemin in fichiers.items():
+            print("{} {} : {}".format(agent, nom, chemin))
+    print("synchronisations : {}".format(resultat.fichier_synchronisations))
+    print("Durées : {}".format(", ".join("{} {:.3f} s".format(etape, duree) for etape, duree in resultat.durees.items())))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
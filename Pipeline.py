@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# API en mémoire de la chaîne P1 -> P2 -> P3
+#
+# Le planning produit par P1 est transmis directement à P2 sous forme d'OperationPlanifiee, sans passer
+# par solution_readable.txt (qui reste disponible en export optionnel). P3 n'est exécuté que si un plan
+# PDDL est fourni.
+#
+# Avec --agents, le planning est partitionné par ressource (PartitionAgents) : un problème PDDL et un Behavior
+# Tree par agent, avec des points de synchronisation pour les opérations Co.
+#
+# Exemple :
+#   python Pipeline.py solution.sol --sortie sortie --plan plan.pddl --texte
+#   python Pipeline.py AlternativeAlpha06.sol --sortie agents --agents --planifier --json
+
+import argparse
+import collections
+import os
+import time
+
+import P1_Convertisseur
+import P2_Dispatcher
+
+ResultatPipeline = collections.namedtuple('ResultatPipeline', [
+    'planning',      # Liste d'OperationPlanifiee produite par P1
+    'dispatch',      # Données de dispatch produites par P2
+    'fichiers',      # Fichiers écrits, par nom logique ('domain', 'problem', 'readable', 'bt')
+    'durees',        # Durée de chaque étape en secondes (OrderedDict)
+    'modifications', # Rapport de la régénération incrémentale de P2 (None en mode complet)
+    'fenetre',       # P2_Dispatcher.FenetreGlissante en mode horizon glissant (None sinon)
+])
+
+# Générateurs incrémentaux de P2, par répertoire de sortie, conservés d'un appel à l'autre
+_generateurs = {}
+
+def executer_pipeline(chemin_sol, operations_file, repertoire_sortie, plan_file=None, exporter_texte=False,
+                      repertoire_cache=None, incremental=False, mode=P2_Dispatcher.MODE_CHAINE, taille_fenetre=None,
+                      horizon=None, planifier=False, cache_plans=None, direct=False, specification=False):
+    """
+    Exécute la chaîne de conversion en mémoire et mesure la durée de chaque étape.
+
+    :param chemin_sol: Chemin du fichier solution (.sol).
+    :param operations_file: Chemin de operations_elementaires.json.
+    :param repertoire_sortie: Répertoire où écrire domain.pddl, problem.pddl et les exports.
+    :param plan_file: Plan PDDL à assembler en Behavior Tree par P3 (optionnel).
+    :param exporter_texte: Écrire aussi solution_readable.txt.
+    :param repertoire_cache: Répertoire du cache de P1 (None pour le désactiver).
+    :param incremental: Ne réécrire domain.pddl et problem.pddl que si leur contenu change.
+    :param mode: Mode de génération du domaine (P2_Dispatcher.MODE_CHAINE ou MODE_PARAMETRE).
+    :param taille_fenetre: Horizon glissant : ne générer que les N prochaines opérations.
+    :param horizon: Horizon glissant : ne générer que les opérations des T prochaines unités de temps.
+    :param planifier: Calculer plan.pddl avec le planificateur natif (repli sur POPF) puis l'assembler (P3).
+    :param cache_plans: Planificateur.CachePlans consulté avant de planifier (None pour le désactiver).
+    :param direct: Construire le Behavior Tree directement depuis le planning (P3), sans planificateur ; les
+                   fichiers PDDL restent écrits pour une replanification ultérieure.
+    :param specification: Écrire le Behavior Tree sous forme de spécification JSON (behavior_tree.json, exécutée
+                          par BTRuntime) plutôt que de module Python.
+    :return: ResultatPipeline.
+    :raises ValueError: Si direct est combiné à plan_file ou planifier, ou si le plan est invalide.
+    """
+    if direct and (plan_file is not None or planifier):
+        raise ValueError("Le chemin direct n'utilise pas de plan : --direct exclut --plan et --planifier.")
+    if not os.path.isdir(repertoire_sortie):
+        os.makedirs(repertoire_sortie)
+    fichiers = collections.OrderedDict()
+    durees = collections.OrderedDict()
+    nom_bt = 'behavior_tree.json' if specification else 'behavior_tree_autoV2.py'
+
+    debut = time.time()
+    solution = P1_Convertisseur.charger_solution(chemin_sol, repertoire_cache)
+    planning = solution.planning()
+    if exporter_texte:
+        fichiers['readable'] = os.path.join(repertoire_sortie, 'solution_readable.txt')
+        P1_Convertisseur.ecrire_solution_lisible(solution, fichiers['readable'])
+    durees['P1'] = time.time() - debut
+
+    debut = time.time()
+    index_operations = P2_Dispatcher.indexer_operations_elementaires(
+        P2_Dispatcher.charger_operations_elementaires(operations_file))
+    dispatch = P2_Dispatcher.analyser_planning(planning, index_operations)
+    fichiers['domain'] = os.path.join(repertoire_sortie, 'domain.pddl')
+    fichiers['problem'] = os.path.join(repertoire_sortie, 'problem.pddl')
+    modifications = None
+    fenetre = None
+    if taille_fenetre is not None or horizon is not None:
+        # La fenêtre régénère elle-même les fichiers de façon incrémentale lorsqu'elle avance
+        fenetre = P2_Dispatcher.FenetreGlissante(dispatch, taille_fenetre, horizon, mode)
+        modifications = fenetre.generer(fichiers['domain'], fichiers['problem'])
+    elif incremental:
+        cle = os.path.abspath(repertoire_sortie)
+        if cle not in _generateurs or _generateurs[cle].mode != mode:
+            _generateurs[cle] = P2_Dispatcher.GenerateurIncremental(fichiers['domain'], fichiers['problem'], mode)
+        modifications = _generateurs[cle].generer(dispatch)
+    else:
+        P2_Dispatcher.generer_domain_pddl(dispatch, fichiers['domain'], mode)
+        P2_Dispatcher.generer_problem_pddl(dispatch, fichiers['problem'], mode)
+    durees['P2'] = time.time() - debut
+
+    if direct:
+        import P3_Assembleur
+        debut = time.time()
+        fichiers['bt'] = os.path.join(repertoire_sortie, nom_bt)
+        P3_Assembleur.assembler_depuis_dispatch(dispatch, fichiers['bt'], fichiers['problem'])
+        durees['P3'] = time.time() - debut
+
+    if planifier:
+        import Planificateur
+        debut = time.time()
+        fichiers['plan'] = plan_file = os.path.join(repertoire_sortie, 'plan.pddl')
+        Planificateur.planifier_fichiers(fichiers['domain'], fichiers['problem'], plan_file, cache=cache_plans)
+        durees['planification'] = time.time() - debut
+
+    if plan_file is not None:
+        # P3 dépend de ROS : il n'est importé que s'il y a un plan à assembler
+        import P3_Assembleur
+        debut = time.time()
+        fichiers['bt'] = os.path.join(repertoire_sortie, nom_bt)
+        P3_Assembleur.assembler(plan_file, fichiers['bt'], fichiers['domain'], fichiers['problem'])
+        durees['P3'] = time.time() - debut
+
+    return ResultatPipeline(planning, dispatch, fichiers, durees, modifications, fenetre)
+
+def formater_durees(durees):
+    return ", ".join("{} {:.3f} s".format(etape, duree) for etape, duree in durees.items())
+
+def executer_agents(args):
+    # Chaîne partitionnée par agent (PartitionAgents), traitée en parallèle
+    import PartitionAgents
+    if args.plan is not None or args.fenetre is not None or args.horizon is not None or args.incremental:
+        print("Erreur : --agents exclut --plan, --fenetre, --horizon et --incremental.")
+        return 1
+    repertoire_cache_plans = None
+    if args.planifier and not args.sans_cache:
+        import Planificateur
+        repertoire_cache_plans = Planificateur.cache_dir
+    try:
+        resultat = PartitionAgents.executer_partition(
+            args.solution, args.operations, args.sortie, args.mode, args.planifier, args.direct, args.json,
+            args.processus, None if args.sans_cache else P1_Convertisseur.cache_dir, repertoire_cache_plans)
+    except ValueError as e:
+        print("Erreur : {}".format(e))
+        return 1
+    print(PartitionAgents.formater_partition(resultat))
+    for agent, fichiers in resultat.fichiers.items():
+        for nom, chemin in fichiers.items():
+            print("{} {} : {}".format(agent, nom, chemin))
+    print("synchronisations : {}".format(resultat.fichier_synchronisations))
+    print("Durées : {}".format(formater_durees(resultat.durees)))
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Chaîne P1 -> P2 -> P3 en mémoire.")
+    parser.add_argument('solution', help="Fichier solution (.sol)")
+    parser.add_argument('--operations', default='operations_elementaires.json', help="Catalogue des opérations élémentaires")
+    parser.add_argument('--sortie', default='.', help="Répertoire des fichiers générés")
+    parser.add_argument('--plan', default=None, help="Plan PDDL à assembler en Behavior Tree (P3)")
+    parser.add_argument('--texte', action='store_true', help="Exporter aussi solution_readable.txt")
+    parser.add_argument('--sans-cache', action='store_true', help="Ne pas utiliser le cache de P1 ni celui des plans")
+    parser.add_argument('--incremental', action='store_true', help="Ne réécrire les fichiers PDDL que s'ils changent")
+    parser.add_argument('--mode', choices=[P2_Dispatcher.MODE_CHAINE, P2_Dispatcher.MODE_PARAMETRE],
+                        default=P2_Dispatcher.MODE_CHAINE,
+                        help="Domaine avec une action par opération (chaine) ou actions paramétrées (parametre)")
+    parser.add_argument('--fenetre', type=int, default=None, help="Horizon glissant : nombre d'opérations planifiées")
+    parser.add_argument('--horizon', type=float, default=None, help="Horizon glissant : durée planifiée")
+    parser.add_argument('--planifier', action='store_true',
+                        help="Calculer le plan avec le planificateur natif (repli sur POPF) et l'assembler")
+    parser.add_argument('--direct', action='store_true',
+                        help="Construire le Behavior Tree directement depuis le planning, sans planificateur")
+    parser.add_argument('--json', action='store_true',
+                        help="Écrire le Behavior Tree en spécification JSON pour BTRuntime plutôt qu'en module Python")
+    parser.add_argument('--agents', action='store_true',
+                        help="Un problème PDDL et un Behavior Tree par agent, synchronisés sur les opérations Co")
+    parser.add_argument('--processus', type=int, default=None,
+                        help="Avec --agents : nombre de processus (défaut : un par agent)")
+    args = parser.parse_args()
+
+    if args.agents:
+        return executer_agents(args)
+
+    repertoire_cache = None if args.sans_cache else P1_Convertisseur.cache_dir
+    cache_plans = None
+    if args.planifier and not args.sans_cache:
+        import Planificateur
+        cache_plans = Planificateur.CachePlans(repertoire=Planificateur.cache_dir)
+    try:
+        resultat = executer_pipeline(args.solution, args.operations, args.sortie, args.plan, args.texte, repertoire_cache,
+                                     args.incremental, args.mode, args.fenetre, args.horizon,
+                                     args.planifier, cache_plans, args.direct, args.json)
+    except ValueError as e:
+        print("Erreur : {}".format(e))
+        return 1
+    for nom, chemin in resultat.fichiers.items():
+        print("{} : {}".format(nom, chemin))
+    if resultat.modifications is not None:
+        for fichier, difference in resultat.modifications.items():
+            if difference["ecrit"]:
+                print("{} réécrit : {} bloc(s) ajouté(s), {} supprimé(s), {} modifié(s)".format(
+                    fichier, len(difference["ajoutes"]), len(difference["supprimes"]), len(difference["modifies"])))
+            else:
+                print("{} inchangé".format(fichier))
+    print("Durées : {}".format(formater_durees(resultat.durees)))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
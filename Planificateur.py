@@ -0,0 +1,959 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Planificateur natif pour les domaines chaînés produits par P2
+#
+# Dans les domaines de P2, chaque étape (pick, place, wait) n'attend qu'une seule étape précédente : le
+# planificateur remonte cette chaîne depuis le but puis la déroule, en n'intercalant que les déplacements
+# nécessaires, sans heuristique ni POPF. Les paramètres libres (les locations de move_to) ne sont instanciés
+# que sur les objets cités par le problème ou le domaine. Si la chaîne ne mène pas au but, une escalade
+# forcée guidée par l'heuristique additive (h_add), puis une recherche gloutonne, prennent le relais. Le plan est écrit au format `temps: (action args) [durée]` lu par parse_pddl_plan (P3).
+# Si le domaine n'est pas chaîné (ou utilise des constructions hors STRIPS typé), le planificateur
+# externe est utilisé.
+#
+# Exemple :
+#   python Planificateur.py domain.pddl problem.pddl plan.pddl
+#   python Planificateur.py domain.pddl problem.pddl plan.pddl --valider
+
+import argparse
+import collections
+import hashlib
+import heapq
+import itertools
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+
+# Planificateur externe de repli (surchargeable par la variable d'environnement PLANIFICATEUR_EXTERNE)
+COMMANDE_EXTERNE = "popf"
+
+# Durée attribuée à chaque action du plan (domaines non temporels)
+DUREE_ACTION = 0.001
+
+# Nombre maximal d'états développés avant d'abandonner la recherche native
+LIMITE_EXPANSIONS = 100000
+
+# Nombre maximal d'actions (déplacements) intercalées avant une étape de la chaîne
+PROFONDEUR_REPARATION = 3
+
+# Cache des plans : répertoire par défaut, nombre maximal d'entrées et version du format de clé
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'dynamic_behavior_tree', 'plans')
+CACHE_CAPACITE = 512
+CACHE_VERSION = 1
+
+# Ligne de plan au format POPF, identique au motif de parse_pddl_plan
+motif_ligne_plan = re.compile(r'^\s*(\d+\.\d+):\s*\(([\w-]+)([^)]*)\)\s*\[\d+\.\d+\]')
+
+ActionPDDL = collections.namedtuple('ActionPDDL', [
+    'nom',
+    'parametres',     # Liste de tuples (variable, type)
+    'preconditions',  # Liste de littéraux (prédicat, arguments)
+    'ajouts',
+    'retraits',
+])
+
+DomainePDDL = collections.namedtuple('DomainePDDL', ['nom', 'actions'])
+
+ProblemePDDL = collections.namedtuple('ProblemePDDL', [
+    'objets',  # Dictionnaire {type: [objets]}
+    'init',    # Ensemble de faits (tuples (prédicat, arg1, ...))
+    'but',     # Liste de faits
+])
+
+# Action instanciée : préconditions, ajouts et retraits sont des frozensets de faits
+ActionInstanciee = collections.namedtuple('ActionInstanciee', ['nom', 'arguments', 'preconditions', 'ajouts', 'retraits'])
+
+class ConstructionNonSupportee(ValueError):
+    pass
+
+# ==================================
+# Lecture du PDDL
+# ==================================
+
+def lire_expression(texte):
+    """
+    Découpe un texte PDDL en listes imbriquées (commentaires retirés, minuscules).
+    """
+    texte = re.sub(r';[^\n]*', '', texte).lower()
+    pile = [[]]
+    for jeton in re.findall(r'\(|\)|[^\s()]+', texte):
+        if jeton == '(':
+            pile.append([])
+        elif jeton == ')':
+            if len(pile) < 2:
+                raise ValueError("Parenthèse fermante inattendue.")
+            liste = pile.pop()
+            pile[-1].append(liste)
+        else:
+            pile[-1].append(jeton)
+    if len(pile) != 1 or len(pile[0]) != 1:
+        raise ValueError("Expression PDDL mal parenthésée.")
+    return pile[0][0]
+
+def lire_liste_typee(jetons):
+    """
+    Lit une liste typée PDDL ('?a ?b - agent ?t - tool') en liste de tuples (nom, type).
+    """
+    resultat = []
+    en_attente = []
+    i = 0
+    while i < len(jetons):
+        if jetons[i] == '-':
+            resultat.extend((nom, jetons[i + 1]) for nom in en_attente)
+            en_attente = []
+            i += 2
+        else:
+            en_attente.append(jetons[i])
+            i += 1
+    resultat.extend((nom, 'object') for nom in en_attente)
+    return resultat
+
+def lire_conjonction(expression, negations_autorisees):
+    """
+    :return: Tuple (littéraux positifs, littéraux négatifs), chaque littéral étant (prédicat, arguments).
+    """
+    if not expression:
+        return [], []
+    if expression[0] == 'and':
+        elements = expression[1:]
+    else:
+        elements = [expression]
+    positifs, negatifs = [], []
+    for element in elements:
+        if not element or isinstance(element, str):
+            raise ConstructionNonSupportee("Littéral invalide : {}".format(element))
+        if element[0] == 'not':
+            if not negations_autorisees:
+                raise ConstructionNonSupportee("Précondition négative non supportée.")
+            negatifs.append((element[1][0], tuple(element[1][1:])))
+        elif element[0] in ('or', 'imply', 'exists', 'forall', 'when', 'increase', 'decrease', 'at', 'over') \
+                and any(isinstance(argument, list) for argument in element[1:]):
+            raise ConstructionNonSupportee("Construction PDDL non supportée : {}".format(element[0]))
+        else:
+            positifs.append((element[0], tuple(element[1:])))
+    return positifs, negatifs
+
+def lire_domaine(texte):
+    """
+    Lit un domaine STRIPS typé (le sous-ensemble produit par P2).
+
+    :raises ConstructionNonSupportee: Pour les actions temporelles, préconditions négatives, quantificateurs...
+    """
+    expression = lire_expression(texte)
+    nom = None
+    actions = []
+    for section in expression[1:]:
+        if section[0] == 'domain':
+            nom = section[1]
+        elif section[0] == ':durative-action':
+            raise ConstructionNonSupportee("Actions temporelles non supportées.")
+        elif section[0] == ':functions':
+            raise ConstructionNonSupportee("Fonctions numériques non supportées.")
+        elif section[0] == ':action':
+            champs = dict(zip(section[2::2], section[3::2]))
+            preconditions, _ = lire_conjonction(champs.get(':precondition', []), False)
+            ajouts, retraits = lire_conjonction(champs.get(':effect', []), True)
+            actions.append(ActionPDDL(section[1], lire_liste_typee(champs.get(':parameters', [])),
+                                      preconditions, ajouts, retraits))
+    return DomainePDDL(nom, actions)
+
+def lire_probleme(texte):
+    expression = lire_expression(texte)
+    objets = collections.defaultdict(list)
+    init = set()
+    but = []
+    for section in expression[1:]:
+        if section[0] == ':objects':
+            for objet, type_objet in lire_liste_typee(section[1:]):
+                objets[type_objet].append(objet)
+        elif section[0] == ':init':
+            init.update(tuple(fait) for fait in section[1:])
+        elif section[0] == ':goal':
+            positifs, _ = lire_conjonction(section[1], False)
+            but = [(predicat,) + arguments for predicat, arguments in positifs]
+    return ProblemePDDL(dict(objets), init, but)
+
+# ==================================
+# Forme chaînée
+# ==================================
+
+def predicats_monotones(domaine):
+    # Prédicats ajoutés par au moins une action et retirés par aucune
+    ajoutes = set(predicat for action in domaine.actions for predicat, _ in action.ajouts)
+    retires = set(predicat for action in domaine.actions for predicat, _ in action.retraits)
+    return ajoutes - retires
+
+def predicats_etapes(domaine):
+    """
+    Prédicats d'étape du domaine.
+
+    Une étape est un prédicat monotone (jamais retiré) ajouté par une action qui dépend elle-même d'un
+    prédicat monotone ; les prédicats ajoutés par les actions d'entrée (move_to...) n'en sont pas.
+    """
+    monotones = predicats_monotones(domaine)
+    entrees = set()
+    for action in domaine.actions:
+        if not any(predicat in monotones for predicat, _ in action.preconditions):
+            entrees.update(predicat for predicat, _ in action.ajouts)
+    etapes = set()
+    for action in domaine.actions:
+        if any(predicat in monotones for predicat, _ in action.preconditions):
+            etapes.update(predicat for predicat, _ in action.ajouts if predicat in monotones)
+    return etapes - entrees
+
+def est_chaine(domaine):
+    """
+    Indique si le domaine est chaîné : chaque action attend au plus une étape précédente.
+    """
+    etapes = predicats_etapes(domaine)
+    return all(sum(1 for predicat, _ in action.preconditions if predicat in etapes) <= 1 for action in domaine.actions)
+
+# ==================================
+# Instanciation
+# ==================================
+
+def objets_mentionnes(domaine, probleme):
+    """
+    Objets cités par l'état initial, le but ou les actions du domaine (constantes comme loc_workstation).
+
+    Les autres objets déclarés (locations de P2 qu'aucun outil ni agent n'occupe) n'apparaissent dans aucune
+    précondition : un déplacement vers l'un d'eux n'est jamais utile.
+    """
+    mentionnes = set()
+    for fait in itertools.chain(probleme.init, probleme.but):
+        mentionnes.update(fait[1:])
+    for action in domaine.actions:
+        for _, arguments in action.preconditions + action.ajouts + action.retraits:
+            mentionnes.update(argument for argument in arguments if not argument.startswith('?'))
+    return mentionnes
+
+def instancier(domaine, probleme, objets=None):
+    """
+    Instancie les actions du domaine sur les objets du problème.
+
+    Les préconditions statiques (prédicats qu'aucune action ne modifie, comme can_operate ou next) sont
+    résolues à l'instanciation et retirées des actions instanciées.
+
+    :param objets: Ensemble d'objets auquel restreindre les paramètres non liés par une précondition statique
+                   (objets_mentionnes) ; None pour tous les objets du problème.
+    """
+    modifies = set(predicat for action in domaine.actions for predicat, _ in action.ajouts + action.retraits)
+    statiques = collections.defaultdict(list)
+    for fait in probleme.init:
+        if fait[0] not in modifies:
+            statiques[fait[0]].append(fait[1:])
+    objets_par_type = dict((type_objet, [objet.lower() for objet in objets]) for type_objet, objets in probleme.objets.items())
+    objets_par_type['object'] = sorted(set(itertools.chain.from_iterable(objets_par_type.values())))
+    ensembles_par_type = dict((type_objet, set(objets)) for type_objet, objets in objets_par_type.items())
+    enumeres_par_type = objets_par_type
+    if objets is not None:
+        enumeres_par_type = dict((type_objet, [objet for objet in liste if objet in objets])
+                                 for type_objet, liste in objets_par_type.items())
+
+    # Faits statiques indexés par les valeurs des arguments déjà connus (constantes et variables liées)
+    index_statiques = {}
+
+    def faits_compatibles(predicat, arguments, liaison):
+        positions = tuple(i for i, argument in enumerate(arguments) if not argument.startswith('?') or argument in liaison)
+        cle = (predicat, len(arguments), positions)
+        if cle not in index_statiques:
+            index = collections.defaultdict(list)
+            for fait in statiques.get(predicat, ()):
+                if len(fait) == len(arguments):
+                    index[tuple(fait[i] for i in positions)].append(fait)
+            index_statiques[cle] = index
+        return index_statiques[cle].get(tuple(liaison.get(arguments[i], arguments[i]) for i in positions), ())
+
+    actions = []
+    for action in domaine.actions:
+        types = dict(action.parametres)
+        conditions_statiques = [(predicat, arguments) for predicat, arguments in action.preconditions if predicat not in modifies]
+        liaisons = [{}]
+        # Jointure sur les faits statiques
+        for predicat, arguments in conditions_statiques:
+            suivantes = []
+            for liaison in liaisons:
+                for fait in faits_compatibles(predicat, arguments, liaison):
+                    nouvelle = dict(liaison)
+                    for argument, objet in zip(arguments, fait):
+                        if not argument.startswith('?'):
+                            if argument != objet:
+                                break
+                        elif argument in nouvelle:
+                            if nouvelle[argument] != objet:
+                                break
+                        elif objet not in ensembles_par_type.get(types.get(argument, 'object'), ()):
+                            break
+                        else:
+                            nouvelle[argument] = objet
+                    else:
+                        suivantes.append(nouvelle)
+            liaisons = suivantes
+        # Énumération des paramètres restants selon leur type ; les constantes ne commencent jamais par '?'
+        # et se substituent à elles-mêmes
+        preconditions = [(predicat, arguments) for predicat, arguments in action.preconditions if predicat in modifies]
+        variables = [variable for variable, _ in action.parametres]
+        for liaison in liaisons:
+            libres = [variable for variable in variables if variable not in liaison]
+            for valeurs in itertools.product(*[enumeres_par_type.get(types[variable], []) for variable in libres]):
+                complete = dict(liaison)
+                complete.update(zip(libres, valeurs))
+                obtenir = complete.get
+                actions.append(ActionInstanciee(
+                    action.nom,
+                    tuple([complete[variable] for variable in variables]),
+                    frozenset([(predicat,) + tuple([obtenir(a, a) for a in arguments]) for predicat, arguments in preconditions]),
+                    frozenset([(predicat,) + tuple([obtenir(a, a) for a in arguments]) for predicat, arguments in action.ajouts]),
+                    frozenset([(predicat,) + tuple([obtenir(a, a) for a in arguments]) for predicat, arguments in action.retraits])))
+    return actions, modifies
+
+# ==================================
+# Recherche
+# ==================================
+
+class TacheInstanciee(object):
+    """
+    Tâche instanciée avec les index nécessaires au calcul de l'heuristique additive (h_add).
+
+    Les actions dont une précondition est inatteignable depuis l'état initial (même sans retraits) sont
+    écartées à la construction : par exemple les pick_opXX sur des locations où l'outil n'est jamais.
+    """
+
+    def __init__(self, actions, init, but):
+        self.init = frozenset(init)
+        self.but = frozenset(but)
+        self._indexer(actions)
+        couts, _ = self._couts(self.init)
+        self._indexer([action for action in actions if all(fait in couts for fait in action.preconditions)])
+
+    def _indexer(self, actions):
+        self.actions = actions
+        self.consommateurs = collections.defaultdict(list)
+        self.producteurs = collections.defaultdict(list)
+        for indice, action in enumerate(actions):
+            for fait in action.preconditions:
+                self.consommateurs[fait].append(indice)
+            for fait in action.ajouts:
+                self.producteurs[fait].append(indice)
+        self.sans_precondition = [indice for indice, action in enumerate(actions) if not action.preconditions]
+        self.nombre_preconditions = [len(action.preconditions) for action in actions]
+        self.ajouts = [tuple(action.ajouts) for action in actions]
+
+    def _couts(self, etat):
+        # Coûts relaxés de tous les faits atteignables et meilleure action de support de chacun
+        ajouts = self.ajouts
+        consommateurs = self.consommateurs
+        couts = dict.fromkeys(etat, 0)
+        supports = {}
+        file_priorite = [(0, fait) for fait in etat]
+        restantes = list(self.nombre_preconditions)
+        cout_preconditions = [0] * len(restantes)
+        for indice in self.sans_precondition:
+            for ajout in ajouts[indice]:
+                if couts.get(ajout, 2) > 1:
+                    couts[ajout] = 1
+                    supports[ajout] = indice
+                    heapq.heappush(file_priorite, (1, ajout))
+        pousser = heapq.heappush
+        extraire = heapq.heappop
+        while file_priorite:
+            cout, fait = extraire(file_priorite)
+            if cout > couts[fait]:
+                continue  # Entrée périmée : le fait a été atteint à un coût inférieur
+            for indice in consommateurs.get(fait, ()):
+                restantes[indice] -= 1
+                cout_preconditions[indice] += cout
+                if not restantes[indice]:
+                    nouveau = cout_preconditions[indice] + 1
+                    for ajout in ajouts[indice]:
+                        if couts.get(ajout, nouveau + 1) > nouveau:
+                            couts[ajout] = nouveau
+                            supports[ajout] = indice
+                            pousser(file_priorite, (nouveau, ajout))
+        return couts, supports
+
+    def evaluer(self, etat):
+        """
+        :return: Tuple (h_add, actions utiles) ; h vaut None si le but est inatteignable. Les actions utiles
+                 sont les actions applicables qui produisent un fait du plan relaxé, celles qui en produisent
+                 le plus en premier (move_to vers la location du pick plutôt que vers une autre).
+        """
+        couts, supports = self._couts(etat)
+        if any(fait not in couts for fait in self.but):
+            return None, []
+        h = sum(couts[fait] for fait in self.but)
+        # Extraction du plan relaxé à partir des meilleures actions de support
+        plan_relaxe = set()
+        a_traiter = [fait for fait in self.but if couts[fait] > 0]
+        vus = set()
+        while a_traiter:
+            fait = a_traiter.pop()
+            if fait in vus:
+                continue
+            vus.add(fait)
+            indice = supports[fait]
+            if indice not in plan_relaxe:
+                plan_relaxe.add(indice)
+                a_traiter.extend(precondition for precondition in self.actions[indice].preconditions if couts[precondition] > 0)
+        candidats = set()
+        for fait in vus:
+            candidats.update(self.producteurs.get(fait, ()))
+        utiles = []
+        for indice in candidats:
+            action = self.actions[indice]
+            if action.preconditions <= etat:
+                utiles.append((-len(action.ajouts & vus), indice, action))
+        utiles.sort()
+        return h, [action for _, _, action in utiles]
+
+    def successeurs(self, etat):
+        for action in self.actions:
+            if action.preconditions <= etat:
+                yield action, (etat - action.retraits) | action.ajouts
+
+def escalade(tache, limite=LIMITE_EXPANSIONS):
+    """
+    Escalade forcée (enforced hill-climbing) restreinte aux actions utiles : depuis chaque état, recherche
+    en largeur du premier état d'heuristique strictement meilleure. Sur un domaine chaîné, l'action utile
+    est l'étape suivante de la chaîne et chaque étape coûte une seule évaluation.
+
+    :return: Liste d'ActionInstanciee, ou None en cas d'échec (impasse ou limite d'expansions atteinte).
+    """
+    etat = tache.init
+    h, utiles = tache.evaluer(etat)
+    if h is None:
+        return None
+    plan = []
+    expansions = 0
+    while h > 0:
+        file = collections.deque([(etat, utiles, [])])
+        vus = set([etat])
+        trouve = None
+        while file and trouve is None:
+            courant, utiles_courant, chemin = file.popleft()
+            expansions += 1
+            if expansions > limite:
+                return None
+            for action in utiles_courant:
+                suivant = (courant - action.retraits) | action.ajouts
+                if suivant in vus:
+                    continue
+                vus.add(suivant)
+                h_suivant, utiles_suivant = tache.evaluer(suivant)
+                if h_suivant is None:
+                    continue
+                if h_suivant < h:
+                    trouve = (suivant, h_suivant, utiles_suivant, chemin + [action])
+                    break
+                file.append((suivant, utiles_suivant, chemin + [action]))
+        if trouve is None:
+            return None
+        etat, h, utiles, chemin = trouve
+        plan.extend(chemin)
+    return plan
+
+def rechercher(tache, limite=LIMITE_EXPANSIONS):
+    """
+    Recherche gloutonne en avant guidée par h_add, utilisée si l'escalade échoue.
+
+    :return: Liste d'ActionInstanciee, ou None si aucun plan n'est trouvé dans la limite d'expansions.
+    """
+    h, _ = tache.evaluer(tache.init)
+    if h is None:
+        return None
+    compteur = itertools.count()
+    ouverts = [(h, next(compteur), tache.init)]
+    parents = {tache.init: None}
+    expansions = 0
+    while ouverts and expansions < limite:
+        _, _, etat = heapq.heappop(ouverts)
+        if tache.but <= etat:
+            plan = []
+            while parents[etat] is not None:
+                etat, action = parents[etat]
+                plan.append(action)
+            plan.reverse()
+            return plan
+        expansions += 1
+        for action, suivant in tache.successeurs(etat):
+            if suivant in parents:
+                continue
+            parents[suivant] = (etat, action)
+            h, _ = tache.evaluer(suivant)
+            if h is not None:
+                heapq.heappush(ouverts, (h, next(compteur), suivant))
+    return None
+
+def reparer(etat, objectif, auxiliaires, faits_auxiliaires, profondeur=PROFONDEUR_REPARATION):
+    """
+    Plus courte suite d'actions auxiliaires (move_to...) rendant vrais les faits de objectif.
+
+    La recherche en largeur ne porte que sur les faits que ces actions lisent ou modifient.
+
+    :return: Liste d'ActionInstanciee (vide si objectif est déjà vrai), ou None au-delà de profondeur actions.
+    """
+    if objectif <= etat:
+        return []
+    depart = frozenset(fait for fait in faits_auxiliaires if fait in etat)
+    file = collections.deque([(depart, [])])
+    vus = set([depart])
+    while file:
+        courant, chemin = file.popleft()
+        if len(chemin) >= profondeur:
+            continue
+        for action in auxiliaires:
+            if not action.preconditions <= courant:
+                continue
+            suivant = (courant - action.retraits) | action.ajouts
+            if suivant in vus:
+                continue
+            if objectif <= suivant:
+                return chemin + [action]
+            vus.add(suivant)
+            file.append((suivant, chemin + [action]))
+    return None
+
+def suivre_chaine(actions, etapes, init, but):
+    """
+    Suit directement la chaîne des étapes d'un domaine chaîné, sans heuristique.
+
+    La chaîne est parcourue en largeur depuis l'état initial, puis remontée depuis les étapes du but d'étape
+    précédente en étape précédente (la plus proche quand une étape a plusieurs producteurs, comme wait_done)
+    et enfin déroulée. Les autres préconditions d'une étape (at, move_to_done...) sont obtenues par reparer
+    sur les actions qui ne produisent aucune étape.
+
+    :param etapes: Prédicats d'étape du domaine (predicats_etapes).
+    :return: Liste d'ActionInstanciee, ou None si la chaîne ne mène pas au but.
+    """
+    par_precedente = collections.defaultdict(list)
+    auxiliaires = []
+    for action in actions:
+        if not any(fait[0] in etapes for fait in action.ajouts):
+            auxiliaires.append(action)
+            continue
+        precedentes = [fait for fait in action.preconditions if fait[0] in etapes]
+        if len(precedentes) > 1:
+            return None
+        par_precedente[precedentes[0] if precedentes else None].append(action)
+    faits_auxiliaires = set()
+    for action in auxiliaires:
+        faits_auxiliaires.update(action.preconditions | action.ajouts | action.retraits)
+
+    # Étape précédente de chaque étape atteignable (None : étape sans précédente)
+    precedente = dict((fait, None) for fait in init if fait[0] in etapes)
+    file = collections.deque([None] + list(precedente))
+    while file:
+        fait = file.popleft()
+        for action in par_precedente.get(fait, ()):
+            for ajout in action.ajouts:
+                if ajout[0] in etapes and ajout not in precedente:
+                    precedente[ajout] = fait
+                    file.append(ajout)
+
+    sequence = []
+    for fait in but:
+        if fait[0] not in etapes:
+            continue
+        if fait not in precedente:
+            return None
+        chaine = []
+        while fait is not None and fait not in init:
+            chaine.append((fait, precedente[fait]))
+            fait = precedente[fait]
+        sequence.extend(reversed(chaine))
+
+    etat = set(init)
+    plan = []
+    for fait, fait_precedent in sequence:
+        if fait in etat:
+            continue
+        for action in par_precedente[fait_precedent]:
+            if fait not in action.ajouts or not action.preconditions - faits_auxiliaires <= etat:
+                continue
+            chemin = reparer(etat, action.preconditions & faits_auxiliaires, auxiliaires, faits_auxiliaires)
+            if chemin is not None:
+                break
+        else:
+            return None
+        for etape in chemin + [action]:
+            etat.difference_update(etape.retraits)
+            etat.update(etape.ajouts)
+            plan.append(etape)
+    chemin = reparer(etat, frozenset(but), auxiliaires, faits_auxiliaires)
+    if chemin is None:
+        return None
+    for etape in chemin:
+        etat.difference_update(etape.retraits)
+        etat.update(etape.ajouts)
+        plan.append(etape)
+    return plan if etat.issuperset(but) else None
+
+def planifier(domaine, probleme):
+    """
+    Planifie nativement un domaine chaîné : suivi direct de la chaîne, puis recherche générique en repli.
+
+    Les actions sont d'abord instanciées sur les seuls objets mentionnés ; si aucun plan n'est trouvé ainsi,
+    la recherche générique est relancée sur tous les objets du problème.
+
+    :return: Liste de tuples (nom de l'action, arguments), ou None si aucun plan n'est trouvé.
+    """
+    mentionnes = objets_mentionnes(domaine, probleme)
+    tous = set(objet.lower() for objets in probleme.objets.values() for objet in objets)
+    etapes = predicats_etapes(domaine)
+    for passe, objets in enumerate([mentionnes, None] if not tous <= mentionnes else [None]):
+        actions, modifies = instancier(domaine, probleme, objets)
+        init = set(fait for fait in probleme.init if fait[0] in modifies)
+        but = [fait for fait in probleme.but if fait[0] in modifies]
+        if any(fait[0] not in modifies and fait not in probleme.init for fait in probleme.but):
+            return None  # But statique faux : aucun plan
+        plan = suivre_chaine(actions, etapes, init, but) if passe == 0 else None
+        if plan is None:
+            tache = TacheInstanciee(actions, init, but)
+            plan = escalade(tache)
+            if plan is None:
+                plan = rechercher(tache)
+        if plan is not None:
+            return [(action.nom, action.arguments) for action in plan]
+    return None
+
+def formater_plan(etapes):
+    """
+    Formate un plan au format POPF lu par parse_pddl_plan : `temps: (action args) [durée]`.
+    """
+    lignes = []
+    for indice, (nom, arguments) in enumerate(etapes):
+        lignes.append("{:.3f}: ({}) [{:.3f}]\n".format(indice * DUREE_ACTION, " ".join((nom,) + tuple(arguments)), DUREE_ACTION))
+    return "".join(lignes)
+
+# ==================================
+# Planificateur externe
+# ==================================
+
+def planifier_externe(domain_file, problem_file, commande=None):
+    """
+    Lance le planificateur externe et ne garde que les lignes du plan.
+
+    :return: Texte du plan, ou None si le planificateur ne trouve pas de plan.
+    :raises RuntimeError: Si le planificateur ne peut pas être lancé.
+    """
+    if commande is None:
+        commande = os.environ.get("PLANIFICATEUR_EXTERNE", COMMANDE_EXTERNE)
+    arguments = shlex.split(commande) + [domain_file, problem_file]
+    try:
+        processus = subprocess.Popen(arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as e:
+        raise RuntimeError("Impossible de lancer le planificateur externe '{}' : {}".format(commande, e))
+    sortie, _ = processus.communicate()
+    lignes = [ligne.strip() + "\n" for ligne in sortie.splitlines() if motif_ligne_plan.match(ligne)]
+    return "".join(lignes) or None
+
+# ==================================
+# Validation de plans
+# ==================================
+
+ResultatValidation = collections.namedtuple('ResultatValidation', [
+    'valide',
+    'indice',  # Indice (à partir de 0) de la première étape invalide, None si le plan est valide
+    'ligne',   # Ligne du plan correspondante ('' si le but n'est pas atteint en fin de plan)
+    'raison',
+])
+
+class Validateur(object):
+    """
+    Valide des plans contre un domaine et un problème, en appliquant préconditions et effets de chaque étape
+    sur un état frozenset (sémantique STRIPS : retraits puis ajouts).
+
+    Le domaine et le problème sont lus une seule fois ; les actions instanciées sont mémorisées par
+    (nom, arguments), ce qui permet de valider des milliers de plans par seconde sur un même problème.
+    """
+
+    def __init__(self, texte_domaine, texte_probleme):
+        domaine = lire_domaine(texte_domaine)
+        probleme = lire_probleme(texte_probleme)
+        self.actions = collections.defaultdict(list)
+        for action in domaine.actions:
+            self.actions[action.nom].append(action)  # P2 peut déclarer plusieurs actions 'wait'
+        self.objets = dict((type_objet, set(objet.lower() for objet in objets)) for type_objet, objets in probleme.objets.items())
+        self.objets['object'] = set(itertools.chain.from_iterable(self.objets.values()))
+        self.init = frozenset(probleme.init)
+        self.but = frozenset(probleme.but)
+        self.instances = {}
+
+    def _instancier(self, nom, arguments):
+        cle = (nom, arguments)
+        if cle not in self.instances:
+            instances = []
+            raison = None
+            for action in self.actions.get(nom, ()):
+                if len(action.parametres) != len(arguments):
+                    raison = "{} attend {} paramètre(s), {} donné(s)".format(nom, len(action.parametres), len(arguments))
+                    continue
+                mauvais_types = [objet for objet, (_, type_objet) in zip(arguments, action.parametres)
+                                 if objet not in self.objets.get(type_objet, ())]
+                if mauvais_types:
+                    raison = "objet(s) inconnu(s) ou mal typé(s) : {}".format(", ".join(mauvais_types))
+                    continue
+                liaison = dict(zip((variable for variable, _ in action.parametres), arguments))
+
+                def faits(litteraux):
+                    return frozenset((predicat,) + tuple(liaison.get(argument, argument) for argument in arguments_litteral)
+                                     for predicat, arguments_litteral in litteraux)
+                instances.append((faits(action.preconditions), faits(action.ajouts), faits(action.retraits)))
+            if not self.actions.get(nom):
+                raison = "action inconnue : {}".format(nom)
+            self.instances[cle] = (instances, raison)
+        return self.instances[cle]
+
+    def valider(self, texte_plan):
+        """
+        :param texte_plan: Plan au format POPF (`temps: (action args) [durée]`).
+        :return: ResultatValidation décrivant la première étape invalide, ou le plan valide.
+        """
+        etapes = []
+        for ligne in texte_plan.splitlines():
+            ligne = ligne.strip()
+            if not ligne or ligne.startswith(';'):
+                continue
+            match = motif_ligne_plan.match(ligne.lower())
+            if not match:
+                return ResultatValidation(False, len(etapes), ligne, "ligne illisible")
+            etapes.append((float(match.group(1)), len(etapes), match.group(2), tuple(match.group(3).split()), ligne))
+        etapes.sort()
+
+        etat = self.init
+        for indice, (_, _, nom, arguments, ligne) in enumerate(etapes):
+            instances, raison = self._instancier(nom, arguments)
+            manquants = None
+            for preconditions, ajouts, retraits in instances:
+                if preconditions <= etat:
+                    etat = (etat - retraits) | ajouts
+                    break
+                if manquants is None or len(preconditions - etat) < len(manquants):
+                    manquants = preconditions - etat
+            else:
+                if manquants is not None:
+                    raison = "précondition(s) fausse(s) : {}".format(
+                        " ".join("(" + " ".join(fait) + ")" for fait in sorted(manquants)))
+                return ResultatValidation(False, indice, ligne, raison)
+        if not self.but <= etat:
+            return ResultatValidation(False, len(etapes), '', "but non atteint : {}".format(
+                " ".join("(" + " ".join(fait) + ")" for fait in sorted(self.but - etat))))
+        return ResultatValidation(True, None, '', '')
+
+def valider_fichiers(domain_file, problem_file, plan_file):
+    with open(domain_file, 'r') as file:
+        texte_domaine = file.read()
+    with open(problem_file, 'r') as file:
+        texte_probleme = file.read()
+    with open(plan_file, 'r') as file:
+        return Validateur(texte_domaine, texte_probleme).valider(file.read())
+
+# ==================================
+# Cache des plans
+# ==================================
+
+def forme_canonique(expression):
+    """
+    Forme canonique d'une expression PDDL : l'ordre des objets, des faits de l'init, des conjonctions et des
+    actions n'a pas d'incidence sur les plans, ces éléments sont donc triés. Le nom du problème est ignoré.
+    """
+    if not isinstance(expression, list):
+        return expression
+    if not expression:
+        return []
+    tete = expression[0]
+    if tete == 'and':
+        return ['and'] + sorted((forme_canonique(element) for element in expression[1:]), key=repr)
+    if tete == ':objects':
+        return [':objects'] + sorted([objet, type_objet] for objet, type_objet in lire_liste_typee(expression[1:]))
+    if tete in (':init', ':predicates', ':requirements'):
+        return [tete] + sorted((forme_canonique(element) for element in expression[1:]), key=repr)
+    if tete == 'define':
+        sections = [forme_canonique(section) for section in expression[1:]
+                    if not (isinstance(section, list) and section and section[0] == 'problem')]
+        actions = sorted((section for section in sections if section and section[0] == ':action'), key=repr)
+        return ['define'] + [section for section in sections if not section or section[0] != ':action'] + actions
+    return [forme_canonique(element) for element in expression]
+
+def cle_plan(texte_domaine, texte_probleme):
+    """
+    Clé de cache d'une paire domaine/problème : empreinte SHA-1 de leurs formes canoniques. Deux états de
+    planification identiques (opérations restantes, positions des outils et de l'agent, but) ont la même
+    clé, quel que soit l'ordre dans lequel P2 ou la KB les a écrits.
+    """
+    empreinte = hashlib.sha1()
+    empreinte.update("{}\n".format(CACHE_VERSION).encode('utf-8'))
+    empreinte.update(repr(forme_canonique(lire_expression(texte_domaine))).encode('utf-8'))
+    empreinte.update(b"\n")
+    empreinte.update(repr(forme_canonique(lire_expression(texte_probleme))).encode('utf-8'))
+    return empreinte.hexdigest()
+
+class CachePlans(object):
+    """
+    Cache LRU des plans, en mémoire et (optionnellement) sur disque, indexé par cle_plan.
+
+    Sur disque, chaque plan est un fichier <clé>.pddl dont la date de modification sert de date de dernier
+    usage ; les entrées les plus anciennes sont supprimées au-delà de `capacite` fichiers.
+    """
+
+    def __init__(self, capacite=CACHE_CAPACITE, repertoire=None):
+        self.capacite = capacite
+        self.repertoire = repertoire
+        self.entrees = collections.OrderedDict()
+        self.succes = 0
+        self.echecs = 0
+        if repertoire is not None and not os.path.isdir(repertoire):
+            os.makedirs(repertoire)
+
+    def _chemin(self, cle):
+        return os.path.join(self.repertoire, cle + '.pddl')
+
+    def _memoriser(self, cle, plan):
+        self.entrees.pop(cle, None)
+        self.entrees[cle] = plan
+        while len(self.entrees) > self.capacite:
+            self.entrees.popitem(last=False)
+
+    def obtenir(self, cle):
+        """
+        :return: Texte du plan, ou None si la clé est absente du cache.
+        """
+        plan = self.entrees.get(cle)
+        if plan is None and self.repertoire is not None:
+            try:
+                with open(self._chemin(cle), 'r') as file:
+                    plan = file.read()
+                os.utime(self._chemin(cle), None)  # Marquer l'entrée comme récemment utilisée
+            except (IOError, OSError):
+                plan = None
+        if plan is None:
+            self.echecs += 1
+            return None
+        self._memoriser(cle, plan)
+        self.succes += 1
+        return plan
+
+    def enregistrer(self, cle, plan):
+        self._memoriser(cle, plan)
+        if self.repertoire is None:
+            return
+        # Écriture dans un fichier temporaire puis renommage, pour qu'un lecteur ne voie jamais d'entrée partielle
+        fd, chemin_tmp = tempfile.mkstemp(dir=self.repertoire, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(plan)
+            os.rename(chemin_tmp, self._chemin(cle))
+        except Exception:
+            os.remove(chemin_tmp)
+            raise
+        self.purger()
+
+    def purger(self):
+        """
+        Supprime du disque les plans les moins récemment utilisés au-delà de la capacité.
+        """
+        entrees = []
+        for nom in os.listdir(self.repertoire):
+            if nom.endswith('.pddl'):
+                chemin = os.path.join(self.repertoire, nom)
+                try:
+                    entrees.append((os.stat(chemin).st_mtime, chemin))
+                except OSError:
+                    continue  # Entrée supprimée entre-temps par un autre processus
+        entrees.sort(reverse=True)
+        for _, chemin in entrees[self.capacite:]:
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+
+# ==================================
+# Points d'entrée
+# ==================================
+
+def planifier_texte(texte_domaine, texte_probleme):
+    """
+    Planifie nativement à partir des textes PDDL.
+
+    :return: Texte du plan, ou None si le domaine n'est pas chaîné ou si aucun plan n'est trouvé.
+    """
+    try:
+        domaine = lire_domaine(texte_domaine)
+    except ConstructionNonSupportee:
+        return None
+    if not est_chaine(domaine):
+        return None
+    etapes = planifier(domaine, lire_probleme(texte_probleme))
+    return None if etapes is None else formater_plan(etapes)
+
+def planifier_dispatch(dispatch, mode=None):
+    """
+    Planifie directement à partir des données de P2, sans passer par les fichiers PDDL.
+    """
+    import P2_Dispatcher
+    mode = P2_Dispatcher.MODE_CHAINE if mode is None else mode
+    return planifier_texte("".join(texte for _, texte in P2_Dispatcher.construire_domain_pddl(dispatch, mode)),
+                           "".join(texte for _, texte in P2_Dispatcher.construire_problem_pddl(dispatch, mode)))
+
+def planifier_fichiers(domain_file, problem_file, plan_file, commande_externe=None, cache=None):
+    """
+    Écrit le plan de domain_file/problem_file dans plan_file, avec repli sur le planificateur externe.
+
+    :param cache: CachePlans consulté avant toute planification (None pour le désactiver).
+    :return: 'cache', 'natif' ou 'externe' selon l'origine du plan.
+    :raises ValueError: Si aucun plan n'est trouvé.
+    """
+    with open(domain_file, 'r') as file:
+        texte_domaine = file.read()
+    with open(problem_file, 'r') as file:
+        texte_probleme = file.read()
+    cle = plan = None
+    origine = 'cache'
+    if cache is not None:
+        cle = cle_plan(texte_domaine, texte_probleme)
+        plan = cache.obtenir(cle)
+    if plan is None:
+        plan = planifier_texte(texte_domaine, texte_probleme)
+        origine = 'natif'
+    if plan is None:
+        plan = planifier_externe(domain_file, problem_file, commande_externe)
+        origine = 'externe'
+    if plan is None:
+        raise ValueError("Aucun plan trouvé pour {} / {}.".format(domain_file, problem_file))
+    if cache is not None and origine != 'cache':
+        cache.enregistrer(cle, plan)
+    with open(plan_file, 'w') as file:
+        file.write(plan)
+    return origine
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificateur natif pour les domaines chaînés de P2.")
+    parser.add_argument('domain', help="Fichier domain.pddl")
+    parser.add_argument('problem', help="Fichier problem.pddl")
+    parser.add_argument('plan', help="Fichier plan à écrire (ou à vérifier avec --valider)")
+    parser.add_argument('--valider', action='store_true', help="Valider le plan existant au lieu de planifier")
+    parser.add_argument('--externe', default=None, help="Commande du planificateur de repli (défaut : popf)")
+    parser.add_argument('--sans-cache', action='store_true', help="Ne pas utiliser le cache des plans")
+    args = parser.parse_args()
+    if args.valider:
+        resultat = valider_fichiers(args.domain, args.problem, args.plan)
+        if resultat.valide:
+            print("Plan valide.")
+            return 0
+        print("Plan invalide à l'étape {} ({}) : {}".format(resultat.indice, resultat.ligne or "fin du plan", resultat.raison))
+        return 1
+    cache = None if args.sans_cache else CachePlans(repertoire=cache_dir)
+    try:
+        origine = planifier_fichiers(args.domain, args.problem, args.plan, args.externe, cache)
+    except (ValueError, RuntimeError) as e:
+        print("Erreur : {}".format(e))
+        return 1
+    origines = {'cache': "plan en cache", 'natif': "planificateur natif", 'externe': "planificateur externe"}
+    print("Plan écrit dans {} ({}).".format(args.plan, origines[origine]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Pool partagé des poses ArUco pour les Behavior Trees
+#
+# Chaque pick génère deux vérifications de détection sur le topic de son marqueur, et un long plan en crée des
+# dizaines sur les mêmes quelques topics /aruco_single_*. PoolPoses n'ouvre qu'un abonné par topic pour tout le
+# processus et conserve la dernière pose reçue avec son instant de réception ; VerifierAruco, qui remplace
+# CheckArucoDetected dans les arbres générés, réussit dès qu'une pose assez récente est disponible.
+#
+# Exemple :
+#   check_aruco = VerifierAruco("CheckAruco_DETECT_OP11", topic_name="/aruco_single_581/pose", timeout=2.0)
+
+import collections
+import threading
+import time
+
+import py_trees
+
+# Âge maximal d'une pose pour considérer le marqueur comme détecté, en secondes
+FRAICHEUR_POSE = 0.5
+
+def abonnement_ros(topic, rappel):
+    # Abonné ROS d'un topic de pose ArUco (geometry_msgs/PoseStamped)
+    import rospy
+    from geometry_msgs.msg import PoseStamped
+    return rospy.Subscriber(topic, PoseStamped, rappel, callback_args=topic, queue_size=1)
+
+class PoolPoses(object):
+    """
+    Dernière pose reçue par topic, avec un seul abonné par topic.
+
+    :param abonnement: Appelable (topic, rappel) créant l'abonné du topic ; rappel(message, topic) doit être
+                       appelé à chaque pose reçue. Par défaut, un abonné ROS.
+    :param horloge: Source du temps de réception des poses.
+    """
+    def __init__(self, abonnement=abonnement_ros, horloge=time.time):
+        self.abonnement = abonnement
+        self.horloge = horloge
+        self.receptions = collections.Counter()  # Nombre de poses reçues par topic
+        self._verrou = threading.Lock()
+        self._abonnes = {}  # topic -> abonné
+        self._poses = {}    # topic -> (pose, instant de réception)
+
+    def abonner(self, topic):
+        """
+        S'abonne au topic s'il ne l'est pas déjà.
+
+        :return: True si un nouvel abonné a été créé.
+        """
+        with self._verrou:
+            if topic in self._abonnes:
+                return False
+            self._abonnes[topic] = self.abonnement(topic, self.recevoir)
+            return True
+
+    def recevoir(self, message, topic):
+        # Rappel des abonnés : une affectation de tuple, sans verrou, pour ne pas ralentir le thread ROS
+        self._poses[topic] = (message, self.horloge())
+        self.receptions[topic] += 1
+
+    def derniere_pose(self, topic):
+        """
+        :return: Couple (pose, instant de réception), ou (None, None) si aucune pose n'a été reçue.
+        """
+        return self._poses.get(topic, (None, None))
+
+    def age(self, topic):
+        _, instant = self.derniere_pose(topic)
+        return None if instant is None else self.horloge() - instant
+
+    def est_fraiche(self, topic, fraicheur=FRAICHEUR_POSE):
+        age = self.age(topic)
+        return age is not None and age <= fraicheur
+
+    @property
+    def topics(self):
+        return sorted(self._abonnes)
+
+    def fermer(self):
+        with self._verrou:
+            abonnes, self._abonnes = self._abonnes, {}
+        for abonne in abonnes.values():
+            if abonne is not None and hasattr(abonne, 'unregister'):
+                abonne.unregister()
+        self._poses.clear()
+
+# Pool du processus, créé au premier usage
+_pool = None
+_verrou_pool = threading.Lock()
+
+def pool_partage():
+    global _pool
+    with _verrou_pool:
+        if _pool is None:
+            _pool = PoolPoses()
+        return _pool
+
+class VerifierAruco(py_trees.behaviour.Behaviour):
+    """
+    Vérification de détection d'un marqueur ArUco, à la place de CheckArucoDetected : SUCCESS dès que le pool
+    contient une pose du topic reçue il y a moins de fraicheur secondes, FAILURE si aucune n'arrive dans les
+    timeout secondes suivant le début de la vérification, RUNNING entre les deux (le tick n'est jamais bloqué).
+    """
+    def __init__(self, name, topic_name, timeout=2.0, fraicheur=FRAICHEUR_POSE, pool=None):
+        super(VerifierAruco, self).__init__(name=name)
+        self.topic_name = topic_name
+        self.timeout = timeout
+        self.fraicheur = fraicheur
+        self.pool = pool
+        self.debut = None
+
+    def pool_utilise(self):
+        return self.pool if self.pool is not None else pool_partage()
+
+    def setup(self, timeout=None, **kwargs):
+        # Abonnement partagé : seul le premier nœud d'un topic crée l'abonné
+        self.pool_utilise().abonner(self.topic_name)
+        return True
+
+    def initialise(self):
+        pool = self.pool_utilise()
+        pool.abonner(self.topic_name)
+        self.debut = pool.horloge()
+
+    def update(self):
+        pool = self.pool_utilise()
+        if pool.est_fraiche(self.topic_name, self.fraicheur):
+            self.feedback_message = "Marqueur détecté sur {}".format(self.topic_name)
+            return py_trees.common.Status.SUCCESS
+        if pool.horloge() - self.debut >= self.timeout:
+            self.feedback_message = "Aucune pose récente sur {} après {} s".format(self.topic_name, self.timeout)
+            return py_trees.common.Status.FAILURE
+        return py_trees.common.Status.RUNNING
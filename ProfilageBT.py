@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Profilage des Behavior Trees générés
+#
+# Instrumentation optionnelle d'un arbre py_trees : durée de chaque update() par nœud, durée des phases
+# RUNNING, transitions de statut, durée des ticks et temps passé à soumettre les mises à jour de la KB (et
+# délai jusqu'à leur accusé). Les mesures sont agrégées en histogrammes logarithmiques et exportées en JSON
+# et CSV à la fin de l'exécution, pour comparer les durées réelles aux Sijk/Cijk du planning.
+#
+# Exemple (main d'un arbre généré) :
+#   profileur = ProfileurBT().instrumenter(bt.root, KB_CLIENT)
+#   while ...: profileur.tick(bt)
+#   profileur.exporter("profil_run1")   # profil_run1.json et profil_run1.csv
+
+import bisect
+import collections
+import csv
+import json
+import time
+
+import py_trees
+
+# Bornes supérieures des classes des histogrammes, en secondes : 4 classes par décade de 1 µs à 100 s
+BORNES_HISTOGRAMME = tuple(10 ** (exposant / 4.0) for exposant in range(-24, 9))
+
+# Quantiles reportés dans les exports
+QUANTILES = (0.5, 0.9, 0.99)
+
+class Histogramme(object):
+    """
+    Histogramme à classes logarithmiques fixes : mémoire constante quelle que soit la durée de l'exécution.
+    """
+    def __init__(self):
+        self.comptes = [0] * (len(BORNES_HISTOGRAMME) + 1)  # Dernière classe : au-delà de la dernière borne
+        self.nombre = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def ajouter(self, valeur):
+        self.comptes[bisect.bisect_left(BORNES_HISTOGRAMME, valeur)] += 1
+        self.nombre += 1
+        self.total += valeur
+        self.minimum = valeur if self.minimum is None else min(self.minimum, valeur)
+        self.maximum = valeur if self.maximum is None else max(self.maximum, valeur)
+
+    def quantile(self, q):
+        """
+        :return: Borne supérieure de la classe contenant le quantile q (bornée par le maximum observé).
+        """
+        if not self.nombre:
+            return None
+        rang = q * self.nombre
+        cumul = 0
+        for indice, compte in enumerate(self.comptes):
+            cumul += compte
+            if compte and cumul >= rang:
+                borne = BORNES_HISTOGRAMME[indice] if indice < len(BORNES_HISTOGRAMME) else self.maximum
+                return min(borne, self.maximum)
+        return self.maximum
+
+    def resume(self):
+        resume = collections.OrderedDict([
+            ("nombre", self.nombre),
+            ("total", self.total),
+            ("moyenne", self.total / self.nombre if self.nombre else None),
+            ("min", self.minimum),
+            ("max", self.maximum),
+        ])
+        for q in QUANTILES:
+            resume["p{:g}".format(q * 100)] = self.quantile(q)
+        return resume
+
+    def classes(self):
+        # Classes non vides : (borne supérieure, effectif) ; None pour la classe au-delà de la dernière borne
+        return [(BORNES_HISTOGRAMME[indice] if indice < len(BORNES_HISTOGRAMME) else None, compte)
+                for indice, compte in enumerate(self.comptes) if compte]
+
+class ProfileurBT(object):
+    """
+    Mesures d'une exécution d'un Behavior Tree.
+
+    :param horloge: Source du temps (time.time par défaut, comme les accusés de ClientKB).
+    """
+    def __init__(self, horloge=time.time):
+        self.horloge = horloge
+        self.debut = horloge()
+        self.ticks = Histogramme()
+        self.updates = collections.defaultdict(Histogramme)    # nœud -> durées de update()
+        self.running = collections.defaultdict(Histogramme)    # nœud -> durées des phases RUNNING
+        self.transitions = collections.Counter()                # (nœud, statut avant, statut après) -> nombre
+        self.intervalles = []                                   # (nœud, début, fin) des phases RUNNING, relatifs au début
+        self.kb_soumission = Histogramme()                      # Temps bloqué dans ClientKB.soumettre
+        self.kb_accuse = Histogramme()                          # Délai entre la soumission et l'accusé de la KB
+        self._noeuds = []
+        self._cles = {}
+        self._statuts = {}
+        self._debut_running = {}
+        self._tickets = []
+
+    # ----- Instrumentation -----
+
+    def instrumenter(self, root, client=None):
+        """
+        Chronomètre l'update() de chaque nœud de l'arbre et, si un client est fourni, ses soumissions à la KB.
+
+        :return: Le profileur, pour chaîner avec le constructeur.
+        """
+        noms = collections.Counter()
+        for node in root.iterate():
+            # Plusieurs nœuds peuvent porter le même nom (« Move to loc_workstation ») : les suivants sont numérotés
+            noms[node.name] += 1
+            cle = node.name if noms[node.name] == 1 else "{} [{}]".format(node.name, noms[node.name])
+            self._cles[node.id] = cle
+            self._noeuds.append(node)
+            self._chronometrer(node, self.updates[cle])
+        if client is not None:
+            self.instrumenter_client(client)
+        return self
+
+    def _chronometrer(self, node, histogramme):
+        update = node.update
+        horloge = self.horloge
+
+        def update_chronometre():
+            debut = horloge()
+            try:
+                return update()
+            finally:
+                histogramme.ajouter(horloge() - debut)
+        node.update = update_chronometre
+
+    def instrumenter_client(self, client):
+        soumettre = client.soumettre
+        horloge = self.horloge
+
+        def soumettre_chronometre(mises_a_jour):
+            debut = horloge()
+            ticket = soumettre(mises_a_jour)
+            self.kb_soumission.ajouter(horloge() - debut)
+            self._tickets.append((ticket, debut))
+            return ticket
+        client.soumettre = soumettre_chronometre
+        return self
+
+    # ----- Mesure -----
+
+    def tick(self, arbre):
+        """
+        Tick chronométré de l'arbre (py_trees_ros.trees.BehaviourTree ou py_trees.trees.BehaviourTree), suivi
+        du relevé des statuts.
+        """
+        debut = self.horloge()
+        arbre.tick()
+        fin = self.horloge()
+        self.ticks.ajouter(fin - debut)
+        self.observer(fin)
+
+    def observer(self, instant=None):
+        # Relève les transitions de statut depuis le tick précédent et les accusés de la KB reçus
+        instant = self.horloge() if instant is None else instant
+        for node in self._noeuds:
+            statut = node.status
+            avant = self._statuts.get(node.id, py_trees.common.Status.INVALID)
+            if statut == avant:
+                continue
+            cle = self._cles[node.id]
+            self.transitions[(cle, avant.value, statut.value)] += 1
+            if statut == py_trees.common.Status.RUNNING:
+                self._debut_running[node.id] = instant
+            elif avant == py_trees.common.Status.RUNNING:
+                debut = self._debut_running.pop(node.id)
+                self.running[cle].ajouter(instant - debut)
+                self.intervalles.append((cle, debut - self.debut, instant - self.debut))
+            self._statuts[node.id] = statut
+        en_attente = []
+        for ticket, debut in self._tickets:
+            if ticket.termine:
+                self.kb_accuse.ajouter((getattr(ticket, 'instant', None) or instant) - debut)
+            else:
+                en_attente.append((ticket, debut))
+        self._tickets = en_attente
+
+    # ----- Export -----
+
+    def resume(self):
+        noeuds = collections.OrderedDict()
+        for node in self._noeuds:
+            cle = self._cles[node.id]
+            noeuds[cle] = collections.OrderedDict([
+                ("type", type(node).__name__),
+                ("update", self.updates[cle].resume()),
+                ("update_classes", self.updates[cle].classes()),
+                ("running", self.running[cle].resume()),
+                ("running_classes", self.running[cle].classes()),
+            ])
+        return collections.OrderedDict([
+            ("duree", self.horloge() - self.debut),
+            ("ticks", self.ticks.resume()),
+            ("ticks_classes", self.ticks.classes()),
+            ("kb_soumission", self.kb_soumission.resume()),
+            ("kb_accuse", self.kb_accuse.resume()),
+            ("kb_en_attente", len(self._tickets)),
+            ("noeuds", noeuds),
+            ("transitions", [collections.OrderedDict([("noeud", cle), ("avant", avant), ("apres", apres), ("nombre", nombre)])
+                             for (cle, avant, apres), nombre in sorted(self.transitions.items())]),
+            ("intervalles_running", [collections.OrderedDict([("noeud", cle), ("debut", debut), ("fin", fin)])
+                                     for cle, debut, fin in self.intervalles]),
+        ])
+
+    def lignes(self):
+        # Une ligne par mesure agrégée : (élément, mesure, nombre, total, moyenne, min, max, quantiles...)
+        mesures = [("arbre", "tick", self.ticks), ("kb", "soumission", self.kb_soumission), ("kb", "accuse", self.kb_accuse)]
+        for node in self._noeuds:
+            cle = self._cles[node.id]
+            mesures.append((cle, "update", self.updates[cle]))
+            if self.running[cle].nombre:
+                mesures.append((cle, "running", self.running[cle]))
+        for element, mesure, histogramme in mesures:
+            yield [element, mesure] + list(histogramme.resume().values())
+
+    def exporter_json(self, chemin):
+        with open(chemin, 'w') as file:
+            json.dump(self.resume(), file, indent=1)
+
+    def exporter_csv(self, chemin):
+        with open(chemin, 'w') as file:
+            writer = csv.writer(file)
+            writer.writerow(["element", "mesure", "nombre", "total", "moyenne", "min", "max"] +
+                            ["p{:g}".format(q * 100) for q in QUANTILES])
+            for ligne in self.lignes():
+                writer.writerow(ligne)
+
+    def exporter(self, prefixe):
+        """
+        Écrit prefixe.json (résumé complet, transitions et phases RUNNING) et prefixe.csv (mesures agrégées).
+
+        :return: Chemins écrits.
+        """
+        self.observer()
+        chemins = (prefixe + ".json", prefixe + ".csv")
+        self.exporter_json(chemins[0])
+        self.exporter_csv(chemins[1])
+        return chemins
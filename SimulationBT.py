@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Simulation hors ligne des Behavior Trees
+#
+# Le Behavior Tree d'une spécification (P3_Assembleur.create_behavior_tree_spec) est construit avec des
+# comportements simulés à la place des actions ROS : chacun dure un temps tiré d'une loi configurable et
+# échoue avec une probabilité configurable. L'arbre est tické sur une horloge virtuelle qui saute directement
+# à la prochaine échéance, et les mises à jour de la KB sont appliquées à un MiroirKB (KB simulée). Un plan se
+# vérifie ainsi en quelques millisecondes au lieu du temps d'exécution réel.
+#
+# Exemple :
+#   python SimulationBT.py behavior_tree.json --probleme problem.pddl --echec FinalGrasp=0.1 --graine 1
+
+import argparse
+import collections
+import os
+import random
+import time
+
+import py_trees
+
+import ConstructionBT
+from MiroirKB import MiroirKB
+
+# Durées nominales des actions simulées, en secondes, par nom de classe (WaitAction : durée du nœud)
+DUREES_DEFAUT = {
+    "MoveBaseGoalAction": 10.0,
+    "VerifierAruco": 0.1,
+    "ObserveTableAction": 2.0,
+    "PreGraspArmRightAction": 3.0,
+    "moveitAruco": 5.0,
+    "RotateBeforeGrasp": 2.0,
+    "FinalGrasp": 2.0,
+    "CloseGripperRight": 1.0,
+    "OpenGripperRight": 1.0,
+    "ArmRightHome": 3.0,
+    "LookForwardAndRaise": 2.0,
+    # Rendez-vous d'une opération Co : les partenaires sont supposés à l'heure dans la simulation d'un seul arbre
+    "PointSynchronisation": 0.0,
+    # Opération d'un opérateur humain, jusqu'à son acquittement
+    "ConsigneOperateur": 20.0,
+}
+
+# Durée virtuelle maximale d'une simulation, en secondes
+DUREE_MAX = 24 * 3600.0
+
+ResultatSimulation = collections.namedtuple('ResultatSimulation', [
+    'statut',       # Statut final de la racine ('SUCCESS', 'FAILURE', ou 'RUNNING' si DUREE_MAX est atteinte)
+    'duree',        # Durée virtuelle de l'exécution, en secondes
+    'ticks',        # Nombre de ticks
+    'echecs',       # Noms des comportements simulés ayant échoué, dans l'ordre
+    'intervalles',  # (décorateur, début, fin, statut) de chaque action du plan terminée
+    'kb',           # MiroirKB final
+])
+
+class HorlogeVirtuelle(object):
+    def __init__(self, instant=0.0):
+        self.instant = instant
+
+    def __call__(self):
+        return self.instant
+
+    def avancer_jusqu_a(self, instant):
+        self.instant = max(self.instant, instant)
+
+class ModeleSimulation(object):
+    """
+    Lois des comportements simulés. Les clés sont des noms de nœud (prioritaires) ou de classe.
+
+    :param durees: Durée de chaque comportement : constante, couple (moyenne, écart-type) tiré selon une loi
+                   normale tronquée à 0, ou appelable recevant le générateur aléatoire.
+    :param echecs: Probabilité d'échec de chaque comportement (0 par défaut).
+    :param dispersion: Coefficient de variation appliqué aux durées constantes (et à celles des WaitAction) :
+                       0 pour des durées fixes, 0.2 pour une loi normale d'écart-type 20 % de la durée.
+    """
+    def __init__(self, durees=None, echecs=None, duree_defaut=1.0, dispersion=0.0):
+        self.durees = dict(DUREES_DEFAUT)
+        self.durees.update(durees or {})
+        self.echecs = dict(echecs or {})
+        self.duree_defaut = duree_defaut
+        self.dispersion = dispersion
+
+    def tirer_duree(self, nom, nom_classe, parametres, alea):
+        loi = self.durees.get(nom, self.durees.get(nom_classe))
+        if loi is None:
+            loi = float(parametres.get("duration", self.duree_defaut))
+        if callable(loi):
+            return max(0.0, float(loi(alea)))
+        if isinstance(loi, (tuple, list)):
+            return max(0.0, alea.gauss(loi[0], loi[1]))
+        if self.dispersion:
+            return max(0.0, alea.gauss(loi, self.dispersion * loi))
+        return float(loi)
+
+    def tirer_echec(self, nom, nom_classe, alea):
+        probabilite = self.echecs.get(nom, self.echecs.get(nom_classe, 0.0))
+        return probabilite > 0 and alea.random() < probabilite
+
+class ActionSimulee(py_trees.behaviour.Behaviour):
+    """
+    Comportement simulé : RUNNING jusqu'à son échéance sur l'horloge virtuelle, puis SUCCESS ou FAILURE.
+    """
+    def __init__(self, name, nom_classe, parametres, simulateur):
+        super(ActionSimulee, self).__init__(name=name)
+        self.nom_classe = nom_classe
+        self.parametres = parametres
+        self.simulateur = simulateur
+        self.fin = None
+        self.echec = False
+
+    def initialise(self):
+        simulateur = self.simulateur
+        self.fin = simulateur.horloge() + simulateur.modele.tirer_duree(self.name, self.nom_classe, self.parametres, simulateur.alea)
+        self.echec = simulateur.modele.tirer_echec(self.name, self.nom_classe, simulateur.alea)
+
+    def update(self):
+        if self.simulateur.horloge() < self.fin:
+            self.simulateur.signaler_echeance(self.fin)
+            return py_trees.common.Status.RUNNING
+        if self.echec:
+            self.simulateur.echecs.append(self.name)
+            return py_trees.common.Status.FAILURE
+        return py_trees.common.Status.SUCCESS
+
+class DecorateurKBSimule(py_trees.decorators.Decorator):
+    """
+    Équivalent simulé de KBUpdateDecorator : les mises à jour sont appliquées à la KB simulée, et la durée de
+    l'action décorée est relevée.
+    """
+    def __init__(self, name, simulateur, on_success_predicates=(), on_failure_remove_predicates=(),
+                 on_success_remove_predicates=(), on_failure_predicates=(), child=None):
+        super(DecorateurKBSimule, self).__init__(name=name, child=child)
+        self.simulateur = simulateur
+        self.on_success_predicates = on_success_predicates
+        self.on_failure_remove_predicates = on_failure_remove_predicates
+        self.on_success_remove_predicates = on_success_remove_predicates
+        self.on_failure_predicates = on_failure_predicates
+        self.debut = None
+
+    def initialise(self):
+        self.debut = self.simulateur.horloge()
+
+    def update(self):
+        child_status = self.decorated.status
+        if child_status == py_trees.common.Status.SUCCESS:
+            mises_a_jour = ([(nom, parametres, True) for nom, parametres in self.on_success_predicates] +
+                            [(nom, parametres, False) for nom, parametres in self.on_success_remove_predicates])
+        elif child_status == py_trees.common.Status.FAILURE:
+            mises_a_jour = ([(nom, parametres, False) for nom, parametres in self.on_failure_remove_predicates] +
+                            [(nom, parametres, True) for nom, parametres in self.on_failure_predicates])
+        else:
+            return child_status
+        self.simulateur.kb.appliquer(mises_a_jour)
+        self.simulateur.intervalles.append((self.name, self.debut, self.simulateur.horloge(), child_status.value))
+        return child_status
+
+class Simulateur(object):
+    """
+    Arbre simulé d'une spécification.
+
+    :param specification: Spécification (dictionnaire) ou chemin du fichier JSON.
+    :param modele: ModeleSimulation (lois par défaut si None).
+    :param kb: MiroirKB de départ, modifié par la simulation (une bifurcation MiroirKB.instantane() pour
+               simuler depuis l'état courant sans le modifier). Par défaut, le :init du problème de la
+               spécification.
+    :param graine: Graine du générateur aléatoire, pour rejouer une simulation.
+    :param pas: Pas fixe de l'horloge virtuelle (0.1 pour reproduire le tick à 10 Hz) ; par défaut, l'horloge
+                saute à la prochaine échéance.
+    """
+    def __init__(self, specification, modele=None, kb=None, graine=None, pas=None, duree_max=DUREE_MAX):
+        if not isinstance(specification, dict):
+            specification = ConstructionBT.charger_specification(specification)
+        self.specification = specification
+        self.modele = modele if modele is not None else ModeleSimulation()
+        self.alea = random.Random(graine)
+        self.pas = pas
+        self.duree_max = duree_max
+        self.horloge = HorlogeVirtuelle()
+        if kb is None:
+            kb = MiroirKB(dict(specification["predicate_parameter_order"]))
+            if specification.get("problem") and os.path.exists(specification["problem"]):
+                kb.charger_probleme(specification["problem"])
+        self.kb = kb
+        self.echecs = []
+        self.intervalles = []
+        self._echeance = None
+        comportements = dict((nom_classe, self._fabrique(nom_classe)) for nom_classe in ConstructionBT.CLASSES_COMPORTEMENTS)
+        self.root = ConstructionBT.creer_arbre(specification, comportements, self._decorateur)
+
+    def reinitialiser(self, graine=None, kb=None):
+        """
+        Prépare une nouvelle exécution du même arbre, sans le reconstruire.
+
+        :param kb: MiroirKB de départ de la nouvelle exécution (par défaut, la KB de l'exécution précédente).
+        """
+        self.root.stop(py_trees.common.Status.INVALID)
+        self.alea.seed(graine)
+        self.horloge = HorlogeVirtuelle()
+        if kb is not None:
+            self.kb = kb
+        self.echecs = []
+        self.intervalles = []
+
+    def _fabrique(self, nom_classe):
+        # Même signature que le comportement réel : le nom en premier argument ou en argument nommé
+        def fabrique(*args, **kwargs):
+            nom = args[0] if args else kwargs.pop("name")
+            kwargs.pop("name", None)
+            parametres = dict(kwargs)
+            if len(args) > 1:
+                parametres["arguments"] = list(args[1:])
+            return ActionSimulee(nom, nom_classe, parametres, self)
+        return fabrique
+
+    def _decorateur(self, **kwargs):
+        return DecorateurKBSimule(simulateur=self, **kwargs)
+
+    def signaler_echeance(self, instant):
+        # Prochaine échéance parmi les comportements en cours, pour le saut de l'horloge
+        if self._echeance is None or instant < self._echeance:
+            self._echeance = instant
+
+    def executer(self):
+        """
+        Tique l'arbre jusqu'à SUCCESS, FAILURE ou duree_max.
+
+        :return: ResultatSimulation.
+        """
+        ticks = 0
+        while True:
+            self._echeance = None
+            for _ in self.root.tick():
+                pass
+            ticks += 1
+            if self.root.status != py_trees.common.Status.RUNNING or self.horloge() >= self.duree_max:
+                break
+            if self.pas is not None:
+                self.horloge.avancer_jusqu_a(self.horloge() + self.pas)
+            elif self._echeance is not None:
+                self.horloge.avancer_jusqu_a(min(self._echeance, self.duree_max))
+            else:
+                # Comportement RUNNING sans échéance connue : avance d'un tick à 10 Hz
+                self.horloge.avancer_jusqu_a(self.horloge() + 0.1)
+        return ResultatSimulation(self.root.status.value, self.horloge(), ticks, list(self.echecs),
+                                  list(self.intervalles), self.kb)
+
+def simuler(specification, modele=None, kb=None, graine=None, pas=None):
+    return Simulateur(specification, modele, kb, graine, pas).executer()
+
+def lire_lois(valeurs, conversion):
+    # "Nom=valeur" -> {Nom: conversion(valeur)}
+    lois = {}
+    for valeur in valeurs or ():
+        nom, _, texte = valeur.partition("=")
+        lois[nom] = conversion(texte)
+    return lois
+
+def lire_duree(texte):
+    # "10" -> 10.0 ; "10,2" -> (10.0, 2.0), loi normale
+    valeurs = [float(v) for v in texte.split(",")]
+    return tuple(valeurs) if len(valeurs) > 1 else valeurs[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation hors ligne d'un Behavior Tree décrit en JSON.")
+    parser.add_argument('specification', help="Spécification JSON du Behavior Tree (P3, --json)")
+    parser.add_argument('--probleme', default=None, help="problem.pddl dont le :init initialise la KB simulée")
+    parser.add_argument('--duree', action='append', metavar='NOM=SECONDES',
+                        help="Durée d'un comportement (nom de nœud ou de classe) ; MOYENNE,ECART pour une loi normale")
+    parser.add_argument('--echec', action='append', metavar='NOM=PROBA', help="Probabilité d'échec d'un comportement")
+    parser.add_argument('--dispersion', type=float, default=0.0, help="Coefficient de variation des durées constantes")
+    parser.add_argument('--graine', type=int, default=None, help="Graine du générateur aléatoire")
+    parser.add_argument('--pas', type=float, default=None, help="Pas fixe de l'horloge virtuelle (sinon, par échéance)")
+    args = parser.parse_args()
+
+    specification = ConstructionBT.charger_specification(args.specification)
+    kb = None
+    if args.probleme:
+        kb = MiroirKB(dict(specification["predicate_parameter_order"]))
+        kb.charger_probleme(args.probleme)
+    modele = ModeleSimulation(lire_lois(args.duree, lire_duree), lire_lois(args.echec, float), dispersion=args.dispersion)
+
+    debut = time.time()
+    resultat = simuler(specification, modele, kb, args.graine, args.pas)
+    print("Statut : {}".format(resultat.statut))
+    print("Durée simulée : {:.1f} s en {} ticks ({:.1f} ms de calcul)".format(resultat.duree, resultat.ticks,
+                                                                              (time.time() - debut) * 1000))
+    if resultat.echecs:
+        print("Échecs : {}".format(", ".join(resultat.echecs)))
+    print("Faits finaux de la KB : {}".format(len(resultat.kb)))
+    return 0 if resultat.statut == py_trees.common.Status.SUCCESS.value else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
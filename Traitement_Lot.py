@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Conversion en lot des solutions d'un balayage de alpha (P1 + P2 pour chaque fichier .sol)
+#
+# Exemple :
+#   python Traitement_Lot.py 'AlternativeAlpha*.sol' solution.sol --sortie lot --processus 8
+
+import argparse
+import collections
+import glob
+import multiprocessing
+import os
+import time
+
+import P1_Convertisseur
+import Pipeline
+
+def lister_solutions(motifs):
+    """
+    Développe une liste de répertoires et de motifs glob en fichiers .sol (sans doublons, triés).
+    """
+    fichiers = set()
+    for motif in motifs:
+        if os.path.isdir(motif):
+            fichiers.update(glob.glob(os.path.join(motif, '*.sol')))
+        else:
+            fichiers.update(glob.glob(motif))
+    return sorted(fichiers)
+
+def noms_sortie(solutions):
+    """
+    Nom du sous-répertoire de sortie de chaque solution : le nom du fichier sans .sol, précédé de son chemin
+    depuis leur répertoire commun si plusieurs solutions portent le même nom (a/solution.sol et
+    b/solution.sol donnent a_solution et b_solution).
+
+    :return: Liste des noms, dans l'ordre des solutions.
+    :raises ValueError: Si deux solutions gardent le même nom de sortie (même fichier listé deux fois).
+    """
+    def base(chemin):
+        return os.path.splitext(os.path.basename(chemin))[0]
+
+    homonymes = collections.defaultdict(list)
+    for chemin in solutions:
+        homonymes[base(chemin)].append(os.path.abspath(chemin))
+    noms = []
+    for chemin in solutions:
+        groupe = homonymes[base(chemin)]
+        if len(groupe) == 1:
+            noms.append(base(chemin))
+            continue
+        prefixe = os.path.commonprefix([os.path.dirname(membre) + os.sep for membre in groupe])
+        commun = prefixe[:prefixe.rfind(os.sep) + 1]
+        noms.append(os.path.splitext(os.path.abspath(chemin)[len(commun):])[0].replace(os.sep, '_'))
+    doublons = sorted(nom for nom, nombre in collections.Counter(noms).items() if nombre > 1)
+    if doublons:
+        raise ValueError("Plusieurs solutions ont le même répertoire de sortie : {}".format(", ".join(doublons)))
+    return noms
+
+def lire_objectifs(chemin_sol):
+    # Cmax et Wmax sont en tête du fichier : on arrête la lecture dès qu'ils sont trouvés
+    objectifs = {}
+    for var_name, _, value in P1_Convertisseur.lire_variables_sol(chemin_sol, ('Cmax', 'Wmax')):
+        objectifs[var_name] = value
+        if len(objectifs) == 2:
+            break
+    return objectifs.get('Cmax'), objectifs.get('Wmax')
+
+def traiter_solution(tache):
+    """
+    Exécute la chaîne P1 -> P2 pour une solution, dans son propre répertoire de sortie.
+
+    :param tache: Tuple (chemin du .sol, nom de sortie (noms_sortie), chemin de operations_elementaires.json,
+                  répertoire racine de sortie).
+    :return: Dictionnaire de résumé (nom, statut, durées par étape, Cmax, Wmax, erreur éventuelle).
+    """
+    chemin_sol, nom, operations_file, racine_sortie = tache
+    sortie = os.path.join(racine_sortie, nom)
+    resume = {"nom": nom, "statut": "OK", "p1": None, "p2": None, "cmax": None, "wmax": None, "erreur": ""}
+    try:
+        resume["cmax"], resume["wmax"] = lire_objectifs(chemin_sol)
+        resultat = Pipeline.executer_pipeline(chemin_sol, operations_file, sortie, exporter_texte=True,
+                                              repertoire_cache=P1_Convertisseur.cache_dir)
+        resume["p1"] = resultat.durees['P1']
+        resume["p2"] = resultat.durees['P2']
+    except Exception as e:
+        resume["statut"] = "ERREUR"
+        resume["erreur"] = str(e)
+    return resume
+
+def formater_resume(resumes):
+    """
+    Formate le tableau récapitulatif (une ligne par solution) en texte aligné.
+    """
+    def nombre(valeur, format_nombre):
+        return "-" if valeur is None else format_nombre.format(valeur)
+
+    entete = ("Solution", "Statut", "P1 (s)", "P2 (s)", "Cmax", "Wmax")
+    lignes = [entete]
+    for resume in resumes:
+        lignes.append((resume["nom"], resume["statut"], nombre(resume["p1"], "{:.3f}"), nombre(resume["p2"], "{:.3f}"),
+                       nombre(resume["cmax"], "{:.0f}"), nombre(resume["wmax"], "{:.0f}")))
+    largeurs = [max(len(ligne[i]) for ligne in lignes) for i in range(len(entete))]
+    texte = []
+    for ligne in lignes:
+        texte.append("  ".join(cellule.ljust(largeur) for cellule, largeur in zip(ligne, largeurs)).rstrip())
+    for resume in resumes:
+        if resume["erreur"]:
+            texte.append("{} : {}".format(resume["nom"], resume["erreur"]))
+    return "\n".join(texte)
+
+def ecrire_resume_csv(resumes, chemin):
+    with open(chemin, 'w') as file:
+        file.write("solution;statut;p1_s;p2_s;cmax;wmax;erreur\n")
+        for resume in resumes:
+            file.write("{};{};{};{};{};{};{}\n".format(
+                resume["nom"], resume["statut"],
+                "" if resume["p1"] is None else "{:.6f}".format(resume["p1"]),
+                "" if resume["p2"] is None else "{:.6f}".format(resume["p2"]),
+                "" if resume["cmax"] is None else resume["cmax"],
+                "" if resume["wmax"] is None else resume["wmax"],
+                resume["erreur"].replace(";", ",")))
+
+def traiter_lot(solutions, operations_file, racine_sortie, processus=None):
+    """
+    Convertit un ensemble de solutions en parallèle dans un pool de processus.
+
+    :param solutions: Liste des chemins .sol.
+    :param operations_file: Chemin de operations_elementaires.json.
+    :param racine_sortie: Répertoire racine ; chaque solution a son sous-répertoire (noms_sortie).
+    :param processus: Taille du pool (par défaut, nombre de coeurs).
+    :return: Liste des résumés, dans l'ordre des solutions.
+    :raises ValueError: Si deux solutions ont le même répertoire de sortie.
+    """
+    noms = noms_sortie(solutions)
+    if not os.path.isdir(racine_sortie):
+        os.makedirs(racine_sortie)
+    taches = [(chemin_sol, nom, operations_file, racine_sortie) for chemin_sol, nom in zip(solutions, noms)]
+    pool = multiprocessing.Pool(processus)
+    try:
+        resumes = pool.map(traiter_solution, taches, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return resumes
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion en lot de solutions .sol en fichiers PDDL.")
+    parser.add_argument('solutions', nargs='+', help="Répertoires ou motifs glob de fichiers .sol")
+    parser.add_argument('--operations', default='operations_elementaires.json', help="Catalogue des opérations élémentaires")
+    parser.add_argument('--sortie', default='lot', help="Répertoire racine des sorties")
+    parser.add_argument('--processus', type=int, default=None, help="Nombre de processus (défaut : nombre de coeurs)")
+    args = parser.parse_args()
+
+    solutions = lister_solutions(args.solutions)
+    if not solutions:
+        print("Erreur : aucun fichier .sol trouvé.")
+        return 1
+
+    debut = time.time()
+    try:
+        resumes = traiter_lot(solutions, args.operations, args.sortie, args.processus)
+    except ValueError as e:
+        print("Erreur :", e)
+        return 1
+    print(formater_resume(resumes))
+    ecrire_resume_csv(resumes, os.path.join(args.sortie, 'resume.csv'))
+    print("{} solution(s) traitée(s) en {:.3f} s. Résumé enregistré dans {}.".format(
+        len(resumes), time.time() - debut, os.path.join(args.sortie, 'resume.csv')))
+    return 0 if all(resume["statut"] == "OK" for resume in resumes) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Banc de mesure de P2 : chaîne actuelle (P2_Dispatcher) contre le script P2 d'origine, exécuté tel quel,
+# sur des fichiers solution_readable.txt synthétiques de 100, 1 000 et 10 000 opérations.
+#
+# Le script d'origine est relu dans l'historique git (révision fd22476 par défaut) ; seuls ses quatre
+# chemins codés en dur sont redirigés vers les fichiers du banc. Les deux chaînes mesurées vont de la
+# lecture du catalogue et des logs jusqu'à l'écriture de domain.pddl et problem.pddl, et doivent
+# produire exactement les mêmes fichiers.
+#
+# Exemple (depuis la racine du dépôt) :
+#   python benchmarks/bench_emission_pddl.py --repetitions 5
+#   python benchmarks/bench_emission_pddl.py --reference /chemin/vers/ancien_P2_Dispatcher.py
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RACINE)
+
+import P2_Dispatcher
+
+TAILLES = (100, 1000, 10000)
+
+# Révision du script P2 d'origine, avant l'analyse indexée et l'émission par blocs
+REVISION_REFERENCE = "fd22476"
+
+# Chemins codés en dur du script d'origine, redirigés vers les fichiers du banc
+CHEMINS_CODES = br"^(operations_file|logs_file|domain_file_path|problem_file_path) = .*$"
+
+def donnees_synthetiques(nombre_operations):
+    """
+    Construit les lignes de solution_readable.txt et le catalogue d'un planning synthétique.
+
+    Les numéros de job et d'opération ont une largeur fixe pour que les noms OPxx restent uniques ;
+    une opération sur cinq est collaborative (Co), une attente est insérée toutes les sept opérations
+    et une opération machine (ignorée par P2) est intercalée toutes les trois.
+
+    :param nombre_operations: Nombre d'opérations R/Co du planning.
+    :return: Tuple (lignes de solution_readable.txt, catalogue operations_elementaires).
+    """
+    lignes = []
+    jobs = {}
+    temps = 0
+    for numero in range(nombre_operations):
+        job_id = "j_{}".format(1000 + numero // 100)
+        op_id = "op_{}".format(100 + numero % 100)
+        ressource = "Co" if numero % 5 == 0 else "R"
+        if numero % 7 == 3:
+            temps += 2  # Attente avant l'opération
+        lignes.append("Operation {}, Job {}, Resource {}: Start time (Sijk) = {}, End time (Cijk) = {}\n".format(
+            op_id, job_id, ressource, temps, temps + 10))
+        if numero % 3 == 1:
+            lignes.append("Operation {}, Job {}, Resource M1: Start time (Sijk) = {}, End time (Cijk) = {}\n".format(
+                op_id, job_id, temps, temps + 4))
+        temps += 10
+        base_name = "OP" + job_id.split('_')[1] + op_id.split('_')[1]
+        actions = ["move_to", "pick", "place"] if numero % 2 == 0 else ["pick", "place"]
+        jobs.setdefault(job_id, {"operations": {}})["operations"][base_name] = actions
+    return lignes, {"jobs": jobs}
+
+def charger_reference(chemin=None, revision=REVISION_REFERENCE):
+    """
+    Compile le script P2 d'origine avec ses chemins codés en dur redirigés vers CHEMINS_REFERENCE.
+
+    :param chemin: Fichier du script d'origine ; à défaut, il est relu dans l'historique git.
+    :param revision: Révision git du script d'origine.
+    :return: Objet code à exécuter dans un espace de noms contenant CHEMINS_REFERENCE.
+    :raises ValueError: Si le script ne contient pas les quatre chemins attendus.
+    """
+    if chemin:
+        with open(chemin, 'rb') as file:
+            source = file.read()
+    else:
+        source = subprocess.check_output(['git', 'show', revision + ':P2_Dispatcher.py'], cwd=RACINE)
+    source, remplacements = re.subn(CHEMINS_CODES, br"\1 = CHEMINS_REFERENCE['\1']", source, flags=re.M)
+    if remplacements != 4:
+        raise ValueError("Script de référence inattendu : {} chemins codés en dur trouvés au lieu de 4.".format(remplacements))
+    return compile(source, 'p2_reference', 'exec')
+
+def executer_reference(code, chemins):
+    """
+    Exécute le script d'origine, sa sortie console (messages de succès) étant écartée.
+    """
+    sortie = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        exec(code, {'__name__': 'p2_reference', 'CHEMINS_REFERENCE': chemins})
+    finally:
+        sys.stdout.close()
+        sys.stdout = sortie
+
+def executer_actuel(chemins):
+    """
+    Même traitement que le script d'origine, par les fonctions de P2_Dispatcher.
+    """
+    operations_elementaires = P2_Dispatcher.charger_operations_elementaires(chemins['operations_file'])
+    logs = P2_Dispatcher.charger_logs(chemins['logs_file'])
+    dispatch = P2_Dispatcher.analyser_logs(logs, P2_Dispatcher.indexer_operations_elementaires(operations_elementaires))
+    P2_Dispatcher.generer_domain_pddl(dispatch, chemins['domain_file_path'])
+    P2_Dispatcher.generer_problem_pddl(dispatch, chemins['problem_file_path'])
+
+def mesurer(fonction, repetitions):
+    meilleur = None
+    for _ in range(repetitions):
+        debut = time.time()
+        fonction()
+        duree = time.time() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return meilleur
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure de P2 contre le script d'origine.")
+    parser.add_argument('--repetitions', type=int, default=5, help="Nombre de répétitions (meilleur temps retenu)")
+    parser.add_argument('--reference', help="Fichier du script P2 d'origine (par défaut relu dans l'historique git)")
+    parser.add_argument('--revision', default=REVISION_REFERENCE, help="Révision git du script P2 d'origine")
+    args = parser.parse_args()
+
+    try:
+        code_reference = charger_reference(args.reference, args.revision)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        print("Erreur lors du chargement du script de référence :", e)
+        return 1
+
+    repertoire = tempfile.mkdtemp()
+    try:
+        print("{:>10}  {:>14}  {:>12}  {:>8}".format("Opérations", "Origine (ms)", "Actuel (ms)", "Gain"))
+        for taille in TAILLES:
+            lignes, catalogue = donnees_synthetiques(taille)
+            chemins_logs = os.path.join(repertoire, 'solution_readable.txt')
+            chemins_catalogue = os.path.join(repertoire, 'operations_elementaires.json')
+            with open(chemins_logs, 'w') as file:
+                file.writelines(lignes)
+            with open(chemins_catalogue, 'w') as file:
+                json.dump(catalogue, file)
+
+            reference = {'operations_file': chemins_catalogue, 'logs_file': chemins_logs,
+                         'domain_file_path': os.path.join(repertoire, 'origine_domain.pddl'),
+                         'problem_file_path': os.path.join(repertoire, 'origine_problem.pddl')}
+            actuel = dict(reference, domain_file_path=os.path.join(repertoire, 'domain.pddl'),
+                          problem_file_path=os.path.join(repertoire, 'problem.pddl'))
+
+            duree_reference = mesurer(lambda: executer_reference(code_reference, reference), args.repetitions)
+            duree_actuelle = mesurer(lambda: executer_actuel(actuel), args.repetitions)
+
+            # Les deux chaînes doivent produire exactement les mêmes fichiers
+            for cle in ('domain_file_path', 'problem_file_path'):
+                with open(reference[cle]) as file_reference, open(actuel[cle]) as file_actuel:
+                    if file_reference.read() != file_actuel.read():
+                        print("Erreur : sorties différentes pour {} opérations ({}).".format(taille, os.path.basename(actuel[cle])))
+                        return 1
+
+            print("{:>10}  {:>14.2f}  {:>12.2f}  {:>7.1f}x".format(
+                taille, duree_reference * 1000, duree_actuelle * 1000, duree_reference / duree_actuelle))
+    finally:
+        shutil.rmtree(repertoire)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de ClientKB avec le service en mémoire ServiceKBLocal (hors ROS)
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ClientKB import ClientKB, ServiceKBLocal
+
+DELAI = 5.0
+
+class TransportRetenu(object):
+    """
+    Transport dont le premier appel attend d'être libéré : les lots soumis pendant ce temps s'accumulent
+    dans la file du client.
+    """
+    def __init__(self, service):
+        self.service = service
+        self.appele = threading.Event()
+        self.libere = threading.Event()
+
+    def __call__(self, mises_a_jour):
+        if not self.appele.is_set():
+            self.appele.set()
+            self.libere.wait(DELAI)
+        return self.service(mises_a_jour)
+
+class TestClientKB(unittest.TestCase):
+
+    def test_lots_regroupes_dans_l_ordre(self):
+        service = ServiceKBLocal()
+        transport = TransportRetenu(service)
+        client = ClientKB(transport)
+        premier = client.soumettre([("at", {"a": "agent_r", "l": "loc_base"}, True)])
+        self.assertTrue(transport.appele.wait(DELAI))
+        tickets = [client.soumettre([("pick_op{}_done".format(numero), {}, True)]) for numero in range(5)]
+        tickets.append(client.soumettre([("at", {"a": "agent_r", "l": "loc_base"}, False),
+                                         ("at", {"a": "agent_r", "l": "loc_1"}, True)]))
+        transport.libere.set()
+        self.assertTrue(client.fermer(DELAI))
+
+        self.assertTrue(premier.attendre(0) and all(ticket.attendre(0) for ticket in tickets))
+        # Les lots en attente partent en une seule requête, dans leur ordre de soumission
+        self.assertEqual(len(service.requetes), 2)
+        self.assertEqual([mise_a_jour[0] for mise_a_jour in service.requetes[1]],
+                         ["pick_op{}_done".format(numero) for numero in range(5)] + ["at", "at"])
+        self.assertFalse(service.contient("at", {"a": "agent_r", "l": "loc_base"}))
+        self.assertTrue(service.contient("at", {"a": "agent_r", "l": "loc_1"}))
+
+    def test_taille_lot_respectee(self):
+        service = ServiceKBLocal()
+        transport = TransportRetenu(service)
+        client = ClientKB(transport, taille_lot=2)
+        client.soumettre([("p0", {}, True)])
+        self.assertTrue(transport.appele.wait(DELAI))
+        for numero in range(1, 5):
+            client.soumettre([("p{}".format(numero), {}, True)])
+        transport.libere.set()
+        self.assertTrue(client.fermer(DELAI))
+        self.assertEqual([[mise_a_jour[0] for mise_a_jour in requete] for requete in service.requetes],
+                         [["p0"], ["p1", "p2"], ["p3", "p4"]])
+
+    def test_accuses_des_tickets(self):
+        service = ServiceKBLocal(echecs=1)
+        client = ClientKB(service)
+        refuse = client.soumettre([("holding", {"a": "agent_r", "t": "t1"}, True)])
+        self.assertFalse(refuse.attendre(DELAI))
+        self.assertTrue(refuse.termine)
+        accepte = client.soumettre([("holding", {"a": "agent_r", "t": "t1"}, True)])
+        self.assertTrue(accepte.attendre(DELAI))
+        self.assertIsNotNone(accepte.instant)
+        self.assertTrue(service.contient("holding", {"a": "agent_r", "t": "t1"}))
+
+        # Un lot vide est accusé immédiatement, sans requête
+        vide = client.soumettre([])
+        self.assertTrue(vide.termine and vide.attendre(0))
+        self.assertTrue(client.fermer(DELAI))
+        self.assertEqual(client.requetes, 2)
+
+    def test_exception_du_transport(self):
+        service = ServiceKBLocal()
+        appels = []
+
+        def transport(mises_a_jour):
+            appels.append(mises_a_jour)
+            if len(appels) == 1:
+                raise IOError("connexion perdue")
+            return service(mises_a_jour)
+
+        client = ClientKB(transport)
+        ticket = client.soumettre([("wait_done", {"a": "agent_r"}, True)])
+        self.assertFalse(ticket.attendre(DELAI))
+        self.assertIsInstance(client.derniere_erreur, IOError)
+        # Le thread de fond survit à l'erreur et envoie les lots suivants
+        ticket = client.soumettre([("wait_done", {"a": "agent_r"}, True)])
+        self.assertTrue(ticket.attendre(DELAI))
+        self.assertTrue(client.fermer(DELAI))
+        self.assertTrue(service.contient("wait_done", {"a": "agent_r"}))
+
+    def test_reutilisation_apres_fermer(self):
+        service = ServiceKBLocal()
+        client = ClientKB(service)
+        self.assertTrue(client.soumettre([("p1", {}, True)]).attendre(DELAI))
+        self.assertTrue(client.fermer(DELAI))
+        self.assertIsNone(client._thread)
+        # Le client redémarre son thread de fond à la soumission suivante
+        self.assertTrue(client.soumettre([("p2", {}, True)]).attendre(DELAI))
+        self.assertTrue(client.fermer(DELAI))
+        self.assertTrue(service.contient("p1") and service.contient("p2"))
+        # Fermer un client sans thread ne bloque pas
+        self.assertTrue(client.fermer(DELAI))
+
+if __name__ == '__main__':
+    unittest.main()
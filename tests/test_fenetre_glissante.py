@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de l'horizon glissant de P2 (FenetreGlissante) : bornes de la fenêtre en nombre d'opérations et en
+# durée, attentes en tête et en fin de fenêtre, avancée sur réalisation et goal de la fenêtre
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import P2_Dispatcher
+
+# Cinq opérations d'un job, avec une attente avant OP12 (10 -> 12) et une avant OP14 (30 -> 35)
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+    ("op_3", "j_1", "R", 20, 30),
+    ("op_4", "j_1", "R", 35, 45),
+    ("op_5", "j_1", "R", 45, 55),
+]
+
+INDEX_OPERATIONS = dict((("j_1", "OP1{}".format(numero)), P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE)
+                        for numero in range(1, 6))
+
+def noms(fenetre):
+    return [op_entry.op_name for op_entry in fenetre.entrees()]
+
+class TestFenetreGlissante(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatch = P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)
+
+    def test_bornes_en_nombre_d_operations(self):
+        # Les attentes ne comptent pas dans la taille ; celle qui finirait la fenêtre est retirée
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, taille=1)), ["OP11"])
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, taille=2)), ["OP11", "wait", "OP12"])
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, taille=10)),
+                         ["OP11", "wait", "OP12", "OP13", "wait", "OP14", "OP15"])
+
+    def test_bornes_en_duree(self):
+        # Horizon [début de la première opération, + duree[ : OP13 commence à 20, hors de l'horizon de 20
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, duree=20)), ["OP11", "wait", "OP12"])
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, duree=21)), ["OP11", "wait", "OP12", "OP13"])
+        # La première opération est retenue même si l'horizon est plus court qu'elle
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, duree=1)), ["OP11"])
+        # Avec les deux bornes, la plus restrictive s'applique
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, taille=1, duree=100)), ["OP11"])
+        self.assertEqual(noms(P2_Dispatcher.FenetreGlissante(self.dispatch, taille=3, duree=13)), ["OP11", "wait", "OP12"])
+
+    def test_fenetre_non_bornee(self):
+        with self.assertRaises(ValueError):
+            P2_Dispatcher.FenetreGlissante(self.dispatch)
+        with self.assertRaises(ValueError):
+            P2_Dispatcher.FenetreGlissante(self.dispatch, taille=0)
+
+    def test_avancee_sur_realisation(self):
+        fenetre = P2_Dispatcher.FenetreGlissante(self.dispatch, duree=20)
+        self.assertTrue(fenetre.signaler_realisation("OP11"))
+        # L'attente en tête est sautée, l'horizon part de OP12 (12) : l'attente de 30 finirait la fenêtre
+        self.assertEqual(noms(fenetre), ["OP12", "OP13"])
+        # Une opération déjà dépassée ne fait pas reculer la fenêtre
+        self.assertTrue(fenetre.signaler_realisation("OP13"))
+        self.assertFalse(fenetre.signaler_realisation("OP12"))
+        self.assertEqual(noms(fenetre), ["OP14", "OP15"])
+        with self.assertRaises(ValueError):
+            fenetre.signaler_realisation("OP99")
+        fenetre.signaler_realisation("OP15")
+        self.assertTrue(fenetre.terminee)
+        self.assertEqual(fenetre.entrees(), [])
+
+    def test_generation_de_la_fenetre(self):
+        repertoire = tempfile.mkdtemp()
+        try:
+            domain_file = os.path.join(repertoire, "domain.pddl")
+            problem_file = os.path.join(repertoire, "problem.pddl")
+            fenetre = P2_Dispatcher.FenetreGlissante(self.dispatch, taille=2)
+            fenetre.signaler_realisation("OP11")
+            rapport = fenetre.generer(domain_file, problem_file)
+            self.assertEqual([nom for nom in rapport["domain"]["ajoutes"] if nom.startswith(("pick", "place"))],
+                             ["pick_op12", "place_op12", "pick_op13", "place_op13"])
+            with open(problem_file) as file:
+                probleme = file.read()
+            self.assertIn("(place_op13_done)", probleme.split(":goal")[1])
+            self.assertNotIn("tool_op14", probleme)
+
+            # La réalisation de la dernière opération termine le planning : plus rien à générer
+            fenetre.signaler_realisation("OP15")
+            self.assertIsNone(fenetre.generer(domain_file, problem_file))
+        finally:
+            shutil.rmtree(repertoire)
+
+if __name__ == '__main__':
+    unittest.main()
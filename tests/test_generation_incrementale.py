@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de la régénération incrémentale de P2 (GenerateurIncremental) : seuls les fichiers dont un bloc change
+# sont réécrits, les autres gardent leur date de modification
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import P2_Dispatcher
+
+# Planning de trois opérations, avec une attente avant OP12
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+    ("op_1", "j_2", "Co", 20, 30),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_2", "OP21"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+# Date de modification fictive, pour vérifier qu'un fichier n'est pas réécrit
+DATE_ANCIENNE = 1000000000
+
+class TestGenerateurIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.repertoire = tempfile.mkdtemp()
+        self.domain_file = os.path.join(self.repertoire, "domain.pddl")
+        self.problem_file = os.path.join(self.repertoire, "problem.pddl")
+
+    def tearDown(self):
+        shutil.rmtree(self.repertoire)
+
+    def vieillir(self):
+        for chemin in (self.domain_file, self.problem_file):
+            os.utime(chemin, (DATE_ANCIENNE, DATE_ANCIENNE))
+
+    def dates(self):
+        return [os.path.getmtime(chemin) for chemin in (self.domain_file, self.problem_file)]
+
+    def test_reecriture_des_seuls_blocs_modifies(self):
+        generateur = P2_Dispatcher.GenerateurIncremental(self.domain_file, self.problem_file)
+        rapport = generateur.generer(P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS))
+        self.assertTrue(rapport["domain"]["ecrit"] and rapport["problem"]["ecrit"])
+        self.assertIn("pick_op21_co", rapport["domain"]["ajoutes"])
+        with open(self.domain_file) as file:
+            self.assertEqual(file.read(), "".join(texte for _, texte in P2_Dispatcher.construire_domain_pddl(
+                P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS))))
+
+        # Même planning : aucun fichier réécrit
+        self.vieillir()
+        rapport = generateur.generer(P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS))
+        self.assertFalse(rapport["domain"]["ecrit"] or rapport["problem"]["ecrit"])
+        self.assertEqual(self.dates(), [DATE_ANCIENNE, DATE_ANCIENNE])
+
+        # OP21_CO retardée : une attente de plus dans le domaine, le problème est inchangé
+        retarde = PLANNING[:2] + [("op_1", "j_2", "Co", 24, 30)]
+        rapport = generateur.generer(P2_Dispatcher.analyser_planning(retarde, INDEX_OPERATIONS))
+        self.assertEqual((rapport["domain"]["ajoutes"], rapport["domain"]["modifies"]), (["wait@20"], ["pick_op21_co"]))
+        self.assertTrue(rapport["domain"]["ecrit"])
+        self.assertFalse(rapport["problem"]["ecrit"])
+        self.assertNotEqual(self.dates()[0], DATE_ANCIENNE)
+        self.assertEqual(self.dates()[1], DATE_ANCIENNE)
+
+        # OP21_CO retirée : ses actions disparaissent, objets, init et goal du problème changent
+        rapport = generateur.generer(P2_Dispatcher.analyser_planning(PLANNING[:2], INDEX_OPERATIONS))
+        self.assertEqual(rapport["domain"]["supprimes"], ["wait@20", "pick_op21_co", "place_op21_co"])
+        self.assertEqual(rapport["problem"]["modifies"], ["objets", "init", "goal"])
+
+    def test_premier_appel_compare_au_disque(self):
+        dispatch = P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)
+        P2_Dispatcher.GenerateurIncremental(self.domain_file, self.problem_file).generer(dispatch)
+        self.vieillir()
+        rapport = P2_Dispatcher.GenerateurIncremental(self.domain_file, self.problem_file).generer(dispatch)
+        self.assertFalse(rapport["domain"]["ecrit"] or rapport["problem"]["ecrit"])
+        self.assertEqual(self.dates(), [DATE_ANCIENNE, DATE_ANCIENNE])
+
+if __name__ == '__main__':
+    unittest.main()
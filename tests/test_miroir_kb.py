@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests du miroir local de la KB : index, instantanés (copie à l'écriture), fusion et réconciliation
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ClientKB import ClientKB, ServiceKBLocal
+from MiroirKB import MiroirKB, PointSynchronisation, Reconciliateur
+
+ORDRE = {"at": ["a", "l"], "tool_at": ["t", "l"], "holding": ["a", "t"], "synchronised": ["a", "op"]}
+
+DELAI = 5.0
+
+FAITS_INITIAUX = [
+    ("at", "agent_r", "loc_base"),
+    ("tool_at", "tool_op11", "loc_workstation"),
+    ("tool_at", "tool_op12", "loc_workstation"),
+]
+
+class TestMiroirKB(unittest.TestCase):
+
+    def setUp(self):
+        self.miroir = MiroirKB(ORDRE, FAITS_INITIAUX)
+
+    def test_requete_indexee(self):
+        self.assertTrue(self.miroir.contient("at", {"a": "agent_r", "l": "loc_base"}))
+        self.assertEqual(sorted(self.miroir.requete("tool_at", {"l": "loc_workstation"})),
+                         [("tool_op11", "loc_workstation"), ("tool_op12", "loc_workstation")])
+        self.assertEqual(self.miroir.requete("tool_at", (None, "loc_base")), [])
+        with self.assertRaises(ValueError):
+            self.miroir.requete("at", {"x": "agent_r"})
+        # Un paramètre manquant rend la mise à jour sans effet, comme dans la KB
+        self.miroir.appliquer([("at", {"a": "agent_r"}, False)])
+        self.assertTrue(self.miroir.contient("at", ("agent_r", "loc_base")))
+
+    def test_instantane_isole(self):
+        version = self.miroir.version
+        essai = self.miroir.instantane()
+        self.assertIs(essai.parent, self.miroir)
+        self.assertEqual(essai.faits(), self.miroir.faits())
+
+        essai.appliquer([("tool_at", {"t": "tool_op11", "l": "loc_workstation"}, False),
+                         ("holding", {"a": "agent_r", "t": "tool_op11"}, True)])
+        # Le miroir d'origine n'est pas modifié par sa bifurcation...
+        self.assertTrue(self.miroir.contient("tool_at", ("tool_op11", "loc_workstation")))
+        self.assertFalse(self.miroir.contient("holding", ("agent_r", "tool_op11")))
+        self.assertEqual(self.miroir.version, version)
+        # ... ni la bifurcation par les écritures ultérieures du miroir
+        self.miroir.retirer("at", {"a": "agent_r", "l": "loc_base"})
+        self.assertTrue(essai.contient("at", ("agent_r", "loc_base")))
+        self.assertEqual(essai.requete("tool_at", {"l": "loc_workstation"}), [("tool_op12", "loc_workstation")])
+
+        ajoutes, retires = essai.delta()
+        self.assertEqual(ajoutes, set([("holding", "agent_r", "tool_op11")]))
+        self.assertEqual(retires, set([("tool_at", "tool_op11", "loc_workstation")]))
+
+    def test_fusionner(self):
+        essai = self.miroir.instantane()
+        autre = self.miroir.instantane()
+        essai.retirer("at", ("agent_r", "loc_base"))
+        essai.ajouter("at", ("agent_r", "loc_1"))
+        autre.ajouter("holding", ("agent_r", "tool_op12"))
+
+        self.assertEqual(self.miroir.fusionner(essai), 2)
+        self.assertEqual(self.miroir.faits(), essai.faits())
+        self.assertEqual(self.miroir.requete("at", {"a": "agent_r"}), [("agent_r", "loc_1")])
+        # La bifurcation non retenue reste sans effet sur le miroir
+        self.assertFalse(self.miroir.contient("holding", ("agent_r", "tool_op12")))
+
+        with self.assertRaises(ValueError):
+            self.miroir.fusionner(MiroirKB(ORDRE))
+        with self.assertRaises(ValueError):
+            essai.fusionner(self.miroir)
+
+    def test_reconcilier(self):
+        distants = [("at", "agent_r", "loc_1"), ("tool_at", "tool_op12", "loc_workstation")]
+        version = self.miroir.version
+        self.miroir.ajouter("holding", ("agent_r", "tool_op11"))
+        # L'état distant demandé avant une modification locale est périmé
+        self.assertIsNone(self.miroir.reconcilier(distants, version))
+        self.assertTrue(self.miroir.contient("holding", ("agent_r", "tool_op11")))
+
+        ajoutes, retires = self.miroir.reconcilier(distants, self.miroir.version)
+        self.assertEqual(ajoutes, set([("at", ("agent_r", "loc_1"))]))
+        self.assertEqual(self.miroir.faits(), set(distants))
+        self.assertEqual(len(retires), 3)
+
+class ClientEntrelace(ClientKB):
+    """
+    ClientKB qui exécute une réconciliation juste avant et juste après chaque soumission, comme le thread du
+    Reconciliateur pourrait le faire entre les deux appels d'un décorateur.
+    """
+    reconciliateur = None
+
+    def soumettre(self, mises_a_jour):
+        self.reconciliateur.reconcilier()
+        ticket = super(ClientEntrelace, self).soumettre(mises_a_jour)
+        self.reconciliateur.reconcilier()
+        return ticket
+
+class TestReconciliationEntrelacee(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ServiceKBLocal(latence=0.05)
+        self.service.faits = set(ServiceKBLocal.fait(fait[0], dict(zip(ORDRE[fait[0]], fait[1:])))
+                                 for fait in FAITS_INITIAUX)
+        self.client = ClientEntrelace(self.service)
+        self.miroir = MiroirKB(ORDRE, FAITS_INITIAUX)
+
+        def source():
+            return [(predicat,) + tuple(valeur for _, valeur in parametres) for predicat, parametres in self.service.faits]
+        self.client.reconciliateur = Reconciliateur(self.miroir, source, self.client)
+
+    def tearDown(self):
+        self.client.fermer(DELAI)
+
+    def test_point_synchronisation_garde_son_fait(self):
+        point = PointSynchronisation("Sync_OP21_CO", "agent_r", "sync_op21_co", ["agent_h"],
+                                     client=self.client, miroir=self.miroir)
+        point.initialise()
+        # Le fait local survit aux réconciliations intercalées, faites avant l'accusé de la KB
+        self.assertTrue(self.miroir.contient("synchronised", {"a": "agent_r", "op": "sync_op21_co"}))
+        self.assertTrue(self.client.vider(DELAI))
+        self.assertTrue(self.service.contient("synchronised", {"a": "agent_r", "op": "sync_op21_co"}))
+        self.assertEqual(self.client.reconciliateur.reconcilier(), (set(), set()))
+        self.assertTrue(self.miroir.contient("synchronised", {"a": "agent_r", "op": "sync_op21_co"}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de l'évaluation Monte Carlo (MonteCarloBT) : intervalle de Wilson, quantiles du makespan, et mêmes
+# résultats quels que soient le nombre de processus et la taille des lots
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import MonteCarloBT
+import P2_Dispatcher
+import P3_Assembleur
+import Planificateur
+import SimulationBT
+
+# Planning d'un seul agent avec une attente avant la deuxième opération
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+class TestStatistiques(unittest.TestCase):
+
+    def test_intervalle_wilson(self):
+        bas, haut = MonteCarloBT.intervalle_wilson(8, 10)
+        self.assertAlmostEqual(bas, 0.4902, places=4)
+        self.assertAlmostEqual(haut, 0.9433, places=4)
+        # Aux bornes, l'intervalle reste dans [0, 1] sans être réduit à un point
+        bas, haut = MonteCarloBT.intervalle_wilson(10, 10)
+        self.assertAlmostEqual(haut, 1.0)
+        self.assertAlmostEqual(bas, 0.7225, places=4)
+        self.assertEqual(MonteCarloBT.intervalle_wilson(0, 10)[0], 0.0)
+        self.assertEqual(MonteCarloBT.intervalle_wilson(0, 0), (0.0, 1.0))
+
+    def test_quantiles(self):
+        valeurs = [1.0, 2.0, 3.0, 4.0]
+        self.assertEqual(MonteCarloBT.quantile(valeurs, 0.0), 1.0)
+        self.assertEqual(MonteCarloBT.quantile(valeurs, 0.5), 2.5)
+        self.assertAlmostEqual(MonteCarloBT.quantile(valeurs, 0.9), 3.7)
+        self.assertEqual(MonteCarloBT.quantile(valeurs, 1.0), 4.0)
+        self.assertIsNone(MonteCarloBT.quantile([], 0.5))
+
+    def test_agregation(self):
+        resultats = [(True, 10.0, (), None), (True, 30.0, (), None), (True, 20.0, ("VerifierAruco_1",), None),
+                     (False, 5.0, ("FinalGrasp_1",), "PickDecorator_1")]
+        evaluation = MonteCarloBT.agreger("plan", resultats, 0.0)
+        self.assertEqual((evaluation.executions, evaluation.succes, evaluation.probabilite), (4, 3, 0.75))
+        self.assertEqual(evaluation.makespan["moyenne"], 20.0)
+        self.assertEqual(evaluation.makespan["p50"], 20.0)
+        self.assertEqual(evaluation.echecs_noeuds, {"VerifierAruco_1": 1, "FinalGrasp_1": 1})
+        self.assertEqual(evaluation.actions_en_echec, {"PickDecorator_1": 1})
+
+class TestEvaluationPlans(unittest.TestCase):
+
+    def setUp(self):
+        self.repertoire = tempfile.mkdtemp()
+        plan_file = os.path.join(self.repertoire, "plan.pddl")
+        with open(plan_file, 'w') as file:
+            file.write(Planificateur.planifier_dispatch(P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)))
+        actions_dict, tool_to_op = P3_Assembleur.parse_pddl_plan(plan_file)
+        self.specification = P3_Assembleur.construire_specification(P3_Assembleur.filter_actions(actions_dict), tool_to_op)
+        self.modele = SimulationBT.ModeleSimulation(echecs={"FinalGrasp": 0.1}, dispersion=0.2)
+
+    def tearDown(self):
+        shutil.rmtree(self.repertoire)
+
+    def test_meme_resultat_pour_un_ou_plusieurs_processus(self):
+        # L'exécution i utilise la même graine quel que soit le découpage en lots et le processus qui l'exécute
+        un, = MonteCarloBT.evaluer_plans([self.specification], 60, self.modele, processus=1, graine=7, lot=60)
+        plusieurs, = MonteCarloBT.evaluer_plans([self.specification], 60, self.modele, processus=3, graine=7, lot=7)
+        self.assertEqual(un.executions, 60)
+        self.assertTrue(0 < un.succes < 60)
+        for champ in ("succes", "probabilite", "intervalle", "makespan", "echecs_noeuds", "actions_en_echec"):
+            self.assertEqual(getattr(un, champ), getattr(plusieurs, champ), champ)
+
+    def test_classement(self):
+        fiable = MonteCarloBT.agreger("fiable", [(True, 30.0, (), None)] * 4, 0.0)
+        rapide = MonteCarloBT.agreger("rapide", [(True, 10.0, (), None)] * 4, 0.0)
+        fragile = MonteCarloBT.agreger("fragile", [(True, 5.0, (), None), (False, 1.0, (), "PickDecorator_1")], 0.0)
+        self.assertEqual([evaluation.nom for evaluation in MonteCarloBT.classer([fragile, fiable, rapide])],
+                         ["rapide", "fiable", "fragile"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests des branches parallèles : nœud Parallel construit depuis la spécification (ConstructionBT, simulé
+# hors ROS) et structuration par P3 d'un plan à deux actions indépendantes, puis d'un plan produit par P2 et
+# le planificateur natif où la détection du marqueur suivant se déroule pendant une attente
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import py_trees
+
+import ConstructionBT
+import P2_Dispatcher
+import P3_Assembleur
+import Planificateur
+import SimulationBT
+
+# Planning d'un seul agent avec une attente avant la deuxième opération (planning de test_planificateur)
+PLANNING_ATTENTE = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+# Plan de deux agents dont les déplacements ne dépendent pas l'un de l'autre
+PLAN_INDEPENDANT = """0.000: (move_to agent_r loc_base loc_workstation) [0.001]
+0.001: (move_to agent_h loc_base loc_workstation) [0.001]
+"""
+
+def noeud_attente(nom, agent, duree):
+    return {"type": "wait", "name": nom, "duration": duree,
+            "kb": {"on_success": [["wait_done", {"a": agent}]], "on_success_remove": [],
+                   "on_failure": [], "on_failure_remove": []}}
+
+# Spécification de deux attentes indépendantes, en branches d'un Parallel (forme de structurer_actions)
+SPECIFICATION = {
+    "version": 2,
+    "predicate_parameter_order": {"wait_done": ["a"]},
+    "nodes": [noeud_attente("WAIT_0_000", "agent_r", 4.0), noeud_attente("WAIT_0_001", "agent_h", 6.0)],
+    "structure": [{"type": "parallel", "name": "Parallel_WAIT_0_000", "children": [0, 1]}],
+}
+
+def parallele(racine):
+    return [noeud for noeud in racine.iterate() if isinstance(noeud, py_trees.composites.Parallel)]
+
+class TestParalleleConstruit(unittest.TestCase):
+
+    def test_politique_success_on_all(self):
+        simulateur = SimulationBT.Simulateur(SPECIFICATION)
+        noeuds = parallele(simulateur.root)
+        self.assertEqual(len(noeuds), 1)
+        noeud = noeuds[0]
+        self.assertEqual(noeud.name, "Parallel_WAIT_0_000")
+        self.assertEqual([enfant.name for enfant in noeud.children], ["WaitDecorator_WAIT_0_000", "WaitDecorator_WAIT_0_001"])
+        self.assertIsInstance(noeud, ConstructionBT.ParalleleSynchronise)
+        self.assertEqual(noeud.policy, py_trees.common.ParallelPolicy.SUCCESS_ON_ALL)
+
+    def test_branches_simultanees(self):
+        resultat = SimulationBT.simuler(SPECIFICATION, graine=1)
+        self.assertEqual(resultat.statut, "SUCCESS")
+        # Les deux attentes démarrent ensemble : la durée est celle de la plus longue, pas leur somme ; la
+        # branche la plus courte n'est pas relancée en attendant l'autre (un seul intervalle par attente)
+        self.assertEqual(resultat.duree, 6.0)
+        self.assertEqual(sorted((nom, debut, fin) for nom, debut, fin, _ in resultat.intervalles),
+                         [("WaitDecorator_WAIT_0_000", 0.0, 4.0), ("WaitDecorator_WAIT_0_001", 0.0, 6.0)])
+        self.assertTrue(resultat.kb.contient("wait_done", ("agent_r",)) and resultat.kb.contient("wait_done", ("agent_h",)))
+
+    def test_echec_d_une_branche(self):
+        modele = SimulationBT.ModeleSimulation(echecs={"WaitAction_WAIT_0_000": 1.0})
+        resultat = SimulationBT.simuler(SPECIFICATION, modele, graine=1)
+        self.assertEqual(resultat.statut, "FAILURE")
+        self.assertEqual(resultat.echecs, ["WaitAction_WAIT_0_000"])
+        self.assertFalse(resultat.kb.contient("wait_done", ("agent_h",)))
+
+class TestStructureP3(unittest.TestCase):
+
+    def setUp(self):
+        self.repertoire = tempfile.mkdtemp()
+        self.plan_file = os.path.join(self.repertoire, "plan.pddl")
+        with open(self.plan_file, 'w') as file:
+            file.write(PLAN_INDEPENDANT)
+
+    def tearDown(self):
+        shutil.rmtree(self.repertoire)
+
+    def test_actions_independantes_en_parallele(self):
+        actions_dict, tool_to_op = P3_Assembleur.parse_pddl_plan(self.plan_file)
+        specification = P3_Assembleur.construire_specification(P3_Assembleur.filter_actions(actions_dict), tool_to_op)
+        self.assertEqual(len(specification["nodes"]), 2)
+        structure = specification["structure"]
+        self.assertEqual(len(structure), 1)
+        self.assertEqual(structure[0]["type"], "parallel")
+        self.assertEqual(structure[0]["children"], [0, 1])
+
+        noeud, = parallele(SimulationBT.Simulateur(specification).root)
+        self.assertEqual(noeud.policy, py_trees.common.ParallelPolicy.SUCCESS_ON_ALL)
+        self.assertEqual(len(noeud.children), 2)
+
+    def test_detection_pendant_l_attente(self):
+        # Plan d'un seul agent produit par P2 et le planificateur natif : la tête détecte le marqueur de OP12
+        # pendant l'attente, le pick suit les deux branches
+        dispatch = P2_Dispatcher.analyser_planning(PLANNING_ATTENTE, INDEX_OPERATIONS)
+        with open(self.plan_file, 'w') as file:
+            file.write(Planificateur.planifier_dispatch(dispatch))
+        actions_dict, tool_to_op = P3_Assembleur.parse_pddl_plan(self.plan_file)
+        specification = P3_Assembleur.construire_specification(P3_Assembleur.filter_actions(actions_dict), tool_to_op)
+        noms = [noeud["name"] for noeud in specification["nodes"]]
+        self.assertEqual([nom.split("_")[0] for nom in noms],
+                         ["MOVE", "DETECT", "PICK", "PLACE", "WAIT", "DETECT", "PICK", "PLACE"])
+        self.assertEqual(specification["structure"], [0, 1, 2, 3, collections.OrderedDict([
+            ("type", "parallel"), ("name", "Parallel_" + noms[4]), ("children", [4, 5])]), 6, 7])
+
+        resultat = SimulationBT.simuler(specification, graine=1)
+        self.assertEqual(resultat.statut, "SUCCESS")
+        debuts = dict((nom, debut) for nom, debut, _, _ in resultat.intervalles)
+        self.assertEqual(debuts["WaitDecorator_" + noms[4]], debuts["DetectDecorator_" + noms[5]])
+
+    def test_memes_noms_dans_les_deux_modes(self):
+        # Les domaines chaîné et paramétré donnent les mêmes nœuds (PICK_OP12_..., DETECT_OP12_...)
+        dispatch = P2_Dispatcher.analyser_planning(PLANNING_ATTENTE, INDEX_OPERATIONS)
+        noms = []
+        for mode in (P2_Dispatcher.MODE_CHAINE, P2_Dispatcher.MODE_PARAMETRE):
+            with open(self.plan_file, 'w') as file:
+                file.write(Planificateur.planifier_dispatch(dispatch, mode))
+            actions_dict, tool_to_op = P3_Assembleur.parse_pddl_plan(self.plan_file)
+            specification = P3_Assembleur.construire_specification(P3_Assembleur.filter_actions(actions_dict), tool_to_op)
+            noms.append([noeud["name"] for noeud in specification["nodes"]])
+        self.assertEqual(noms[0], noms[1])
+        self.assertIn("PICK_OP12_0_004", noms[0])
+
+if __name__ == '__main__':
+    unittest.main()
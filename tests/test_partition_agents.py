@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de la partition multi-agents : robots et opérateurs humains, arbre de consignes d'un opérateur et
+# acquittement d'une consigne
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import py_trees
+
+import P2_Dispatcher
+import P3_Assembleur
+import PartitionAgents
+from Operateur import CanalOperateur, ConsigneOperateur
+
+# Planning d'un robot et d'un opérateur, avec une opération Co commune
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "H", 0, 8),
+    ("op_1", "j_2", "Co", 10, 20),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_2", "OP21"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+class TestPartition(unittest.TestCase):
+
+    def test_robots_par_defaut(self):
+        partitions = PartitionAgents.partitionner(PLANNING, INDEX_OPERATIONS)
+        self.assertEqual(list(partitions), ["agent_h", "agent_r"])
+        self.assertTrue(partitions["agent_h"]["operateur"])
+        self.assertFalse(partitions["agent_r"]["operateur"])
+        self.assertEqual(list(partitions["agent_h"]["synchronisations"]), ["OP21_CO"])
+
+    def test_robots_choisis(self):
+        partitions = PartitionAgents.partitionner(PLANNING, INDEX_OPERATIONS, robots=["R", "H"])
+        self.assertFalse(any(dispatch["operateur"] for dispatch in partitions.values()))
+
+class TestArbreOperateur(unittest.TestCase):
+
+    def test_consignes_sans_actions_du_robot(self):
+        partitions = PartitionAgents.partitionner(PLANNING, INDEX_OPERATIONS)
+        actions_dict, tool_to_op = P3_Assembleur.actions_depuis_dispatch(partitions["agent_h"])
+        self.assertEqual([(details["action"], details.get("op_key")) for details in actions_dict.values()],
+                         [("operator", "OP12"), ("wait", None), ("sync", "OP21_CO"), ("operator", "OP21_CO")])
+        self.assertEqual(tool_to_op, {})
+        specification = P3_Assembleur.construire_specification(actions_dict, tool_to_op)
+        self.assertEqual([noeud["type"] for noeud in specification["nodes"]], ["operator", "wait", "sync", "operator"])
+        self.assertNotIn("structure", specification)
+
+        # Le robot garde ses actions, précédées du même point de synchronisation
+        actions_robot, _ = P3_Assembleur.actions_depuis_dispatch(partitions["agent_r"])
+        self.assertIn("sync", [details["action"] for details in actions_robot.values()])
+        self.assertNotIn("operator", [details["action"] for details in actions_robot.values()])
+
+class TestConsigneOperateur(unittest.TestCase):
+
+    def setUp(self):
+        self.publiees = []
+        self.rappels = []
+        self.canal = CanalOperateur(editeur=lambda topic: self.publiees.append,
+                                    abonnement=lambda topic, rappel: self.rappels.append(rappel))
+
+    def test_acquittement(self):
+        consigne = ConsigneOperateur("Operator_OP12", "agent_h", "OP12", canal=self.canal)
+        consigne.tick_once()
+        self.assertEqual(consigne.status, py_trees.common.Status.RUNNING)
+        self.assertEqual(self.publiees, ["agent_h OP12"])
+        self.rappels[0]("agent_h OP11")
+        consigne.tick_once()
+        self.assertEqual(consigne.status, py_trees.common.Status.RUNNING)
+        self.rappels[0]("agent_h OP12")
+        consigne.tick_once()
+        self.assertEqual(consigne.status, py_trees.common.Status.SUCCESS)
+
+    def test_delai_depasse(self):
+        consigne = ConsigneOperateur("Operator_OP12", "agent_h", "OP12", timeout=0.0, canal=self.canal)
+        consigne.tick_once()
+        self.assertEqual(consigne.status, py_trees.common.Status.FAILURE)
+
+if __name__ == '__main__':
+    unittest.main()
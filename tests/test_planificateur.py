@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests du planificateur natif, du validateur et du cache des plans, sur un domaine chaîné produit par P2
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import P2_Dispatcher
+import Planificateur
+from Planificateur import CachePlans, Validateur, cle_plan
+
+# Planning R/Co de trois opérations (dont une attente) et une opération machine ignorée par P2
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+    ("op_1", "j_2", "M1", 0, 5),
+    ("op_1", "j_2", "Co", 20, 30),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_2", "OP21"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+def textes_pddl():
+    dispatch = P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)
+    return ("".join(texte for _, texte in P2_Dispatcher.construire_domain_pddl(dispatch)),
+            "".join(texte for _, texte in P2_Dispatcher.construire_problem_pddl(dispatch)))
+
+class TestPlanificateurNatif(unittest.TestCase):
+
+    def test_plan_de_la_chaine(self):
+        domaine, probleme = textes_pddl()
+        plan = Planificateur.planifier_texte(domaine, probleme)
+        self.assertEqual([ligne.split("(")[1].split()[0] for ligne in plan.splitlines()],
+                         ["move_to", "pick_op11", "place_op11", "wait", "pick_op12", "place_op12",
+                          "pick_op21_co", "place_op21_co"])
+        self.assertIn("(move_to agent_r loc_base loc_workstation)", plan)
+
+    def test_mode_parametre(self):
+        dispatch = P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)
+        plan = Planificateur.planifier_dispatch(dispatch, P2_Dispatcher.MODE_PARAMETRE)
+        self.assertEqual(len(plan.splitlines()), 8)
+        self.assertIn("(wait agent_r wait_1 op11)", plan)
+        self.assertIn("(pick agent_r tool_op12 loc_workstation op12 wait_1)", plan)
+
+    def test_instanciation_sur_les_objets_cites(self):
+        # Les locations déclarées mais citées nulle part ne sont pas instanciées dans move_to
+        domaine, probleme = textes_pddl()
+        domaine, probleme = Planificateur.lire_domaine(domaine), Planificateur.lire_probleme(probleme)
+        self.assertIn("loc_1", probleme.objets["location"])
+        actions, _ = Planificateur.instancier(domaine, probleme, Planificateur.objets_mentionnes(domaine, probleme))
+        deplacements = set(action.arguments for action in actions if action.nom == "move_to")
+        self.assertEqual(deplacements, set(("agent_r", depart, arrivee)
+                                           for depart in ("loc_base", "loc_workstation")
+                                           for arrivee in ("loc_base", "loc_workstation")))
+
+    def test_suivi_direct_d_une_longue_chaine(self):
+        # 54 opérations enchaînées : la chaîne est suivie sans recherche et le plan est valide
+        planning, index = [], {}
+        for numero in range(54):
+            job_id, op_id = "j_{}".format(1 + numero // 9), "op_{}".format(1 + numero % 9)
+            planning.append((op_id, job_id, "R", numero * 10, numero * 10 + 10))
+            index[(job_id, "OP" + job_id[2:] + op_id[3:])] = P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE | \
+                (P2_Dispatcher.ACTION_MOVE_TO if numero % 2 == 0 else 0)
+        dispatch = P2_Dispatcher.analyser_planning(planning, index)
+        for mode in (P2_Dispatcher.MODE_CHAINE, P2_Dispatcher.MODE_PARAMETRE):
+            texte_domaine = "".join(texte for _, texte in P2_Dispatcher.construire_domain_pddl(dispatch, mode))
+            texte_probleme = "".join(texte for _, texte in P2_Dispatcher.construire_problem_pddl(dispatch, mode))
+            domaine, probleme = Planificateur.lire_domaine(texte_domaine), Planificateur.lire_probleme(texte_probleme)
+            actions, modifies = Planificateur.instancier(domaine, probleme, Planificateur.objets_mentionnes(domaine, probleme))
+            plan = Planificateur.suivre_chaine(actions, Planificateur.predicats_etapes(domaine),
+                                               set(fait for fait in probleme.init if fait[0] in modifies), probleme.but)
+            self.assertIsNotNone(plan)
+            self.assertEqual(sum(1 for action in plan if action.nom.startswith("pick")), 54)
+            texte_plan = Planificateur.formater_plan([(action.nom, action.arguments) for action in plan])
+            self.assertTrue(Validateur(texte_domaine, texte_probleme).valider(texte_plan).valide)
+            self.assertEqual(Planificateur.planifier_texte(texte_domaine, texte_probleme), texte_plan)
+
+    def test_domaine_hors_strips(self):
+        # Une construction non supportée laisse la main au planificateur externe
+        domaine, probleme = textes_pddl()
+        self.assertIsNone(Planificateur.planifier_texte(domaine.replace("(at ?a ?from)", "(or (at ?a ?from))", 1), probleme))
+
+class TestValidateur(unittest.TestCase):
+
+    def setUp(self):
+        self.domaine, self.probleme = textes_pddl()
+        self.validateur = Validateur(self.domaine, self.probleme)
+        self.plan = Planificateur.planifier_texte(self.domaine, self.probleme)
+        self.lignes = self.plan.splitlines()
+
+    def test_plan_natif_valide(self):
+        self.assertIsNotNone(self.plan)
+        self.assertEqual(len(self.lignes), 8)
+        resultat = self.validateur.valider(self.plan)
+        self.assertTrue(resultat.valide)
+        self.assertIsNone(resultat.indice)
+
+    def test_precondition_fausse(self):
+        # Sans le pick, le place de OP11 n'est pas applicable
+        resultat = self.validateur.valider("\n".join(self.lignes[:1] + self.lignes[2:]))
+        self.assertFalse(resultat.valide)
+        self.assertEqual(resultat.indice, 1)
+        self.assertIn("place_op11", resultat.ligne)
+        self.assertIn("(holding agent_r tool_op11)", resultat.raison)
+
+    def test_but_non_atteint(self):
+        resultat = self.validateur.valider("\n".join(self.lignes[:-1]))
+        self.assertFalse(resultat.valide)
+        self.assertEqual(resultat.indice, len(self.lignes) - 1)
+        self.assertIn("place_op21_co_done", resultat.raison)
+
+    def test_action_et_objet_inconnus(self):
+        resultat = self.validateur.valider("0.000: (teleport agent_r) [0.001]")
+        self.assertFalse(resultat.valide)
+        self.assertIn("action inconnue", resultat.raison)
+        resultat = self.validateur.valider("0.000: (move_to agent_h loc_base loc_1) [0.001]")
+        self.assertIn("agent_h", resultat.raison)
+        resultat = self.validateur.valider("pas une ligne de plan")
+        self.assertEqual(resultat.raison, "ligne illisible")
+
+    def test_etapes_triees_par_temps(self):
+        # L'ordre des lignes n'importe pas, seul le temps de début compte
+        self.assertTrue(self.validateur.valider("\n".join(reversed(self.lignes))).valide)
+
+class TestCachePlans(unittest.TestCase):
+
+    def setUp(self):
+        self.repertoire = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.repertoire)
+
+    def test_cle_independante_de_l_ordre(self):
+        domaine, probleme = textes_pddl()
+        lignes = probleme.splitlines(True)
+        debut = lignes.index("  (:init\n") + 1
+        fin = lignes.index("  )\n", debut)
+        permute = lignes[:debut] + list(reversed(lignes[debut:fin])) + lignes[fin:]
+        self.assertEqual(cle_plan(domaine, probleme), cle_plan(domaine, "".join(permute)))
+        self.assertNotEqual(cle_plan(domaine, probleme),
+                            cle_plan(domaine, probleme.replace("(at agent_r loc_base)", "(at agent_r loc_1)")))
+
+    def test_lru_en_memoire(self):
+        cache = CachePlans(capacite=2)
+        cache.enregistrer("a", "plan a")
+        cache.enregistrer("b", "plan b")
+        self.assertEqual(cache.obtenir("a"), "plan a")  # "a" devient la plus récente
+        cache.enregistrer("c", "plan c")
+        self.assertIsNone(cache.obtenir("b"))
+        self.assertEqual(cache.obtenir("a"), "plan a")
+        self.assertEqual(cache.obtenir("c"), "plan c")
+        self.assertEqual((cache.succes, cache.echecs), (3, 1))
+
+    def test_persistance_sur_disque(self):
+        CachePlans(repertoire=self.repertoire).enregistrer("cle", "plan")
+        cache = CachePlans(repertoire=self.repertoire)
+        self.assertEqual(cache.obtenir("cle"), "plan")
+        self.assertIsNone(cache.obtenir("absente"))
+        self.assertFalse([nom for nom in os.listdir(self.repertoire) if nom.endswith('.tmp')])
+
+    def test_purge_des_moins_recents(self):
+        cache = CachePlans(capacite=2, repertoire=self.repertoire)
+        for numero, cle in enumerate(("a", "b")):
+            cache.enregistrer(cle, "plan " + cle)
+            os.utime(cache._chemin(cle), (1000 + numero, 1000 + numero))
+        cache.enregistrer("c", "plan c")
+        self.assertEqual(sorted(os.listdir(self.repertoire)), ["b.pddl", "c.pddl"])
+
+    def test_planifier_fichiers_avec_cache(self):
+        domaine, probleme = textes_pddl()
+        chemins = [os.path.join(self.repertoire, nom) for nom in ("domain.pddl", "problem.pddl", "plan.pddl")]
+        for chemin, texte in zip(chemins, (domaine, probleme)):
+            with open(chemin, 'w') as file:
+                file.write(texte)
+        cache = CachePlans(repertoire=os.path.join(self.repertoire, "plans"))
+        self.assertEqual(Planificateur.planifier_fichiers(*chemins, cache=cache), 'natif')
+        self.assertEqual(Planificateur.planifier_fichiers(*chemins, cache=cache), 'cache')
+        with open(chemins[2]) as file:
+            self.assertEqual(file.read(), Planificateur.planifier_texte(domaine, probleme))
+        self.assertTrue(Planificateur.valider_fichiers(*chemins).valide)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests des précédences Yijijk de P1 sur la solution fournie avec le dépôt (solution.sol)
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import sys
+import unittest
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RACINE)
+
+import P1_Convertisseur
+
+SOLUTION = os.path.join(RACINE, 'solution.sol')
+
+class TestPrecedences(unittest.TestCase):
+
+    def test_graphe_reduit_des_operations_affectees(self):
+        # Sans solution fournie, les précédences sont filtrées comme avec la solution lue : pas de cycle
+        solution = P1_Convertisseur.charger_solution(SOLUTION)
+        graphe = P1_Convertisseur.charger_precedences(SOLUTION).graphe_reduit()
+        self.assertEqual(graphe, P1_Convertisseur.charger_precedences(SOLUTION, solution).graphe_reduit())
+
+        creneaux = {}
+        for op, job, ressource, debut, fin in solution.operations():
+            creneaux.setdefault((op, job), {})[ressource] = (debut, fin)
+        self.assertEqual(sorted(graphe), sorted(creneaux))
+
+        # Chaque arc relie deux opérations d'une même ressource, la première finissant avant le début de l'autre
+        for noeud, successeurs in graphe.items():
+            for successeur in successeurs:
+                self.assertTrue(any(ressource in creneaux[successeur] and fin <= creneaux[successeur][ressource][0]
+                                    for ressource, (_, fin) in creneaux[noeud].items()), (noeud, successeur))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests de la simulation hors ligne (SimulationBT) sur l'arbre d'un plan produit par P2, le planificateur
+# natif et P3 : reproductibilité à graine fixe, saut de l'horloge virtuelle à la prochaine échéance, échecs
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import P2_Dispatcher
+import P3_Assembleur
+import Planificateur
+import SimulationBT
+
+# Planning d'un seul agent avec une attente avant la deuxième opération
+PLANNING = [
+    ("op_1", "j_1", "R", 0, 10),
+    ("op_2", "j_1", "R", 12, 20),
+]
+
+INDEX_OPERATIONS = {
+    ("j_1", "OP11"): P2_Dispatcher.ACTION_MOVE_TO | P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+    ("j_1", "OP12"): P2_Dispatcher.ACTION_PICK | P2_Dispatcher.ACTION_PLACE,
+}
+
+def specification_du_planning():
+    repertoire = tempfile.mkdtemp()
+    try:
+        plan_file = os.path.join(repertoire, "plan.pddl")
+        with open(plan_file, 'w') as file:
+            file.write(Planificateur.planifier_dispatch(P2_Dispatcher.analyser_planning(PLANNING, INDEX_OPERATIONS)))
+        actions_dict, tool_to_op = P3_Assembleur.parse_pddl_plan(plan_file)
+    finally:
+        shutil.rmtree(repertoire)
+    return P3_Assembleur.construire_specification(P3_Assembleur.filter_actions(actions_dict), tool_to_op)
+
+class TestSimulationBT(unittest.TestCase):
+
+    def setUp(self):
+        self.specification = specification_du_planning()
+
+    def test_graine_fixe_deterministe(self):
+        modele = SimulationBT.ModeleSimulation(dispersion=0.2)
+        premier = SimulationBT.simuler(self.specification, modele, graine=1)
+        second = SimulationBT.simuler(self.specification, modele, graine=1)
+        self.assertEqual(premier.statut, "SUCCESS")
+        self.assertEqual((premier.statut, premier.duree, premier.ticks, premier.intervalles),
+                         (second.statut, second.duree, second.ticks, second.intervalles))
+        self.assertNotEqual(SimulationBT.simuler(self.specification, modele, graine=2).duree, premier.duree)
+
+    def test_saut_a_la_prochaine_echeance(self):
+        # Durées nominales : move 10 + detect 0.1 + pick 18 + place 11 + attente 10 (la détection suivante en
+        # parallèle) + pick 18 + place 11
+        resultat = SimulationBT.simuler(self.specification, graine=1)
+        self.assertEqual(resultat.statut, "SUCCESS")
+        self.assertAlmostEqual(resultat.duree, 78.1)
+        self.assertEqual(resultat.intervalles[0], ("MoveDecorator_MOVE_TO_0_000", 0.0, 10.0, "SUCCESS"))
+        for _, debut, fin, _ in resultat.intervalles:
+            self.assertLessEqual(debut, fin)
+
+        # Une horloge à pas fixe de 0.1 s tique l'arbre à chaque pas, sans changer l'issue
+        a_pas_fixe = SimulationBT.simuler(self.specification, graine=1, pas=0.1)
+        self.assertEqual(a_pas_fixe.statut, "SUCCESS")
+        self.assertLess(resultat.ticks * 10, a_pas_fixe.ticks)
+        self.assertGreaterEqual(a_pas_fixe.duree, resultat.duree)
+
+    def test_echec_d_un_comportement(self):
+        modele = SimulationBT.ModeleSimulation(echecs={"FinalGrasp": 1.0})
+        resultat = SimulationBT.simuler(self.specification, modele, graine=1)
+        self.assertEqual(resultat.statut, "FAILURE")
+        self.assertEqual(resultat.echecs, ["FinalGrasp_PICK_OP11_0_001"])
+        self.assertEqual(resultat.intervalles[-1][0], "PickDecorator_PICK_OP11_0_001")
+        self.assertEqual(resultat.intervalles[-1][3], "FAILURE")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tests des répertoires de sortie du traitement en lot : les solutions homonymes ne s'écrasent pas
+#
+# Exemple (depuis la racine du dépôt) :
+#   python -m pytest -q tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import Traitement_Lot
+
+class TestNomsSortie(unittest.TestCase):
+
+    def test_noms_uniques_inchanges(self):
+        self.assertEqual(Traitement_Lot.noms_sortie(["AlternativeAlpha06.sol", os.path.join("lot", "solution.sol")]),
+                         ["AlternativeAlpha06", "solution"])
+
+    def test_homonymes_distingues_par_leur_repertoire(self):
+        solutions = [os.path.join("balayage", "a", "solution.sol"), os.path.join("balayage", "b", "solution.sol"),
+                     os.path.join("balayage", "a", "AlternativeAlpha06.sol")]
+        self.assertEqual(Traitement_Lot.noms_sortie(solutions), ["a_solution", "b_solution", "AlternativeAlpha06"])
+
+    def test_meme_fichier_liste_deux_fois(self):
+        with self.assertRaises(ValueError):
+            Traitement_Lot.noms_sortie(["solution.sol", os.path.join(".", "solution.sol")])
+
+if __name__ == '__main__':
+    unittest.main()